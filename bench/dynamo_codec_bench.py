@@ -0,0 +1,186 @@
+# bench/dynamo_codec_bench.py
+"""
+DynamoStore の「DynamoDB に渡す前 / 受け取った後」の CPU 時間を、
+resource 層 + Decimal 変換を使っていた以前の経路と比べる（通信は含まない）。
+
+    python -m bench.dynamo_codec_bench
+    python -m bench.dynamo_codec_bench --partners 10,100,500 --repeat 2000
+
+比べるもの（1 呼び出しあたりの process_time）:
+- tick 書き込み : 以前 … SET 句を毎回組み立て + _to_decimal + TypeSerializer
+                  今   … DynamoStore.build_meta_update（式はキャッシュ、値は dynamo_codec）
+- meta 丸ごと書き込み（update_voice_meta）: _to_decimal + TypeSerializer / codec.encode
+- meta 読み込み（get_voice_meta）: TypeDeserializer + _from_decimal / codec.decode
+
+meta は 24 時間分の hour_buckets と、--partners 人分の pair_time を持つ実際の大きさにする。
+"""
+
+import argparse
+import random
+import sys
+import time
+from decimal import Decimal
+from typing import Any, Callable, Dict, List
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+from data import dynamo_codec as codec
+from data.backends.dynamo_store import META_PAIRS_PER_UPDATE, DynamoStore
+from data.local_dynamo import LocalDynamoDB
+from data.store_base import new_voice_meta
+
+
+# =========================
+#  以前の経路（resource 層 + Decimal）
+# =========================
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+def _to_decimal(value):
+    if isinstance(value, float) or isinstance(value, int):
+        return Decimal(str(value))
+    elif isinstance(value, dict):
+        return {k: _to_decimal(v) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [_to_decimal(v) for v in value]
+    return value
+
+
+def _from_decimal(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, list):
+        return [_from_decimal(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _from_decimal(v) for k, v in value.items()}
+    return value
+
+
+def legacy_meta_update(gid: int, uid: int, *, xp, times, max_member_count, hour_buckets, pair_time):
+    """以前の add_voice_activity と同じ組み立て + resource 層が送信前に行う変換"""
+    sets = []
+    values: Dict[str, Any] = {}
+    names: Dict[str, str] = {}
+
+    def _add(path: str, value: float, placeholder: str):
+        sets.append(f"{path} = if_not_exists({path}, :zero) + {placeholder}")
+        values[":zero"] = Decimal("0")
+        values[placeholder] = _to_decimal(value)
+
+    for i, (k, v) in enumerate(sorted(times.items())):
+        names[f"#t{i}"] = k
+        _add(f"meta.#t{i}", v, f":t{i}")
+    for h, v in sorted(hour_buckets.items()):
+        _add(f"meta.hour_buckets[{int(h)}]", v, f":h{int(h)}")
+    pairs = sorted(pair_time.items())
+    for i, (oid, v) in enumerate(pairs[:META_PAIRS_PER_UPDATE]):
+        names[f"#p{i}"] = oid
+        _add(f"meta.pair_time.#p{i}", v, f":p{i}")
+    if xp:
+        sets.append("voice_xp = if_not_exists(voice_xp, :zero) + :dxp")
+        values[":dxp"] = _to_decimal(xp)
+    sets.append("meta.max_member_count = :mmc")
+    values[":mmc"] = Decimal(max_member_count)
+
+    params = {
+        "Key": {"guild_id": str(gid), "user_id": str(uid)},
+        "UpdateExpression": "SET " + ", ".join(sets),
+        "ExpressionAttributeNames": names,
+        "ExpressionAttributeValues": values,
+        "ConditionExpression": "attribute_not_exists(meta.max_member_count) OR meta.max_member_count < :mmc",
+    }
+    # resource 層はここで Key / 値を AttributeValue にする
+    params["Key"] = {k: _serializer.serialize(v) for k, v in params["Key"].items()}
+    params["ExpressionAttributeValues"] = {
+        k: _serializer.serialize(v) for k, v in values.items()
+    }
+    return params, pairs[META_PAIRS_PER_UPDATE:]
+
+
+# =========================
+#  データ
+# =========================
+def make_meta(rng: random.Random, partners: int) -> dict:
+    meta = new_voice_meta()
+    for k in ("total_time", "solo_time", "small_group_time", "mid_group_time", "big_group_time", "muted_time"):
+        meta[k] = rng.randint(0, 100_000) / 4
+    meta["max_member_count"] = float(rng.randint(1, 40))
+    meta["hour_buckets"] = [rng.randint(0, 5_000) / 4 for _ in range(24)]
+    meta["pair_time"] = {str(10**17 + i): rng.randint(1, 20_000) / 4 for i in range(partners)}
+    return meta
+
+
+def make_tick(rng: random.Random, partners: int) -> dict:
+    return {
+        "xp": rng.randint(1, 8) / 2,
+        "times": {"total_time": 1.0, "small_group_time": 1.0},
+        "max_member_count": 100,  # 毎回「最大人数を更新する」側の式にする
+        "hour_buckets": {rng.randrange(24): 1.0},
+        "pair_time": {str(10**17 + i): 1.0 for i in range(partners)},
+    }
+
+
+def per_call_us(func: Callable[[], Any], repeat: int) -> float:
+    func()  # キャッシュを温める
+    started = time.process_time()
+    for _ in range(repeat):
+        func()
+    return (time.process_time() - started) / repeat * 1e6
+
+
+# =========================
+#  実行
+# =========================
+def run(partners_list: List[int], repeat: int, seed: int = 0):
+    rng = random.Random(seed)
+    store = DynamoStore("zero_bot_xp", dynamodb=LocalDynamoDB())
+    rows = []
+
+    for partners in partners_list:
+        meta = make_meta(rng, partners)
+        meta_av = codec.encode(meta)
+        tick = make_tick(rng, min(partners, META_PAIRS_PER_UPDATE))
+
+        def new_tick():
+            store._known_max_members.clear()
+            return store.build_meta_update(1, 2, **tick)
+
+        cases = [
+            (
+                "tick write",
+                lambda: legacy_meta_update(1, 2, **tick),
+                new_tick,
+            ),
+            (
+                "meta write",
+                lambda: _serializer.serialize(_to_decimal(meta)),
+                lambda: codec.encode(meta),
+            ),
+            (
+                "meta read",
+                lambda: _from_decimal(_deserializer.deserialize(meta_av)),
+                lambda: codec.decode(meta_av),
+            ),
+        ]
+        for name, before, after in cases:
+            rows.append((partners, name, per_call_us(before, repeat), per_call_us(after, repeat)))
+
+    print(f"{'partners':>8}  {'op':<12}{'before us':>11}{'after us':>10}{'speedup':>9}")
+    for partners, name, before, after in rows:
+        print(f"{partners:>8}  {name:<12}{before:>11.1f}{after:>10.1f}{before / after:>8.1f}x")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="DynamoStore の値変換 / 式組み立ての CPU 時間を比べる")
+    parser.add_argument("--partners", default="10,100,500", help="pair_time の相手数（カンマ区切り）")
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    run([int(p) for p in args.partners.split(",") if p.strip()], args.repeat, args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
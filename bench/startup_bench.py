@@ -0,0 +1,83 @@
+# bench/startup_bench.py
+"""
+起動時（import 時）に AWS まわりでかかる時間を測る。
+
+    python -m bench.startup_bench
+    python -m bench.startup_bench --runs 10 --modules data.store,utils.rankcard_s3
+
+1 回ごとに新しいプロセスを立ち上げて、
+- import : --modules をすべて import するまでの時間と、その時点で作られていた client / resource の数
+- 初回利用: そのあと DynamoStore / GuildConfigStore / 日次テーブル / S3 の client を
+            はじめて取り出すまでの時間（共有 client を作る分。通信はしない）
+を測り、中央値を出す。DYNAMODB_LOCAL は false にして boto3 の実際の分を測る。
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# 子プロセスで動かすもの（結果は最後の行に JSON で出す）
+_CHILD = r"""
+import importlib, json, sys, time
+
+started = time.perf_counter()
+for name in sys.argv[1].split(","):
+    importlib.import_module(name)
+imported = time.perf_counter()
+
+from data import aws_clients
+at_import = aws_clients.created()
+
+from data import store, voice_daily_store
+store.store.client
+store.guild_config_store.client
+voice_daily_store.table()
+aws_clients.client("s3")
+first_use = time.perf_counter()
+
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_use_ms": (first_use - imported) * 1000,
+    "at_import": at_import,
+    "after_use": aws_clients.created(),
+}))
+"""
+
+
+def run_once(modules: str) -> dict:
+    env = dict(os.environ, DYNAMODB_LOCAL="false")
+    out = subprocess.run(
+        [sys.executable, "-c", _CHILD, modules],
+        check=True,
+        capture_output=True,
+        text=True,
+        env=env,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="import 時の AWS client 作成コストを測る")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--modules",
+        default="data.store,data.voice_daily_store,utils.rankcard_s3",
+        help="import するモジュール（カンマ区切り）",
+    )
+    args = parser.parse_args(argv)
+
+    results = [run_once(args.modules) for _ in range(args.runs)]
+    import_ms = statistics.median(r["import_ms"] for r in results)
+    first_use_ms = statistics.median(r["first_use_ms"] for r in results)
+
+    print(f"modules : {args.modules} ({args.runs} runs, median)")
+    print(f"import  : {import_ms:8.1f} ms  created at import: {results[-1]['at_import']}")
+    print(f"first use: {first_use_ms:7.1f} ms  created after use: {results[-1]['after_use']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
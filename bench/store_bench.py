@@ -0,0 +1,295 @@
+# bench/store_bench.py
+"""
+BaseStore の各バックエンドに同じ合成ワークロードを流して、
+結果が一致するか（適合性）と速さ / メモリを比べる。
+
+    python -m bench.store_bench --guilds 3 --users 200 --ticks 30
+    python -m bench.store_bench --backends sqlite,json-journal
+    python -m bench.store_bench --backends dynamo-local --dynamo-latency-ms 5
+
+ワークロード（N ギルド × M ユーザー × T tick）:
+- tick ごと・ギルドごとに add_voice_xp_many（VC にいる全員分）
+- ユーザーごとに add_voice_meta（人数帯の分数 / 時間帯 / 同席相手）
+- 5 人に 1 人は add_text_xp
+- 最後に get_guild_user_stats / get_xp_many / get_voice_meta / get_rank_bg_key で読み、
+  ワークロードから計算した期待値と突き合わせる
+
+ops/sec は書き込み操作（add_*）の件数 / 書き込みにかかった時間。
+メモリは tracemalloc のピーク（Python 側の確保のみ。SQLite の C 側は含まない）。
+tracemalloc を動かしたまま測るので、絶対値より backend 同士の比較に使う。
+
+dynamo-local は DynamoStore を data.local_dynamo の代用品に繋いだもの。
+--dynamo-latency-ms で 1 回の往復の遅延を足すと、呼び出し回数の差がそのまま時間に出る。
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+from data.store_base import BaseStore, new_voice_meta
+from data.voice_buffer import apply_meta_delta
+
+
+# =========================
+#  バックエンド
+# =========================
+def _memory(workdir: str) -> BaseStore:
+    from data.backends.memory_store import MemoryStore
+    return MemoryStore()
+
+def _json(workdir: str) -> BaseStore:
+    from data.backends.json_store import JsonStore
+    return JsonStore(os.path.join(workdir, "xp.json"), flush_interval=None)
+
+def _json_journal(workdir: str) -> BaseStore:
+    from data.backends.json_store import JsonStore
+    return JsonStore(os.path.join(workdir, "xp.json"), flush_interval=None, journal=True)
+
+def _sqlite(workdir: str) -> BaseStore:
+    from data.backends.sqlite_store import SQLiteStore
+    return SQLiteStore(os.path.join(workdir, "xp.sqlite3"))
+
+# dynamo-local の遅延（秒）。main() が --dynamo-latency-ms から設定する
+DYNAMO_LATENCY = 0.0
+
+def _dynamo_local(workdir: str) -> BaseStore:
+    from data.backends.dynamo_store import DynamoStore
+    from data.local_dynamo import LocalDynamoDB
+    return DynamoStore("zero_bot_xp", dynamodb=LocalDynamoDB(latency=DYNAMO_LATENCY))
+
+BACKENDS: Dict[str, Callable[[str], BaseStore]] = {
+    "memory": _memory,
+    "json": _json,
+    "json-journal": _json_journal,
+    "sqlite": _sqlite,
+    "dynamo-local": _dynamo_local,
+}
+
+
+# =========================
+#  ワークロード
+# =========================
+class Workload:
+    """乱数の種が同じなら、どのバックエンドにも同じ操作列を流す"""
+
+    def __init__(self, guilds: int, users: int, ticks: int, seed: int = 0):
+        self.guilds = guilds
+        self.users = users
+        self.ticks = ticks
+        self.seed = seed
+
+    def guild_ids(self) -> List[int]:
+        return [1000 + g for g in range(self.guilds)]
+
+    def user_ids(self) -> List[int]:
+        return [10_000 + u for u in range(self.users)]
+
+    def ticks_iter(self):
+        """tick ごとに (gid, {uid: voice_xp}, [(uid, meta_delta)], {uid: text_xp}) を返す"""
+        rng = random.Random(self.seed)
+        uids = self.user_ids()
+        bands = ("solo_time", "small_group_time", "mid_group_time", "big_group_time")
+
+        for t in range(self.ticks):
+            hour = t % 24
+            for gid in self.guild_ids():
+                # 0.5 刻みにして、どのバックエンドでも足し算の結果が厳密に一致するようにする
+                voice = {uid: rng.randint(1, 8) / 2 for uid in uids}
+                metas = []
+                for uid in uids:
+                    partner = str(uids[rng.randrange(len(uids))])
+                    metas.append((uid, {
+                        "times": {"total_time": 1.0, rng.choice(bands): 1.0},
+                        "max_member_count": rng.randint(1, 20),
+                        "hour_buckets": {hour: 1.0},
+                        "pair_time": {partner: 1.0},
+                    }))
+                text = {uid: rng.randint(1, 4) / 2 for uid in uids[::5]}
+                yield gid, voice, metas, text
+
+    def expected(self):
+        """全 tick を流したあとの (xp, meta) の期待値"""
+        xp: Dict[int, Dict[int, Dict[str, float]]] = defaultdict(dict)
+        meta: Dict[Tuple[int, int], Dict] = {}
+        for gid, voice, metas, text in self.ticks_iter():
+            for uid, v in voice.items():
+                row = xp[gid].setdefault(uid, {"voice_xp": 0.0, "text_xp": 0.0})
+                row["voice_xp"] += v
+            for uid, v in text.items():
+                row = xp[gid].setdefault(uid, {"voice_xp": 0.0, "text_xp": 0.0})
+                row["text_xp"] += v
+            for uid, delta in metas:
+                meta[(gid, uid)] = apply_meta_delta(meta.get((gid, uid), new_voice_meta()), **delta)
+        return xp, meta
+
+
+# =========================
+#  計測
+# =========================
+class Result:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.elapsed = 0.0
+        self.peak_bytes = 0
+        self.errors: List[str] = []
+
+    @property
+    def ops(self) -> int:
+        return sum(len(v) for v in self.latencies.values())
+
+    def timed(self, op: str, func, *args, **kwargs):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.latencies[op].append(time.perf_counter() - started)
+        return result
+
+
+def _pct(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def _close(a: float, b: float) -> bool:
+    return abs(float(a) - float(b)) <= 1e-6 * max(1.0, abs(float(b)))
+
+
+def check_conformance(store: BaseStore, workload: Workload, result: Result):
+    xp, meta = workload.expected()
+
+    for gid in workload.guild_ids():
+        stats = result.timed("get_guild_user_stats", store.get_guild_user_stats, gid)
+        if set(stats) != set(xp[gid]):
+            result.errors.append(f"guild {gid}: get_guild_user_stats のユーザーが違う")
+
+        many = result.timed("get_xp_many", store.get_xp_many, gid, workload.user_ids() + [1])
+        if many.get(1) != {"voice_xp": 0.0, "text_xp": 0.0}:
+            result.errors.append(f"guild {gid}: get_xp_many が未登録ユーザーを 0 で返さない")
+
+        for uid, want in xp[gid].items():
+            for field in ("voice_xp", "text_xp"):
+                if not _close(stats.get(uid, {}).get(field, 0.0), want[field]):
+                    result.errors.append(f"{gid}/{uid} {field}: stats={stats.get(uid)} want={want}")
+                if not _close(many[uid][field], want[field]):
+                    result.errors.append(f"{gid}/{uid} {field}: many={many[uid]} want={want}")
+
+            got = result.timed("get_voice_meta", store.get_voice_meta, gid, uid)
+            exp = meta[(gid, uid)]
+            for k, v in exp.items():
+                if k == "hour_buckets":
+                    ok = len(got[k]) == 24 and all(_close(a, b) for a, b in zip(got[k], v))
+                elif k == "pair_time":
+                    ok = set(got[k]) == set(v) and all(_close(got[k][o], v[o]) for o in v)
+                else:
+                    ok = _close(got.get(k, 0), v)
+                if not ok:
+                    result.errors.append(f"{gid}/{uid} meta.{k}: got={got.get(k)} want={v}")
+
+            bg = result.timed("get_rank_bg_key", store.get_rank_bg_key, gid, uid)
+            if bg is not None and not isinstance(bg, str):
+                result.errors.append(f"{gid}/{uid} get_rank_bg_key: {bg!r}")
+
+    if store.get_voice_meta(workload.guild_ids()[0], 1) != new_voice_meta():
+        result.errors.append("get_voice_meta が未登録ユーザーに new_voice_meta() を返さない")
+
+
+def run_backend(name: str, factory: Callable[[str], BaseStore], workload: Workload) -> Result:
+    result = Result(name)
+    workdir = tempfile.mkdtemp(prefix=f"store-bench-{name}-")
+    try:
+        tracemalloc.start()
+        started = time.perf_counter()
+
+        store = factory(workdir)
+        for gid, voice, metas, text in workload.ticks_iter():
+            result.timed("add_voice_xp_many", store.add_voice_xp_many, gid, voice)
+            for uid, delta in metas:
+                result.timed("add_voice_meta", store.add_voice_meta, gid, uid, **delta)
+            for uid, v in text.items():
+                result.timed("add_text_xp", store.add_text_xp, gid, uid, v)
+        result.timed("flush", store.flush)
+
+        result.elapsed = time.perf_counter() - started
+        result.peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        check_conformance(store, workload, result)
+        store.close()
+    except Exception as e:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        result.errors.append(f"{type(e).__name__}: {e}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def print_report(results: List[Result]):
+    print(f"{'backend':<14}{'write ops/s':>12}{'peak MiB':>10}  result")
+    for r in results:
+        write_ops = sum(len(v) for k, v in r.latencies.items() if k.startswith("add_"))
+        ops_sec = write_ops / r.elapsed if r.elapsed else 0.0
+        status = "ok" if not r.errors else f"NG ({len(r.errors)})"
+        print(f"{r.name:<14}{ops_sec:>12,.0f}{r.peak_bytes / 2**20:>10.1f}  {status}")
+
+    print()
+    print(f"{'backend':<14}{'op':<22}{'count':>8}{'p50 us':>10}{'p99 us':>10}")
+    for r in results:
+        for op, values in sorted(r.latencies.items()):
+            print(
+                f"{r.name:<14}{op:<22}{len(values):>8}"
+                f"{_pct(values, 0.50) * 1e6:>10.1f}{_pct(values, 0.99) * 1e6:>10.1f}"
+            )
+
+    for r in results:
+        for err in r.errors[:10]:
+            print(f"[{r.name}] {err}")
+        if len(r.errors) > 10:
+            print(f"[{r.name}] ... 他 {len(r.errors) - 10} 件")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="BaseStore バックエンドの適合性チェック + ベンチマーク")
+    parser.add_argument("--guilds", type=int, default=3)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--ticks", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--backends",
+        default=",".join(BACKENDS),
+        help=f"カンマ区切り（{', '.join(BACKENDS)}）",
+    )
+    parser.add_argument(
+        "--dynamo-latency-ms",
+        type=float,
+        default=0.0,
+        help="dynamo-local で 1 回の呼び出しごとに待つミリ秒",
+    )
+    args = parser.parse_args(argv)
+
+    global DYNAMO_LATENCY
+    DYNAMO_LATENCY = args.dynamo_latency_ms / 1000
+
+    workload = Workload(args.guilds, args.users, args.ticks, args.seed)
+    names = [n.strip() for n in args.backends.split(",") if n.strip()]
+    unknown = [n for n in names if n not in BACKENDS]
+    if unknown:
+        parser.error(f"unknown backend: {', '.join(unknown)}")
+
+    print(
+        f"workload: {args.guilds} guilds x {args.users} users x {args.ticks} ticks "
+        f"(seed={args.seed})\n"
+    )
+    results = [run_backend(name, BACKENDS[name], workload) for name in names]
+    print_report(results)
+    return 1 if any(r.errors for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,19 +7,16 @@ import re
 from typing import Optional
 
 from config import debug_log
-from data.guild_config_store import GuildConfigStore
+from data import async_store as store
 
 jst = pytz.timezone("Asia/Tokyo")
 
-# ギルド設定の読み取り用（DynamoDB）
-guild_config_store = GuildConfigStore()
-
 
 class ArchiveManagerCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
-    def _get_archive_category(self, guild: discord.Guild) -> Optional[discord.CategoryChannel]:
+    async def _get_archive_category(self, guild: discord.Guild) -> Optional[discord.CategoryChannel]:
         """
         ギルド設定テーブルからアーカイブ用カテゴリー情報を取得して、
         実際の CategoryChannel オブジェクトに変換する。
@@ -27,21 +24,17 @@ class ArchiveManagerCog(commands.Cog):
           1) config.archive.category_id
           2) config.archive.category_name
         """
-        cfg = guild_config_store.get_config(guild.id) or {}
-        archive_cfg = cfg.get("archive") or {}
+        # 不正な category_id は GuildConfig への変換時にログ済み（None になる）
+        cfg = await store.get_guild_config(guild.id)
 
-        cat_id_raw = archive_cfg.get("category_id")
-        cat_name = archive_cfg.get("category_name")
+        cat_id = cfg.archive.category_id
+        cat_name = cfg.archive.category_name
 
         # 1) ID 指定があれば優先して使う
-        if cat_id_raw:
-            try:
-                cat_id = int(cat_id_raw)
-                ch = guild.get_channel(cat_id)
-                if isinstance(ch, discord.CategoryChannel):
-                    return ch
-            except (TypeError, ValueError):
-                debug_log(f"[ARCHIVE] invalid category_id in config: {cat_id_raw}")
+        if cat_id:
+            ch = guild.get_channel(cat_id)
+            if isinstance(ch, discord.CategoryChannel):
+                return ch
 
         # 2) 名前指定があれば名前から検索
         if cat_name:
@@ -89,7 +82,7 @@ class ArchiveManagerCog(commands.Cog):
             return
 
         # ★ ここが DB 参照になったところ
-        category = self._get_archive_category(guild)
+        category = await self._get_archive_category(guild)
         if category is None:
             await interaction.response.send_message(
                 "⚠ アーカイブ用カテゴリーが設定されていません。\n"
@@ -6,14 +6,11 @@ from discord.ext import commands
 
 from utils.channel_manager import ChannelManager
 from config import debug_log
-from data.guild_config_store import GuildConfigStore
+from data import async_store as store
 
 # タイムゾーン設定
 jst = pytz.timezone("Asia/Tokyo")
 
-# 🔹 ギルド設定(DynamoDB) 用
-config_store = GuildConfigStore()
-
 # ロガー設定（標準出力のみ）
 logger = logging.getLogger("message_handler")
 logger.setLevel(logging.INFO)
@@ -31,7 +28,7 @@ class MessageHandlerCog(commands.Cog):
         self.bot = bot
         self.channel_manager = ChannelManager(bot)
 
-    def is_excluded(self, channel: discord.abc.GuildChannel) -> bool:
+    async def is_excluded(self, channel: discord.abc.GuildChannel) -> bool:
         """
         チャンネルが「除外カテゴリー」に属しているかどうかを、
         DynamoDB の guild_config から判定する。
@@ -46,20 +43,9 @@ class MessageHandlerCog(commands.Cog):
         if guild is None:
             return False
 
-        cfg = config_store.get_config(guild.id) or {}
-        profile_cfg = cfg.get("profile") or {}
-
-        raw_ids = profile_cfg.get("excluded_category_ids") or []
-
-        # 文字列／数値どちらでも扱えるように int 化してセットに
-        excluded_ids = set()
-        for x in raw_ids:
-            try:
-                excluded_ids.add(int(x))
-            except (TypeError, ValueError):
-                continue
-
-        return channel.category.id in excluded_ids
+        # 除外カテゴリは GuildConfig 側で frozenset[int] に変換済み
+        cfg = await store.get_guild_config(guild.id)
+        return channel.category.id in cfg.profile.excluded_category_ids
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
@@ -86,7 +72,7 @@ class MessageHandlerCog(commands.Cog):
             return
 
         # 🔹 除外カテゴリー判定（DynamoDB ベース）
-        if self.is_excluded(message.channel):
+        if await self.is_excluded(message.channel):
             cat_id = message.channel.category.id if message.channel.category else "N/A"
             debug_log(f"[SKIP] `{message.channel.name}` は除外カテゴリー (`{cat_id}`) に属するため無視")
             return
@@ -8,41 +8,33 @@ from utils.helpers import voice_users_autocomplete
 from utils.countdown import countdown_procedure, countdown_active
 from utils.messages import get_random_success_message
 
-# ★ DB からギルド設定を取るための Store
-from data.guild_config_store import GuildConfigStore
-
-# グローバルに1個だけ作って使い回し
-guild_config_store = GuildConfigStore()
+# ★ DB からギルド設定を取るための Store（スレッドプール経由で await）
+from data import async_store as store
+from data.guild_config import OyanmoConfig
 
 
 class OyanmoCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
-    def _get_oyanmo_config(self, guild_id: int) -> dict:
+    async def _get_oyanmo_config(self, guild_id: int) -> OyanmoConfig:
         """
-        ギルドごとのおやんも設定を DynamoDB から取得。
-        何もなければ空 dict を返す。
+        ギルドごとのおやんも設定を DynamoDB から取得（変換済み・キャッシュ経由）。
+        何もなければデフォルト値の OyanmoConfig を返す。
         """
-        config = guild_config_store.get_config(guild_id) or {}
-        oyanmo_cfg = config.get("oyanmo") or {}
-        return oyanmo_cfg
+        config = await store.get_guild_config(guild_id)
+        return config.oyanmo
 
-    def _get_target_voice_channel(
+    async def _get_target_voice_channel(
         self, guild: discord.Guild
     ) -> Optional[discord.VoiceChannel]: 
         """
         oyanmo 設定から target_voice_channel_id を取得して、
         実際の VoiceChannel オブジェクトに変換する。
         """
-        oyanmo_cfg = self._get_oyanmo_config(guild.id)
-        raw_id = oyanmo_cfg.get("target_voice_channel_id")
-        if not raw_id:
-            return None
-
-        try:
-            chan_id = int(raw_id)
-        except (TypeError, ValueError):
+        oyanmo_cfg = await self._get_oyanmo_config(guild.id)
+        chan_id = oyanmo_cfg.target_voice_channel_id
+        if not chan_id:
             return None
 
         ch = guild.get_channel(chan_id) or self.bot.get_channel(chan_id)
@@ -50,7 +42,7 @@ class OyanmoCog(commands.Cog):
             return ch
         return None
 
-    def _is_allowed_user(self, interaction: discord.Interaction) -> bool:
+    async def _is_allowed_user(self, interaction: discord.Interaction) -> bool:
         """
         allowed_role_ids が設定されている場合、
         そのいずれかのロールを持っているユーザーだけ /おやんも を実行可能にする。
@@ -62,17 +54,11 @@ class OyanmoCog(commands.Cog):
         if guild is None or not isinstance(user, discord.Member):
             return False
 
-        oyanmo_cfg = self._get_oyanmo_config(guild.id)
-        raw_roles = oyanmo_cfg.get("allowed_role_ids") or []
-
-        # 設定が空なら制限なし
-        if not raw_roles:
-            return True
+        oyanmo_cfg = await self._get_oyanmo_config(guild.id)
+        allowed_role_ids = oyanmo_cfg.allowed_role_ids
 
-        try:
-            allowed_role_ids = {int(r) for r in raw_roles}
-        except (TypeError, ValueError):
-            # 変な値が入っていたら、とりあえず全員許可にしておく
+        # 設定が空（変な値しか入っていない場合も含む）なら制限なし
+        if not allowed_role_ids:
             return True
 
         user_role_ids = {role.id for role in user.roles}
@@ -99,7 +85,7 @@ class OyanmoCog(commands.Cog):
             return
 
         # 権限チェック（allowed_role_ids）
-        if not self._is_allowed_user(interaction):
+        if not await self._is_allowed_user(interaction):
             await interaction.followup.send(
                 "❌ このサーバーでは、あなたは `/おやんも` を実行できません。", ephemeral=True
             )
@@ -116,7 +102,7 @@ class OyanmoCog(commands.Cog):
             return
 
         # ★ ここが DB からの取得に変わったところ
-        target_channel = self._get_target_voice_channel(guild)
+        target_channel = await self._get_target_voice_channel(guild)
         if not isinstance(target_channel, discord.VoiceChannel):
             await interaction.followup.send(
                 "❌ おやんも先のボイスチャンネルが設定されていません。\n"
@@ -140,7 +126,7 @@ class OyanmoCog(commands.Cog):
             )
         else:
             await target_member.move_to(target_channel)
-            embed.description = get_random_success_message(
+            embed.description = await get_random_success_message(
                 guild.id,
                 target_member.display_name,
             )
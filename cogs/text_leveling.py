@@ -2,7 +2,7 @@ import time
 import discord
 from discord.ext import commands
 
-from data.store import add_text_xp
+from data import async_store as store
 
 
 COOLDOWN_SECONDS = 10  # 1ユーザーあたり10秒クールダウン
@@ -59,7 +59,7 @@ class TextLeveling(commands.Cog):
         if xp <= 0:
             return
 
-        add_text_xp(guild_id, user_id, xp)
+        await store.add_text_xp(guild_id, user_id, xp)
         self._last_given_ts[key] = now
 
         # デバッグ用
@@ -10,16 +10,15 @@ from discord.ext import commands
 
 from utils.helpers import normalize_text_channel_name
 from utils.channel_manager import ChannelManager
-from data.guild_config_store import GuildConfigStore
+from data import async_store as store
+from data.guild_config import GuildConfig, ProfileConfig
 from utils.helpers import load_profile_messages, save_profile_messages
+from utils.voice_sessions import refresh_voice_session
 from config import debug_log
 
 # JST設定
 jst = pytz.timezone("Asia/Tokyo")
 
-# DynamoDB guild_config
-config_store = GuildConfigStore()
-
 # ログ設定（省略）
 
 
@@ -30,49 +29,38 @@ class VoiceEventsCog(commands.Cog):
         self.join_message_tracking = {}  # {user_id: (channel_id, message_id)}
         self.profile_message_map = load_profile_messages()
 
-    # 🔹 設定値取得の共通メソッド
-    def _get_config(self, guild_id):
-        return config_store.get_config(guild_id) or {}
+    # 🔹 設定値取得の共通メソッド（変換済み・キャッシュ経由）
+    async def _get_config(self, guild_id) -> GuildConfig:
+        return await store.get_guild_config(guild_id)
 
     # 🔹 除外カテゴリ判定
-    def is_excluded(self, channel: discord.abc.GuildChannel) -> bool:
+    async def is_excluded(self, channel: discord.abc.GuildChannel) -> bool:
         if channel is None or channel.category is None:
             return False
 
-        cfg = self._get_config(channel.guild.id)
-        profile_cfg = cfg.get("profile") or {}
-        raw_ids = profile_cfg.get("excluded_category_ids") or []
-
-        excluded_ids = {int(cid) for cid in raw_ids if str(cid).isdigit()}
-        return channel.category.id in excluded_ids
+        cfg = await self._get_config(channel.guild.id)
+        return channel.category.id in cfg.profile.excluded_category_ids
 
     # 🔹 退出後に削除しないカテゴリ
-    def is_delete_excluded_category(self, category_id, guild_id):
-        cfg = self._get_config(guild_id)
-        profile_cfg = cfg.get("profile") or {}
-        raw_ids = profile_cfg.get("leave_message_delete_excluded_category_ids") or []
-
-        excluded_ids = {int(cid) for cid in raw_ids if str(cid).isdigit()}
-        return category_id in excluded_ids
+    async def is_delete_excluded_category(self, category_id, guild_id):
+        cfg = await self._get_config(guild_id)
+        return category_id in cfg.profile.leave_message_delete_excluded_category_ids
 
     # 🔹 プロフ探索チャンネル
-    def get_profile_source_channels(self, guild_id):
-        cfg = self._get_config(guild_id)
-        profile_cfg = cfg.get("profile") or {}
-        return [int(cid) for cid in profile_cfg.get("profile_source_channel_ids") or []]
+    async def get_profile_source_channels(self, guild_id):
+        cfg = await self._get_config(guild_id)
+        return cfg.profile.profile_source_channel_ids
 
     # 🔹 性別ロール設定
-    def get_gender_role_colors(self, guild_id):
-        cfg = self._get_config(guild_id)
-        profile_cfg = cfg.get("profile") or {}
-
-        gender_roles = profile_cfg.get("gender_roles") or {}
-        # 例：
+    async def get_gender_role_colors(self, guild_id) -> ProfileConfig:
+        # profile.gender_roles の例：
         # {
         #   "male": {"role_id": 11111, "color": 0x206694},
         #   "female": {"role_id": 22222, "color": 0xff00ff}
         # }
-        return gender_roles
+        # → ProfileConfig.male / female（GenderRole）に変換済み
+        cfg = await self._get_config(guild_id)
+        return cfg.profile
 
     # ===============================
     #   Voice update メイン処理
@@ -82,11 +70,20 @@ class VoiceEventsCog(commands.Cog):
         guild = member.guild
         guild_id = guild.id
 
+        # =========
+        #  VC セッション区間（XP / 統計の秒単位計測）
+        # =========
+        # 入室 / 退室 / 移動 / ミュート切替のたびに区間を閉じて開き直す
+        try:
+            await refresh_voice_session(member, before, after)
+        except Exception as e:
+            print(f"[VoiceEvents] refresh_voice_session error: {e}")
+
         # =========
         #  退室処理
         # =========
         if before.channel and before.channel != after.channel:
-            if not self.is_excluded(before.channel):
+            if not await self.is_excluded(before.channel):
                 text_channel = await self.channel_manager.get_or_create_text_channel(guild, before.channel)
 
                 embed = discord.Embed(
@@ -105,7 +102,7 @@ class VoiceEventsCog(commands.Cog):
                 if member_count == 0:
                     category_id = before.channel.category_id
 
-                    if not self.is_delete_excluded_category(category_id, guild_id):
+                    if not await self.is_delete_excluded_category(category_id, guild_id):
                         await self.delete_all_messages_from_channel(before.channel)
                     else:
                         debug_log(f"[SKIP DELETE] {before.channel.name} は削除しないカテゴリ")
@@ -128,7 +125,7 @@ class VoiceEventsCog(commands.Cog):
         #  入室処理
         # =========
         if after.channel and before.channel != after.channel:
-            if not self.is_excluded(after.channel):
+            if not await self.is_excluded(after.channel):
                 text_channel = await self.channel_manager.get_or_create_text_channel(guild, after.channel)
 
                 embed = discord.Embed(
@@ -146,14 +143,14 @@ class VoiceEventsCog(commands.Cog):
 
                 # 前チャンネルが 0人なら削除
                 if before.channel and len(before.channel.members) == 0:
-                    if not self.is_delete_excluded_category(before.channel.category_id, guild_id):
+                    if not await self.is_delete_excluded_category(before.channel.category_id, guild_id):
                         await self.delete_all_messages_from_channel(before.channel)
 
     # ===============================
     #  プロフィールリンク探索
     # ===============================
     async def find_latest_message_link(self, member):
-        channels = self.get_profile_source_channels(member.guild.id)
+        channels = await self.get_profile_source_channels(member.guild.id)
 
         for cid in channels:
             ch = self.bot.get_channel(cid)
@@ -174,19 +171,21 @@ class VoiceEventsCog(commands.Cog):
         display_name = member.nick or member.display_name
 
         # 🔹 性別ロール設定
-        gender_cfg = self.get_gender_role_colors(member.guild.id)
+        gender_cfg = await self.get_gender_role_colors(member.guild.id)
 
         embed_color = 0x2ECC71  # default
 
+        role_ids = {r.id for r in member.roles}
+
         # male
-        male = gender_cfg.get("male")
-        if male and int(male["role_id"]) in [r.id for r in member.roles]:
-            embed_color = int(male["color"])
+        male = gender_cfg.male
+        if male and male.role_id in role_ids:
+            embed_color = male.color
 
         # female
-        female = gender_cfg.get("female")
-        if female and int(female["role_id"]) in [r.id for r in member.roles]:
-            embed_color = int(female["color"])
+        female = gender_cfg.female
+        if female and female.role_id in role_ids:
+            embed_color = female.color
 
         # メッセージ作成
         intro = random.choice([
@@ -1,215 +1,173 @@
 # cogs/voice_leveling.py
 
+import asyncio
+import time
 from discord.ext import commands, tasks
-from datetime import datetime, timezone, timedelta
 
-from data.store import (
-    add_voice_xp,
-    get_guild_user_stats,
-    get_voice_meta,      # 統計メタ情報の取得（JsonStore 経由）
-    update_voice_meta,   # 統計メタ情報の更新（JsonStore 経由）
+from config import (
+    VOICE_DAILY_FLUSH_INTERVAL_SECONDS,
+    VOICE_FLUSH_INTERVAL_SECONDS,
+    VOICE_ROLLUP_INTERVAL_SECONDS,
 )
-from data.guild_config_store import GuildConfigStore
-
-# ★ 日次VC集計テーブルへの書き込み
-from data.voice_daily_store import add_daily_voice_minutes
-
-
-# ===== XP計算ロジック =====
-def calc_voice_xp_per_minute(member_count: int, is_muted: bool) -> float:
-    """
-    1分あたりのボイスXPを計算する。
-    式: XP = 0.3 × 人数ボーナス × ミュート倍率
-    """
-    base = 0.3
-
-    # 人数ボーナス
-    if member_count <= 1:
-        bonus = 0.8
-    elif member_count <= 3:
-        bonus = 1.2
-    elif member_count <= 6:
-        bonus = 1.5
-    else:
-        bonus = 2.0
-
-    # ミュート倍率
-    mute_factor = 0.5 if is_muted else 1.0
-
-    return base * bonus * mute_factor
-
-
-# タイムゾーン（JSTで集計したい場合）
-JST = timezone(timedelta(hours=9))
+from data import async_store as store  # DynamoDB 呼び出しはスレッドプール経由で await
+# 区間の計測と XP 計算ロジック（calc_voice_xp_per_minute）は utils.voice_sessions
+from utils.voice_sessions import voice_sessions, resync_voice_sessions
+from utils.helpers import jst_now
+from utils.metrics import metrics
 
 
 class VoiceLeveling(commands.Cog):
     """VCレベリング & 統計"""
 
+    # voice_snapshot_loop の周期（秒）
+    TICK_SECONDS = 60
+
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.guild_config_store = GuildConfigStore() 
+
+        # 前回 tick の monotonic 時刻（遅延の計測用）
+        self._last_tick_mono = None
+
+        # 前回 tick の JST の日付（日付が変わったら前日分の日次バッファを書き切る）
+        self._last_tick_day = jst_now().date()
 
         # VCスナップショットループ開始
         self.voice_snapshot_loop.start()
         print("[VoiceLeveling] voice_snapshot_loop started")
 
-    def cog_unload(self):
+        # バッファ flush ループ開始
+        self.voice_flush_loop.start()
+        self.voice_daily_flush_loop.start()
+
+        # 日次VC集計の週 / 月まとめループ開始
+        self.voice_rollup_loop.start()
+
+    async def cog_unload(self):
         # Cogアンロード時にループ停止
         self.voice_snapshot_loop.cancel()
-
-    @tasks.loop(seconds=60)
+        self.voice_flush_loop.cancel()
+        self.voice_daily_flush_loop.cancel()
+        self.voice_rollup_loop.cancel()
+
+        # 開いている区間をここまでで精算してから、溜まっている分を書き切る
+        voice_sessions.close_all()
+        voice_sessions.save_state()
+        await store.flush_voice_buffer(deadline=None)
+        await store.flush_daily_buffer(wait=True)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # 起動時 / 再接続時に、取りこぼした入退室イベントを今の VC 状態で補正する
+        await resync_voice_sessions(self.bot)
+        print(f"[VoiceLeveling] voice sessions synced: {len(voice_sessions)} members")
+
+    @tasks.loop(seconds=TICK_SECONDS)
     async def voice_snapshot_loop(self):
         """
-        60秒ごとにVC参加者にXP & 統計を付与する。
+        60秒ごとに、開いている VC セッション区間をここまでで精算する。
+
+        入退室・移動・ミュート切替は VoiceEventsCog.on_voice_state_update が
+        区間を閉じる / 開くので、ここでは全ギルドの VC を走査しない。
+        （長時間いる人の経過分をバッファに反映させるためだけのチェックポイント）
         統計値（total_time など）はすべて『分』でカウントする。
         """
-        TICK_SECONDS = 60
-        TICK_MINUTES = TICK_SECONDS / 60.0  # = 1.0 分
+        started = time.monotonic()
 
-        for guild in self.bot.guilds:
-            # ==========================
-            # ギルドごとの設定取得
-            # ==========================
-            cfg = self.guild_config_store.get_config(guild.id) or {}
-            leveling_cfg = cfg.get("leveling") or {}
+        # 経過時間は区間ごとに monotonic で測っているので、tick が遅れても
+        # 「実際に経過した秒数」（上限 VOICE_MAX_CREDIT_SECONDS）がそのまま積まれる
+        if self._last_tick_mono is not None:
+            interval = started - self._last_tick_mono
+            metrics.observe("voice.tick.interval", interval)
+            metrics.observe("voice.tick.lateness", max(0.0, interval - self.TICK_SECONDS))
+        self._last_tick_mono = started
 
-            raw_ignored_cat = leveling_cfg.get("ignored_category_ids", []) or []
-            raw_ignored_ch  = leveling_cfg.get("ignored_channel_ids", []) or []
+        checkpointed = voice_sessions.checkpoint()
+        metrics.set_gauge("voice.open_sessions", checkpointed)
 
-            try:
-                ignored_category_ids = {int(x) for x in raw_ignored_cat}
-            except (TypeError, ValueError):
-                ignored_category_ids = set()
+        # 最後に精算した時刻を保存（再起動後に同じ時間帯を二重に積まない）
+        await asyncio.to_thread(voice_sessions.save_state)
 
-            try:
-                ignored_channel_ids = {int(x) for x in raw_ignored_ch}
-            except (TypeError, ValueError):
-                ignored_channel_ids = set()
-
-            # print(f"[VoiceLeveling] guild={guild.id} ignored_cat={ignored_category_ids}, ignored_ch={ignored_channel_ids}")
-
-            for vc in guild.voice_channels:
-                # ==========================
-                # 除外カテゴリ / 除外チャンネル判定
-                # ==========================
-                # チャンネルIDが除外対象
-                if vc.id in ignored_channel_ids:
-                    continue
-
-                # カテゴリIDが除外対象
-                if vc.category and vc.category.id in ignored_category_ids:
-                    continue
-
-                # Bot 以外の参加メンバーだけを見る
-                members = [m for m in vc.members if not m.bot]
-                if not members:
-                    continue
-
-                member_count = len(members)
-
-                for member in members:
-                    state = member.voice
-                    if state is None:
-                        continue
-
-                    is_muted = bool(
-                        state.self_mute
-                        or state.self_deaf
-                        or state.mute
-                        or state.deaf
-                    )
-
-                    # ===== XP付与 =====
-                    xp = calc_voice_xp_per_minute(member_count, is_muted)
-                    add_voice_xp(guild.id, member.id, xp)
-
-                    # ===== 統計メタ情報 =====
-                    meta = get_voice_meta(guild.id, member.id)
-
-                    meta["total_time"] = float(meta.get("total_time", 0.0)) + TICK_MINUTES
-
-                    if member_count == 1:
-                        key = "solo_time"
-                    elif 2 <= member_count <= 3:
-                        key = "small_group_time"
-                    elif 4 <= member_count <= 6:
-                        key = "mid_group_time"
-                    else:
-                        key = "big_group_time"
-
-                    meta[key] = float(meta.get(key, 0.0)) + TICK_MINUTES
-
-                    if is_muted:
-                        meta["muted_time"] = float(meta.get("muted_time", 0.0)) + TICK_MINUTES
-
-                    meta["max_member_count"] = max(
-                        int(meta.get("max_member_count", 0)),
-                        member_count,
-                    )
-
-                    hour_buckets = meta.get("hour_buckets")
-                    if not isinstance(hour_buckets, list) or len(hour_buckets) != 24:
-                        hour_buckets = [0.0] * 24
-
-                    now = datetime.now(JST)
-                    current_hour = now.hour
-                    hour_buckets[current_hour] += TICK_MINUTES
-                    meta["hour_buckets"] = hour_buckets
-
-                    pair_time = meta.get("pair_time")
-                    if not isinstance(pair_time, dict):
-                        pair_time = {}
-
-                    others = [m for m in members if m.id != member.id]
-                    for other in others:
-                        oid = str(other.id)
-                        prev = float(pair_time.get(oid, 0.0))
-                        pair_time[oid] = prev + TICK_MINUTES
-
-                    meta["pair_time"] = pair_time
-
-                    update_voice_meta(guild.id, member.id, meta)
-
-                    # ===== 日次VC集計テーブル =====
-                    try:
-                        solo = small = mid = big = 0.0
-                        if member_count == 1:
-                            solo = TICK_MINUTES
-                        elif 2 <= member_count <= 3:
-                            small = TICK_MINUTES
-                        elif 4 <= member_count <= 6:
-                            mid = TICK_MINUTES
-                        else:
-                            big = TICK_MINUTES
-
-                        muted = TICK_MINUTES if is_muted else 0.0
-
-                        add_daily_voice_minutes(
-                            guild_id=guild.id,
-                            user_id=member.id,
-                            total_min=TICK_MINUTES,
-                            solo_min=solo,
-                            small_group_min=small,
-                            mid_group_min=mid,
-                            big_group_min=big,
-                            muted_min=muted,
-                        )
-                    except Exception as e:
-                        print(f"[VoiceLeveling] add_daily_voice_minutes error: {e}")
-
-        # （この下の total_users 集計部分はそのままでOK）
-
-        # 各ギルドごとの保存済みユーザー数を集計
-        total_users = 0
-        for guild in self.bot.guilds:
-            stats = get_guild_user_stats(guild.id)  # { user_id: {voice_xp, text_xp} }
-            total_users += len(stats)
+        metrics.observe("voice.tick.duration", time.monotonic() - started)
+
+        # JST の日付が変わったら、前日分の日次バッファをすぐ書く（次の定期 flush を待たない）
+        today = jst_now().date()
+        if today != self._last_tick_day:
+            self._last_tick_day = today
+            summary = await store.flush_daily_buffer(before=today)
+            print(f"[VoiceLeveling] daily buffer flushed at rollover: {summary}")
+
+        # tick ごとにテーブルを Query して保存済みユーザー数を数えるのはやめた。
+        # 代わりに data.store が新規作成のたびに store.users_created_since_boot を積み上げる
+        # （起動してから作成した数で、保存済みの総数ではない）
 
     @voice_snapshot_loop.before_loop
     async def before_voice_snapshot_loop(self):
         await self.bot.wait_until_ready()
 
+    @tasks.loop(seconds=VOICE_FLUSH_INTERVAL_SECONDS)
+    async def voice_flush_loop(self):
+        """
+        voice_snapshot_loop / on_voice_state_update が積んだ加算を、
+        (guild, user) ごとにまとめて DynamoDB に書き込む。
+        """
+        started = time.monotonic()
+        summary = await store.flush_voice_buffer()
+
+        metrics.observe("voice.flush.duration", time.monotonic() - started)
+        metrics.incr("voice.flush.processed", summary.processed)
+        metrics.incr("voice.flush.deferred", summary.deferred)
+        metrics.incr("voice.flush.failed", summary.failed)
+        metrics.set_gauge("voice.flush.carried", summary.carried)
+
+        if summary:
+            print(f"[VoiceLeveling] voice buffer flushed: {summary}")
+
+    @voice_flush_loop.before_loop
+    async def before_voice_flush_loop(self):
+        await self.bot.wait_until_ready()
+        # 起動直後の空 flush は不要なので 1 周期待ってから始める
+        await asyncio.sleep(VOICE_FLUSH_INTERVAL_SECONDS)
+
+    @tasks.loop(seconds=VOICE_DAILY_FLUSH_INTERVAL_SECONDS)
+    async def voice_daily_flush_loop(self):
+        """日次テーブルの分数を (guild, date, user) ごとにまとめて書き込む。"""
+        started = time.monotonic()
+        summary = await store.flush_daily_buffer()
+
+        metrics.observe("voice.daily_flush.duration", time.monotonic() - started)
+        metrics.incr("voice.daily_flush.processed", summary.processed)
+        metrics.incr("voice.daily_flush.failed", summary.failed)
+        metrics.set_gauge("voice.daily_flush.carried", summary.carried)
+
+        if summary:
+            print(f"[VoiceLeveling] daily buffer flushed: {summary}")
+
+    @voice_daily_flush_loop.before_loop
+    async def before_voice_daily_flush_loop(self):
+        await self.bot.wait_until_ready()
+        # 起動直後の空 flush は不要なので 1 周期待ってから始める
+        await asyncio.sleep(VOICE_DAILY_FLUSH_INTERVAL_SECONDS)
+
+    @tasks.loop(seconds=VOICE_ROLLUP_INTERVAL_SECONDS)
+    async def voice_rollup_loop(self):
+        """
+        閉じた週 / 月の日次VC集計を集計行にまとめる（/zbadmin voicerank_period 用）。
+        まだ作っていない期間があるときだけ読み書きするので、普段はギルドごとに数回の GetItem。
+        """
+        created = 0
+        for guild in self.bot.guilds:
+            try:
+                created += await store.rollup_voice_daily(guild.id)
+            except Exception as e:
+                print(f"[VoiceLeveling] voice rollup error guild={guild.id}: {e!r}")
+        if created:
+            metrics.incr("voice.rollup.created", created)
+            print(f"[VoiceLeveling] voice daily rollups created: {created}")
+
+    @voice_rollup_loop.before_loop
+    async def before_voice_rollup_loop(self):
+        await self.bot.wait_until_ready()
+
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(VoiceLeveling(bot))
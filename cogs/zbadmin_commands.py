@@ -6,24 +6,14 @@ from discord.ext import commands
 from typing import Optional
 import logging
 
-from data.store import (
-    get_voice_xp,
-    get_text_xp,
-    add_voice_xp,        # ★ これを必ず入れる
-    add_text_xp,         # ★ これも必ず入れる
-    calc_level_from_xp,
-    get_voice_meta,
-    get_guild_user_stats,
-)
+# DynamoDB 呼び出しはすべてスレッドプール経由で await する
+from data import async_store as store
+from data.store import calc_level_from_xp, calc_levels
 
 from utils.helpers import _xp_for_level
+from utils.metrics import metrics
 import datetime
 
-from data.voice_daily_store import (
-    get_guild_total_minutes_in_range,
-    get_user_total_minutes_in_range,
-)
-
 logger = logging.getLogger(__name__)
 
 def _fmt_duration(sec: float) -> str:
@@ -217,8 +207,8 @@ class ZBAdmin(commands.Cog):
 
         guild_id = interaction.guild.id
 
-        voice_xp = get_voice_xp(guild_id, user.id)
-        text_xp = get_text_xp(guild_id, user.id)
+        voice_xp = await store.get_voice_xp(guild_id, user.id)
+        text_xp = await store.get_text_xp(guild_id, user.id)
 
         v_lv, v_cur, v_need = calc_level_from_xp(voice_xp)
         t_lv, t_cur, t_need = calc_level_from_xp(text_xp)
@@ -288,7 +278,7 @@ class ZBAdmin(commands.Cog):
         user_id = target.id
 
         # ===== メタ情報取得（分単位） =====
-        meta = get_voice_meta(guild_id, user_id)
+        meta = await store.get_voice_meta(guild_id, user_id)
 
         total_min = float(meta.get("total_time", 0.0))
         solo_min = float(meta.get("solo_time", 0.0))
@@ -491,11 +481,11 @@ class ZBAdmin(commands.Cog):
 
         # ★ 現在XPに「加算」する処理
         if target.value == "voice":
-            add_voice_xp(guild_id, user.id, xp)
-            new_xp = get_voice_xp(guild_id, user.id)
+            await store.add_voice_xp(guild_id, user.id, xp)
+            new_xp = await store.get_voice_xp(guild_id, user.id)
         else:
-            add_text_xp(guild_id, user.id, xp)
-            new_xp = get_text_xp(guild_id, user.id)
+            await store.add_text_xp(guild_id, user.id, xp)
+            new_xp = await store.get_text_xp(guild_id, user.id)
 
         # 新しいXPからレベル計算
         lv, cur, need = calc_level_from_xp(new_xp)
@@ -566,13 +556,13 @@ class ZBAdmin(commands.Cog):
         target_xp = _xp_for_level(level)
 
         if target.value == "voice":
-            current_xp = get_voice_xp(guild_id, user.id)
+            current_xp = await store.get_voice_xp(guild_id, user.id)
             delta = target_xp - current_xp
-            add_voice_xp(guild_id, user.id, delta)
+            await store.add_voice_xp(guild_id, user.id, delta)
         else:
-            current_xp = get_text_xp(guild_id, user.id)
+            current_xp = await store.get_text_xp(guild_id, user.id)
             delta = target_xp - current_xp
-            add_text_xp(guild_id, user.id, delta)
+            await store.add_text_xp(guild_id, user.id, delta)
 
         # 念のため結果を再計算して表示
         v_lv, v_cur, v_need = calc_level_from_xp(target_xp)
@@ -618,28 +608,20 @@ class ZBAdmin(commands.Cog):
 
         await interaction.response.defer(ephemeral=False)
 
-        stats = get_guild_user_stats(guild_id) or {}
-        entries: list[tuple[discord.Member, float, int]] = []
-
-        for uid_raw, data in stats.items():
-            try:
-                uid = int(uid_raw)
-            except (TypeError, ValueError):
-                continue
+        # XP降順（XP>0 のみ）で並んだものをそのまま使う
+        ranking = await store.get_xp_ranking(guild_id, "voice_xp")
+        members: list[tuple[discord.Member, float]] = []
 
+        for uid, voice_xp in ranking:
             member = guild.get_member(uid)
             if member is None:
                 continue
+            members.append((member, voice_xp))
 
-            voice_xp = float(data.get("voice_xp", 0.0))
-            if voice_xp <= 0:
-                continue
-
-            level, _, _ = calc_level_from_xp(voice_xp)
-            entries.append((member, voice_xp, level))
-
-        # XP降順でソート
-        entries.sort(key=lambda x: x[1], reverse=True)
+        levels = calc_levels(xp for _, xp in members)
+        entries: list[tuple[discord.Member, float, int]] = [
+            (member, xp, level) for (member, xp), level in zip(members, levels)
+        ]
 
         if not entries:
             await interaction.followup.send("まだボイスXPが記録されているメンバーがいないみたい…。")
@@ -690,27 +672,20 @@ class ZBAdmin(commands.Cog):
 
         await interaction.response.defer(ephemeral=False)
 
-        stats = get_guild_user_stats(guild_id) or {}
-        entries: list[tuple[discord.Member, float, int]] = []
-
-        for uid_raw, data in stats.items():
-            try:
-                uid = int(uid_raw)
-            except (TypeError, ValueError):
-                continue
+        # XP降順（XP>0 のみ）で並んだものをそのまま使う
+        ranking = await store.get_xp_ranking(guild_id, "text_xp")
+        members: list[tuple[discord.Member, float]] = []
 
+        for uid, text_xp in ranking:
             member = guild.get_member(uid)
             if member is None:
                 continue
+            members.append((member, text_xp))
 
-            text_xp = float(data.get("text_xp", 0.0))
-            if text_xp <= 0:
-                continue
-
-            level, _, _ = calc_level_from_xp(text_xp)
-            entries.append((member, text_xp, level))
-
-        entries.sort(key=lambda x: x[1], reverse=True)
+        levels = calc_levels(xp for _, xp in members)
+        entries: list[tuple[discord.Member, float, int]] = [
+            (member, xp, level) for (member, xp), level in zip(members, levels)
+        ]
 
         if not entries:
             await interaction.followup.send("まだテキストXPが記録されているメンバーがいないみたい…。")
@@ -789,7 +764,7 @@ class ZBAdmin(commands.Cog):
         top_n = max(1, min(top_n, 50))
         await interaction.response.defer(ephemeral=False)
 
-        totals = get_guild_total_minutes_in_range(
+        totals = await store.get_guild_total_minutes_in_range(
             guild_id=guild.id,
             date_from=start,
             date_to=end,
@@ -896,7 +871,7 @@ class ZBAdmin(commands.Cog):
         await interaction.response.defer(ephemeral=False)
 
         # 集計
-        total_min = get_user_total_minutes_in_range(
+        total_min = await store.get_user_total_minutes_in_range(
             guild_id=guild.id,
             user_id=target.id,
             date_from=start,
@@ -923,6 +898,51 @@ class ZBAdmin(commands.Cog):
 
         await interaction.followup.send(embed=embed)
 
+    # ------------------------
+    # /zbadmin metrics
+    # ------------------------
+    @zbadmin.command(
+        name="metrics",
+        description="Bot 内部のメトリクス（書き込み件数・tick 所要時間など）を表示します（管理者専用）",
+    )
+    async def show_metrics(
+        self,
+        interaction: discord.Interaction,
+    ):
+        if not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message(
+                "このコマンドは **管理者専用** だよ。",
+                ephemeral=True,
+            )
+            return
+
+        snap = metrics.snapshot()
+
+        embed = discord.Embed(
+            title="📟 ZERO BOT メトリクス",
+            color=discord.Color.dark_grey(),
+        )
+
+        def _fmt_num(v: float) -> str:
+            return f"{v:.3f}" if isinstance(v, float) and not v.is_integer() else f"{int(v)}"
+
+        counters = "\n".join(
+            f"`{k}`: {_fmt_num(v)}" for k, v in sorted(snap["counters"].items())
+        )
+        gauges = "\n".join(
+            f"`{k}`: {_fmt_num(v)}" for k, v in sorted(snap["gauges"].items())
+        )
+        timings = "\n".join(
+            f"`{k}`: last {t['last']:.3f} / avg {t['total'] / t['count']:.3f} / max {t['max']:.3f} (n={t['count']})"
+            for k, t in sorted(snap["timings"].items())
+        )
+
+        embed.add_field(name="Counters", value=counters[:1000] or "-", inline=False)
+        embed.add_field(name="Gauges", value=gauges[:1000] or "-", inline=False)
+        embed.add_field(name="Timings", value=timings[:1000] or "-", inline=False)
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
 
 class PeriodRankPaginator(discord.ui.View):
     """期間ランキング用のシンプルなページャ"""
@@ -15,6 +15,91 @@ DISCORD_BOT_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
 RANKCARD_S3_BUCKET = os.getenv("RANKCARD_S3_BUCKET", "zero-bot")
 RANKCARD_S3_PREFIX = os.getenv("RANKCARD_S3_PREFIX", "rankcard/")
 
+# ───────────────
+#  VC XP 書き込みバッファ
+# ───────────────
+# tick ごとの加算をメモリに溜めて、この間隔（秒）でまとめて DynamoDB に書く
+VOICE_FLUSH_INTERVAL_SECONDS = int(os.getenv("VOICE_FLUSH_INTERVAL_SECONDS", "300"))
+# 1回の flush で同時に書き込むユーザー数（STORE_THREAD_POOL_SIZE 以下にしておく）
+VOICE_FLUSH_CONCURRENCY = int(os.getenv("VOICE_FLUSH_CONCURRENCY", "4"))
+# 1回の flush でこの秒数を過ぎたら、まだ始めていないユーザーは次回に回す
+VOICE_FLUSH_DEADLINE_SECONDS = float(os.getenv("VOICE_FLUSH_DEADLINE_SECONDS", "30"))
+
+# 日次テーブルの分数はこの間隔（秒）でまとめて書く（JST の日付が変わったときと終了時にも書く）
+VOICE_DAILY_FLUSH_INTERVAL_SECONDS = int(os.getenv("VOICE_DAILY_FLUSH_INTERVAL_SECONDS", "1800"))
+# 日次テーブルへの 1 件の書き込みを、失敗したときに試す回数
+VOICE_DAILY_FLUSH_RETRIES = int(os.getenv("VOICE_DAILY_FLUSH_RETRIES", "3"))
+
+# ───────────────
+#  VC セッション計測
+# ───────────────
+# 1 区間として一度に精算する上限（秒）。tick が詰まったり切断していた分を盛らない
+VOICE_MAX_CREDIT_SECONDS = float(os.getenv("VOICE_MAX_CREDIT_SECONDS", "300"))
+# 最後に精算した時刻を保存するファイル（再起動をまたいで時計を戻さないため）
+VOICE_TICK_STATE_PATH = os.getenv("VOICE_TICK_STATE_PATH", "voice_tick_state.json")
+
+# ───────────────
+#  ストア呼び出し（boto3）用スレッドプール
+# ───────────────
+STORE_THREAD_POOL_SIZE = int(os.getenv("STORE_THREAD_POOL_SIZE", "8"))
+# 1回の DynamoDB 呼び出しをイベントループ側で待つ上限（秒）
+STORE_CALL_TIMEOUT_SECONDS = float(os.getenv("STORE_CALL_TIMEOUT_SECONDS", "10"))
+
+# 期間集計で日ごとの Query を同時に投げる本数（voice_daily_store 専用のスレッド数）
+DAILY_QUERY_CONCURRENCY = int(os.getenv("DAILY_QUERY_CONCURRENCY", "8"))
+
+# 日付が変わってからこの時間（時間）経ったら、その日を週 / 月の集計に含める
+VOICE_ROLLUP_GRACE_HOURS = float(os.getenv("VOICE_ROLLUP_GRACE_HOURS", "6"))
+# 閉じた週 / 月の集計ができているか確かめる間隔（秒）
+VOICE_ROLLUP_INTERVAL_SECONDS = int(os.getenv("VOICE_ROLLUP_INTERVAL_SECONDS", "3600"))
+
+# 閉じた日 / 週 / 月の期間集計を保存しておくディレクトリ（空文字ならキャッシュしない）
+VOICE_DAILY_CACHE_DIR = os.getenv("VOICE_DAILY_CACHE_DIR", "voice_daily_cache")
+# そのうちメモリにも載せておく件数（ギルド × 日）
+VOICE_DAILY_CACHE_MAX_ENTRIES = int(os.getenv("VOICE_DAILY_CACHE_MAX_ENTRIES", "4096"))
+
+# ───────────────
+#  ギルド設定キャッシュ
+# ───────────────
+# guild_config を DynamoDB から読み直すまでの秒数（save_config したギルドは即時反映）
+GUILD_CONFIG_CACHE_TTL_SECONDS = float(os.getenv("GUILD_CONFIG_CACHE_TTL_SECONDS", "60"))
+
+# ───────────────
+#  XP ランキング（メモリ上のインデックス）
+# ───────────────
+# ギルドのランキングを DynamoDB から読み直すまでの秒数（その間は XP 加算をその場で反映）
+LEADERBOARD_RELOAD_SECONDS = float(os.getenv("LEADERBOARD_RELOAD_SECONDS", "3600"))
+
+# ───────────────
+#  AWS（boto3）接続
+# ───────────────
+# DynamoDB のリージョン。テーブルは ap-northeast-1 にあるので、ホストの AWS_REGION /
+# AWS_DEFAULT_REGION には引きずられない（変えるときはこの DYNAMODB_REGION で明示する）
+DYNAMODB_REGION = os.getenv("DYNAMODB_REGION", "ap-northeast-1")
+# client ごとの HTTP 接続プールの大きさ（ストア用スレッド + 日次 Query 用スレッドが同時に使える数）
+AWS_MAX_POOL_CONNECTIONS = int(
+    os.getenv("AWS_MAX_POOL_CONNECTIONS", str(STORE_THREAD_POOL_SIZE + DAILY_QUERY_CONCURRENCY))
+)
+# 接続 / 応答待ちのタイムアウト（秒）。応答待ちは STORE_CALL_TIMEOUT_SECONDS に合わせて短めにする
+AWS_CONNECT_TIMEOUT_SECONDS = float(os.getenv("AWS_CONNECT_TIMEOUT_SECONDS", "3"))
+AWS_READ_TIMEOUT_SECONDS = float(os.getenv("AWS_READ_TIMEOUT_SECONDS", "10"))
+# 1 回の呼び出しで試す回数（初回を含む）と、リトライの方式（standard / adaptive / legacy）
+AWS_MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "3"))
+AWS_RETRY_MODE = os.getenv("AWS_RETRY_MODE", "standard")
+
+# ───────────────
+#  DynamoDB の代用品（オフラインの負荷試験用）
+# ───────────────
+# true にすると AWS には繋がず、data.local_dynamo のプロセス内テーブルを使う
+DYNAMODB_LOCAL = os.getenv("DYNAMODB_LOCAL", "False").lower() == "true"
+# 1 回の呼び出しごとに待つミリ秒（+ 0〜JITTER のばらつき）
+DYNAMODB_LOCAL_LATENCY_MS = float(os.getenv("DYNAMODB_LOCAL_LATENCY_MS", "0"))
+DYNAMODB_LOCAL_JITTER_MS = float(os.getenv("DYNAMODB_LOCAL_JITTER_MS", "0"))
+# 1 回の呼び出しがスロットリングされる確率（0〜1）
+DYNAMODB_LOCAL_THROTTLE_RATE = float(os.getenv("DYNAMODB_LOCAL_THROTTLE_RATE", "0"))
+# Query 1 ページの件数上限（0 なら上限なし）
+DYNAMODB_LOCAL_PAGE_SIZE = int(os.getenv("DYNAMODB_LOCAL_PAGE_SIZE", "0"))
+
 # ───────────────
 #  Discord Intents
 # ───────────────
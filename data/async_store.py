@@ -0,0 +1,262 @@
+# data/async_store.py
+"""
+data.store / data.voice_daily_store / GuildConfigStore の async 版。
+
+boto3 の呼び出しはすべてブロッキングなので、コルーチンから直接呼ぶと
+DynamoDB の応答待ちの間イベントループ（heartbeat も含む）が止まる。
+ここでは専用のスレッドプールで実行して await できるようにする。
+
+    from data import async_store as store
+    await store.add_voice_xp(gid, uid, xp)
+"""
+
+import asyncio
+import datetime
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import (
+    STORE_THREAD_POOL_SIZE,
+    STORE_CALL_TIMEOUT_SECONDS,
+    VOICE_FLUSH_CONCURRENCY,
+    VOICE_FLUSH_DEADLINE_SECONDS,
+)
+from data import store as _store
+from data.guild_config import GuildConfig
+from data.voice_buffer import FlushSummary
+
+# DynamoDB 呼び出し専用のスレッドプール
+# （asyncio のデフォルト executor と分けて、他の処理と取り合わないようにする）
+_executor = ThreadPoolExecutor(
+    max_workers=STORE_THREAD_POOL_SIZE,
+    thread_name_prefix="store",
+)
+
+
+async def run_blocking(
+    func: Callable[..., Any],
+    *args,
+    timeout: Optional[float] = STORE_CALL_TIMEOUT_SECONDS,
+    **kwargs,
+) -> Any:
+    """
+    ブロッキング関数をストア用スレッドプールで実行して結果を返す。
+
+    timeout 秒を超えたら asyncio.TimeoutError を投げる。
+    （スレッド側の処理は止まらないので、書き込みはそのまま完了しうる）
+    """
+    loop = asyncio.get_running_loop()
+    fut = loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+    if timeout is None:
+        return await fut
+    return await asyncio.wait_for(fut, timeout)
+
+
+def shutdown():
+    """プロセス終了時にスレッドプールを閉じて、バックエンドの未書き込み分を書き切る。"""
+    _executor.shutdown(wait=True)
+    _store.close_store()
+
+
+# =========================
+#  XP
+# =========================
+async def add_voice_xp(gid: int, uid: int, xp: float) -> None:
+    await run_blocking(_store.add_voice_xp, gid, uid, xp)
+
+async def get_voice_xp(gid: int, uid: int) -> float:
+    return await run_blocking(_store.get_voice_xp, gid, uid)
+
+async def add_text_xp(gid: int, uid: int, xp: float) -> None:
+    await run_blocking(_store.add_text_xp, gid, uid, xp)
+
+async def get_text_xp(gid: int, uid: int) -> float:
+    return await run_blocking(_store.get_text_xp, gid, uid)
+
+async def get_guild_user_stats(gid: int) -> Dict[int, Dict[str, float]]:
+    return await run_blocking(_store.get_guild_user_stats, gid)
+
+async def get_xp_rank(gid: int, uid: int, kind: str) -> Optional[Tuple[int, int]]:
+    # 読み込み済みのランキングならメモリ上で引くだけなので、スレッドプールを経由しない
+    if _store.leaderboard.peek(gid) is not None:
+        return _store.get_xp_rank(gid, uid, kind)
+    # 初回（と読み直し）はギルド全体を読むので、全体のタイムアウトはかけない
+    return await run_blocking(_store.get_xp_rank, gid, uid, kind, timeout=None)
+
+async def get_xp_ranking(
+    gid: int,
+    kind: str,
+    k: Optional[int] = None,
+    offset: int = 0,
+) -> List[Tuple[int, float]]:
+    if _store.leaderboard.peek(gid) is not None:
+        return _store.get_xp_ranking(gid, kind, k, offset)
+    return await run_blocking(_store.get_xp_ranking, gid, kind, k, offset, timeout=None)
+
+async def get_voice_meta(gid: int, uid: int) -> Dict[str, float]:
+    return await run_blocking(_store.get_voice_meta, gid, uid)
+
+async def update_voice_meta(gid: int, uid: int, meta: Dict[str, float]) -> None:
+    await run_blocking(_store.update_voice_meta, gid, uid, meta)
+
+async def get_rank_bg_key(gid: int, uid: int) -> str:
+    return await run_blocking(_store.get_rank_bg_key, gid, uid)
+
+# ループの flush と終了時の flush が重なって同じユーザーを取り合わないように
+_voice_flush_lock = asyncio.Lock()
+
+async def flush_voice_buffer(
+    *,
+    concurrency: int = VOICE_FLUSH_CONCURRENCY,
+    deadline: Optional[float] = VOICE_FLUSH_DEADLINE_SECONDS,
+) -> FlushSummary:
+    """
+    バッファの加算をユーザーごとに並列（最大 concurrency 件）で書き込む。
+
+    deadline 秒を過ぎたら、まだ始めていないユーザーは書かずに次回の flush に回す。
+    すでに書き込み中のものは途中で止めると二重加算になりうるので、最後まで待つ。
+    deadline=None なら全員書き切る（終了時用）。
+    """
+    async with _voice_flush_lock:
+        loop = asyncio.get_running_loop()
+        keys = _store.voice_buffer.begin_flush()
+        summary = FlushSummary()
+
+        sem = asyncio.Semaphore(max(1, min(concurrency, STORE_THREAD_POOL_SIZE)))
+        ends_at = None if deadline is None else loop.time() + deadline
+
+        async def _flush_one(key):
+            async with sem:
+                if ends_at is not None and loop.time() >= ends_at:
+                    summary.deferred += 1
+                    return
+                try:
+                    # タイムアウトはかけずに boto3 側のものに任せる。
+                    # （待つのをやめてもスレッド側の書き込みは続く。そのユーザーは書き終わるまで
+                    #   claim されたままなので、他の flush が二重に書くことはない）
+                    # deadline=None（終了時）は、キャンセルされた flush が書き込み中のユーザーも
+                    # 終わるのを待ってから残りを書く
+                    written = await run_blocking(
+                        _store.flush_voice_entry, key, wait=deadline is None, timeout=None,
+                    )
+                    if written:
+                        summary.processed += 1
+                    else:
+                        summary.deferred += 1
+                except Exception as e:
+                    print(f"[VoiceBuffer] flush error guild={key[0]} user={key[1]}: {e!r}")
+                    summary.failed += 1
+
+        await asyncio.gather(*(_flush_one(key) for key in keys))
+
+        summary.carried = _store.voice_buffer.end_flush()
+        return summary
+
+
+# =========================
+#  ギルド設定
+# =========================
+async def get_guild_config(guild_id: int) -> GuildConfig:
+    # キャッシュに載っていればスレッドプールを経由せずにそのまま返す
+    cfg = _store.guild_config_store.get_cached_guild_config(guild_id)
+    if cfg is None:
+        cfg = await run_blocking(_store.guild_config_store.get_guild_config, guild_id)
+    return cfg
+
+async def get_config(guild_id: int) -> dict:
+    """生の設定 dict（管理系で全体を見たいとき用）"""
+    cfg = await get_guild_config(guild_id)
+    return cfg.raw or {}
+
+async def save_config(guild_id: int, config: dict) -> None:
+    await run_blocking(_store.guild_config_store.save_config, guild_id, config)
+
+
+# =========================
+#  日次VC集計
+# =========================
+async def add_daily_voice_minutes(guild_id: int, user_id: int, **minutes) -> None:
+    # バッファに足すだけなのでスレッドプールは使わない（書き込みは flush_daily_buffer）
+    _store.add_daily_voice_minutes(guild_id, user_id, **minutes)
+
+# flush_daily_buffer が同時に走って同じ行を二重に書かないように
+_daily_flush_lock = asyncio.Lock()
+
+async def flush_daily_buffer(
+    *,
+    before: Optional[datetime.date] = None,
+    concurrency: int = VOICE_FLUSH_CONCURRENCY,
+    wait: bool = False,
+) -> FlushSummary:
+    """
+    日次バッファを (guild, date, user) ごとに並列（最大 concurrency 件）で書き込む。
+    before を渡すとその日より前の分だけ書く（JST の日付が変わったとき用）。
+    失敗した分はバッファに残り、次回の flush で再送される。
+    wait=True なら、キャンセルされた flush がまだ書き込み中の行も終わるのを待ってから残りを書く（終了時用）。
+    """
+    async with _daily_flush_lock:
+        keys = _store.daily_buffer.begin_flush(before)
+        summary = FlushSummary()
+        sem = asyncio.Semaphore(max(1, min(concurrency, STORE_THREAD_POOL_SIZE)))
+
+        async def _flush_one(key):
+            async with sem:
+                try:
+                    # リトライの待ちも含むので、タイムアウトはかけずに boto3 側のものに任せる
+                    # （待つのをやめてもスレッド側の書き込みは続くが、その行は claim されたままなので
+                    #   他の flush が二重に書くことはない）
+                    if await run_blocking(_store.flush_daily_entry, key, wait=wait, timeout=None):
+                        summary.processed += 1
+                    else:
+                        summary.deferred += 1
+                except Exception as e:
+                    print(f"[DailyBuffer] flush error guild={key[0]} day={key[1]} user={key[2]}: {e!r}")
+                    summary.failed += 1
+
+        await asyncio.gather(*(_flush_one(key) for key in keys))
+
+        summary.carried = _store.daily_buffer.carried()
+        return summary
+
+async def get_user_total_minutes_in_range(
+    guild_id: int,
+    user_id: int,
+    date_from: datetime.date,
+    date_to: datetime.date,
+) -> float:
+    # 期間が長いほど往復回数が増えるので、全体のタイムアウトはかけない
+    return await run_blocking(
+        _store.get_user_total_minutes_in_range,
+        guild_id,
+        user_id,
+        date_from,
+        date_to,
+        timeout=None,
+    )
+
+async def get_guild_total_minutes_in_range(
+    guild_id: int,
+    date_from: datetime.date,
+    date_to: datetime.date,
+) -> dict[int, float]:
+    # 期間が長いほど往復回数が増えるので、全体のタイムアウトはかけない
+    return await run_blocking(
+        _store.get_guild_total_minutes_in_range,
+        guild_id,
+        date_from,
+        date_to,
+        timeout=None,
+    )
+
+async def rollup_voice_daily(guild_id: int) -> int:
+    """
+    閉じた週 / 月の集計行をまだ作っていなければ作る（voice_daily_store のみ）。
+    戻り値: 新しく作った集計の数
+    """
+    rollup = getattr(_store.daily_store(), "rollup_closed_periods", None)
+    if rollup is None:
+        # SQLiteStore などは期間集計を SQL の SUM でしているので何もしない
+        return 0
+    # 初回は 2 か月分の日次行を読むので、全体のタイムアウトはかけない
+    return await run_blocking(rollup, guild_id, timeout=None)
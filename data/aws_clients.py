@@ -0,0 +1,105 @@
+# data/aws_clients.py
+"""
+プロセス全体で共有する boto3 の Session / client / resource。
+
+boto3.resource() / boto3.client() は呼ぶたびにサービス定義の JSON を読み、
+エンドポイントを解決し、自分専用の HTTP 接続プールを持つ。
+ストアごとに作るとそれが import 時に何回も走るので、ここで 1 つずつだけ、
+最初に使われたときに作る（import しただけでは何も作らない）。
+
+    from data import aws_clients
+    aws_clients.dynamodb().Table("zero_bot_xp")
+    aws_clients.client("s3").get_object(...)
+
+接続プールの大きさ / タイムアウト / リトライは config.AWS_* で決める。
+DYNAMODB_LOCAL=true のときは dynamodb() が data.local_dynamo の共有インスタンスを返す。
+"""
+
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from config import (
+    AWS_CONNECT_TIMEOUT_SECONDS,
+    AWS_MAX_ATTEMPTS,
+    AWS_MAX_POOL_CONNECTIONS,
+    AWS_READ_TIMEOUT_SECONDS,
+    AWS_RETRY_MODE,
+    DYNAMODB_LOCAL,
+    DYNAMODB_REGION,
+)
+
+_lock = threading.RLock()
+_session = None
+# (サービス名, リージョン) → client / resource
+_clients: Dict[Tuple[str, Optional[str]], Any] = {}
+_resources: Dict[Tuple[str, Optional[str]], Any] = {}
+
+
+def _config():
+    from botocore.config import Config
+
+    return Config(
+        max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+        connect_timeout=AWS_CONNECT_TIMEOUT_SECONDS,
+        read_timeout=AWS_READ_TIMEOUT_SECONDS,
+        retries={"max_attempts": AWS_MAX_ATTEMPTS, "mode": AWS_RETRY_MODE},
+        tcp_keepalive=True,
+    )
+
+
+def session():
+    """共有の boto3.session.Session（認証情報の読み込みは 1 回だけ）"""
+    global _session
+    with _lock:
+        if _session is None:
+            import boto3.session
+
+            _session = boto3.session.Session()
+        return _session
+
+
+def resource(service: str, region: Optional[str] = None):
+    """
+    共有の resource。
+    同じサービスの client() はこの resource の meta.client を返すので、接続プールも 1 つになる。
+    """
+    key = (service, region)
+    with _lock:
+        res = _resources.get(key)
+        if res is None:
+            res = _resources[key] = session().resource(service, region_name=region, config=_config())
+            _clients.setdefault(key, res.meta.client)
+        return res
+
+
+def client(service: str, region: Optional[str] = None):
+    """共有の低レベル client（region が None なら環境 / ~/.aws/config の既定リージョン）"""
+    key = (service, region)
+    with _lock:
+        cli = _clients.get(key)
+        if cli is None:
+            cli = _clients[key] = session().client(service, region_name=region, config=_config())
+        return cli
+
+
+def dynamodb(region: Optional[str] = None):
+    """
+    DynamoStore / GuildConfigStore / voice_daily_store が使う DynamoDB の resource
+    （region が None なら config.DYNAMODB_REGION。環境の既定リージョンは使わない）。
+    DYNAMODB_LOCAL=true なら AWS には繋がず、プロセス内の代用品を返す。
+    """
+    if DYNAMODB_LOCAL:
+        from data.local_dynamo import shared_local_dynamodb
+
+        return shared_local_dynamodb()
+    return resource("dynamodb", region or DYNAMODB_REGION)
+
+
+def created() -> Dict[str, int]:
+    """今までに作った client / resource の数（起動時間の計測用）"""
+    with _lock:
+        return {
+            "session": int(_session is not None),
+            "clients": len(_clients),
+            "resources": len(_resources),
+        }
@@ -1,35 +1,132 @@
 # data/backends/dynamo_store.py
 
-from typing import Dict, Any, Optional 
-import boto3
-from boto3.dynamodb.conditions import Key
-from decimal import Decimal
-
-def _to_decimal(value):
-    """Pythonの数値 → DynamoDB対応のDecimalに変換"""
-    if isinstance(value, float) or isinstance(value, int):
-        return Decimal(str(value))
-    elif isinstance(value, dict):
-        return {k: _to_decimal(v) for k, v in value.items()}
-    elif isinstance(value, list):
-        return [_to_decimal(v) for v in value]
-    return value
-
-def _from_decimal(value):
-    """DynamoDB から読んだ値を Python の型（float/int/list/dict）に戻す"""
-    if isinstance(value, Decimal):
-        # 分やXPは float で扱いたいので float に戻す
-        return float(value)
-    if isinstance(value, list):
-        return [_from_decimal(v) for v in value]
-    if isinstance(value, dict):
-        return {k: _from_decimal(v) for k, v in value.items()}
-    return value
-
-class DynamoStore:
+from functools import lru_cache
+from typing import Callable, Dict, Any, Iterable, Iterator, Optional, Tuple
+from botocore.exceptions import ClientError
+
+from data import aws_clients, dynamo_codec as codec
+from data.store_base import BaseStore, new_voice_meta
+
+# 1回の UpdateItem に入れる pair_time の相手数（プレースホルダの数）
+META_PAIRS_PER_UPDATE = 40
+
+# 1 つの UpdateExpression に詰める長さの上限（DynamoDB の上限は 4KB。少し余裕を残す）
+# 時間キー / 時間帯 / 相手の句をこの長さまで詰めて、入りきらない分は追加の UpdateItem に分ける
+UPDATE_EXPRESSION_BUDGET = 4000
+
+# BatchGetItem 1 回で読めるキー数の上限
+BATCH_GET_KEYS = 100
+
+# meta がまだ無いアイテムに入れておく初期形（ネストしたパスに加算できるように）
+EMPTY_META = {
+    "hour_buckets": [0] * 24,
+    "pair_time": {},
+}
+
+# よく使う AttributeValue（毎回作らない）
+_ZERO = {"N": "0"}
+_EMPTY_META_AV = codec.encode(EMPTY_META)
+_EMPTY_HOURS_AV = codec.encode(EMPTY_META["hour_buckets"])
+_EMPTY_MAP_AV = {"M": {}}
+
+# pair_time の相手ごとのプレースホルダ
+_PAIR_NAMES = tuple(f"#p{i}" for i in range(META_PAIRS_PER_UPDATE))
+_PAIR_VALUES = tuple(f":p{i}" for i in range(META_PAIRS_PER_UPDATE))
+
+
+def _add_clause(path: str, placeholder: str) -> str:
+    # ネストしたパスには ADD が使えないので if_not_exists(...) + :d で加算する
+    return f"{path} = if_not_exists({path}, :zero) + {placeholder}"
+
+
+@lru_cache(maxsize=64)
+def _time_clause(i: int) -> str:
+    return _add_clause(f"meta.#t{i}", f":t{i}")
+
+
+_HOUR_CLAUSES = tuple(_add_clause(f"meta.hour_buckets[{h}]", f":h{h}") for h in range(24))
+_PAIR_CLAUSES = tuple(_add_clause(f"meta.pair_time.{n}", v) for n, v in zip(_PAIR_NAMES, _PAIR_VALUES))
+_XP_CLAUSE = _add_clause("voice_xp", ":dxp")
+_MAX_CLAUSE = "meta.max_member_count = :mmc"
+
+
+@lru_cache(maxsize=1024)
+def _meta_expression(
+    time_keys: Tuple[str, ...],
+    hours: Tuple[int, ...],
+    n_pairs: int,
+    with_xp: bool,
+    raise_max: bool,
+) -> Tuple[Optional[str], Dict[str, str]]:
+    """
+    meta 加算（+ voice_xp 加算）の UpdateExpression と、時間キー用の ExpressionAttributeNames。
+
+    式の形は「どの時間キー / 何時台 / 相手何人 / XP あり / 最大人数の更新あり」だけで決まるので、
+    同じ形の tick では組み立て済みの文字列をそのまま使う。
+    プレースホルダ:
+      #t{i} / :t{i}  … time_keys[i]
+      :h{h}          … hour_buckets[h]
+      #p{i} / :p{i}  … pair_time の i 番目の相手（名前は呼び出しごとに入れる）
+      :dxp / :mmc / :zero
+    戻り値の dict は共有なので、書き換えずにコピーして使うこと。
+    """
+    sets = [_time_clause(i) for i in range(len(time_keys))]
+    sets += [_HOUR_CLAUSES[h] for h in hours]
+    sets += _PAIR_CLAUSES[:n_pairs]
+    if with_xp:
+        sets.append(_XP_CLAUSE)
+    if raise_max:
+        sets.append(_MAX_CLAUSE)
+
+    names = {f"#t{i}": k for i, k in enumerate(time_keys)}
+    return ("SET " + ", ".join(sets)) if sets else None, names
+
+
+def _split_by_budget(
+    times: Dict[str, float],
+    hour_buckets: Dict[int, float],
+    pair_time: Dict[str, float],
+    room: int,
+) -> Tuple[list, list, list, Dict[str, Dict]]:
+    """
+    時間キー → 時間帯 → 相手 の順に、式の長さの合計が room に収まる分だけ取る。
+    戻り値: (時間キー, 時間帯, 相手 それぞれの (キー, 値) のリスト, 入りきらなかった分)
+    """
+    time_items: list = []
+    hour_items: list = []
+    pair_items: list = []
+    rest: Dict[str, Dict] = {"times": {}, "hour_buckets": {}, "pair_time": {}}
+
+    def _take(out: list, clause: Optional[str], field: str, k, v):
+        nonlocal room
+        cost = len(clause) + 2 if clause is not None else room + 1  # + ", " の分
+        if cost <= room:
+            room -= cost
+            out.append((k, v))
+        else:
+            rest[field][k] = v
+
+    for k, v in sorted(times.items()):
+        _take(time_items, _time_clause(len(time_items)), "times", k, v)
+    for h, v in sorted((int(h), v) for h, v in hour_buckets.items()):
+        _take(hour_items, _HOUR_CLAUSES[h], "hour_buckets", h, v)
+    for k, v in sorted(pair_time.items()):
+        n = len(pair_items)
+        _take(pair_items, _PAIR_CLAUSES[n] if n < META_PAIRS_PER_UPDATE else None, "pair_time", k, v)
+    return time_items, hour_items, pair_items, rest
+
+
+# 「今より大きいときだけ」最大人数を SET する条件
+_RAISE_MAX_CONDITION = "attribute_not_exists(meta.max_member_count) OR meta.max_member_count < :mmc"
+
+
+class DynamoStore(BaseStore):
     """
     JsonStore と同じインターフェースを持つ DynamoDB バックエンド。
 
+    resource 層は使わず、低レベル client に AttributeValue 形式で直接渡す
+    （値の変換は data.dynamo_codec、meta 加算の式は _meta_expression でキャッシュ）。
+
     使用テーブル構造：
     - パーティションキー: guild_id (String)
     - ソートキー        : user_id  (String)
@@ -38,113 +135,396 @@ class DynamoStore:
     {
         "guild_id": "123",
         "user_id": "456",
-        "voice_xp": Decimal,
-        "text_xp": Decimal,
+        "voice_xp": Number,
+        "text_xp": Number,
         "meta": { ... }  # 統計情報もまとめて保存
     }
     """
 
-    def __init__(self, table_name: str, region: str = "ap-northeast-1"):
+    def __init__(self, table_name: str, region: Optional[str] = None, dynamodb=None):
+        # dynamodb: 共有の resource の代わりに使うもの（data.local_dynamo.LocalDynamoDB など）
+        # region: None なら config.DYNAMODB_REGION
         self.table_name = table_name
-        self.dynamodb = boto3.resource("dynamodb", region_name=region)
-        self.table = self.dynamodb.Table(table_name)
+        self.region = region
+        self._dynamodb = dynamodb
+        self._client = None
+
+        # (gid, uid) → DB 上の meta.max_member_count として最後に分かった値
+        # （これを超えるときだけ条件付きで SET する）
+        self._known_max_members: Dict[Tuple[int, int], int] = {}
+
+    @property
+    def client(self):
+        # 最初の呼び出しまで作らない（import 時にサービス定義の読み込み / エンドポイント解決をしない）
+        if self._client is None:
+            self._client = (self._dynamodb or aws_clients.dynamodb(self.region)).meta.client
+        return self._client
 
     # =============================
     #    内部キー生成
     # =============================
-    def _key(self, gid: int, uid: int) -> Dict[str, str]:
+    def _key(self, gid: int, uid: int) -> Dict[str, Dict[str, str]]:
         return {
-            "guild_id": str(gid),
-            "user_id": str(uid)
+            "guild_id": {"S": str(gid)},
+            "user_id": {"S": str(uid)},
         }
 
     # =============================
     #    XP 読み書き
     # =============================
-    def add_voice_xp(self, gid: int, uid: int, xp: float) -> None:
-        self.table.update_item(
-            Key=self._key(gid, uid),
-            UpdateExpression="ADD voice_xp :dxp",
-            ExpressionAttributeValues={":dxp": _to_decimal(xp)}
-        )
+    def add_voice_xp(self, gid: int, uid: int, xp: float) -> bool:
+        """
+        voice_xp に加算する。
+        戻り値: この呼び出しで (guild, user) のアイテムが新規作成されたら True
+        """
+        return self._add_xp(gid, uid, "ADD voice_xp :dxp, text_xp :zero", xp)
 
     def get_voice_xp(self, gid: int, uid: int) -> float:
-        item = self._get_item(gid, uid)
-        return float(item.get("voice_xp", 0.0))
+        return _xp_of(self._get_item(gid, uid, "voice_xp"))["voice_xp"]
 
-    def add_text_xp(self, gid: int, uid: int, xp: float) -> None:
-        self.table.update_item(
+    def add_text_xp(self, gid: int, uid: int, xp: float) -> bool:
+        """add_voice_xp の text_xp 版"""
+        return self._add_xp(gid, uid, "ADD text_xp :dxp, voice_xp :zero", xp)
+
+    def _add_xp(self, gid: int, uid: int, expression: str, xp: float) -> bool:
+        # もう片方の XP にも 0 を ADD しておくと、UPDATED_OLD に
+        # 「どちらの XP も無かった = 新規アイテム」が追加の読み込み無しで分かる
+        resp = self.client.update_item(
+            TableName=self.table_name,
             Key=self._key(gid, uid),
-            UpdateExpression="ADD text_xp :dxp",
-            ExpressionAttributeValues={":dxp": _to_decimal(xp)}
+            UpdateExpression=expression,
+            ExpressionAttributeValues={":dxp": codec.num(xp), ":zero": _ZERO},
+            ReturnValues="UPDATED_OLD",
         )
+        return not resp.get("Attributes")
 
     def get_text_xp(self, gid: int, uid: int) -> float:
-        item = self._get_item(gid, uid)
-        return float(item.get("text_xp", 0.0))
+        return _xp_of(self._get_item(gid, uid, "text_xp"))["text_xp"]
+
+    def get_xp_many(self, gid: int, uids: Iterable[int]) -> Dict[int, Dict[str, float]]:
+        """BatchGetItem（100 件ずつ）で XP だけまとめて読む"""
+        uids = list(uids)
+        out = {uid: {"voice_xp": 0.0, "text_xp": 0.0} for uid in uids}
+
+        for start in range(0, len(uids), BATCH_GET_KEYS):
+            request = {
+                self.table_name: {
+                    "Keys": [self._key(gid, uid) for uid in uids[start:start + BATCH_GET_KEYS]],
+                    "ProjectionExpression": "user_id, voice_xp, text_xp",
+                }
+            }
+            # スロットリングなどで読めなかったキーは UnprocessedKeys で返ってくる
+            while request:
+                resp = self.client.batch_get_item(RequestItems=request)
+                for item in resp.get("Responses", {}).get(self.table_name, []):
+                    out[int(item["user_id"]["S"])] = _xp_of(item)
+                request = resp.get("UnprocessedKeys") or None
+        return out
 
     # =============================
     #    VC 統計情報（meta）
     # =============================
     def get_voice_meta(self, gid: int, uid: int) -> Dict[str, float]:
-        item = self._get_item(gid, uid)
-        meta = item.get("meta", {})
-        # ★ Decimal 混じりを全部 Python の基本型に戻す
-        return _from_decimal(meta)
+        meta = self._get_item(gid, uid, "meta").get("meta")
+        # まだ無いフィールドは初期値で埋めて、他のバックエンドと同じ形にする
+        return {**new_voice_meta(), **(codec.decode(meta) if meta else {})}
 
     def update_voice_meta(self, gid: int, uid: int, meta: dict):
-        meta_dec = _to_decimal(meta)
-
-        self.table.update_item(
-            Key={
-                "guild_id": str(gid),
-                "user_id": str(uid)
-            },
+        self.client.update_item(
+            TableName=self.table_name,
+            Key=self._key(gid, uid),
             UpdateExpression="SET meta = :meta",
-            ExpressionAttributeValues={
-                ":meta": meta_dec
-            }
+            ExpressionAttributeValues={":meta": codec.encode(meta)},
         )
 
+    def add_voice_meta(
+        self,
+        gid: int,
+        uid: int,
+        *,
+        times: Dict[str, float],
+        max_member_count: int,
+        hour_buckets: Dict[int, float],
+        pair_time: Dict[str, float],
+    ) -> None:
+        """
+        meta の各フィールドに 1 回の UpdateItem で加算する（読み込み無し）。
+
+        - total_time / 人数帯 / muted_time / hour_buckets[h] / pair_time.<相手>
+          は if_not_exists(...) + :d で加算（ネストしたパスには ADD が使えないため）
+        - max_member_count は「今より大きいときだけ」条件付きで SET
+        """
+        self.add_voice_activity(
+            gid,
+            uid,
+            xp=0.0,
+            times=times,
+            max_member_count=max_member_count,
+            hour_buckets=hour_buckets,
+            pair_time=pair_time,
+        )
+
+    def build_meta_update(
+        self,
+        gid: int,
+        uid: int,
+        *,
+        xp: float,
+        times: Dict[str, float],
+        max_member_count: int,
+        hour_buckets: Dict[int, float],
+        pair_time: Dict[str, float],
+    ) -> Tuple[Optional[Dict[str, Any]], Dict[str, Dict]]:
+        """
+        voice_xp + meta 加算の UpdateItem パラメータ（低レベル形式）を作る。
+
+        式が UPDATE_EXPRESSION_BUDGET に収まるように、XP と最大人数のあとに
+        時間キー / 時間帯 / 相手を入るところまで詰める。
+        戻り値: (パラメータ or 書くものが無ければ None,
+                 入りきらなかった {"times", "hour_buckets", "pair_time"}（追加の UpdateItem で書く）)
+        """
+        key = (gid, uid)
+        raise_max = max_member_count > self._known_max_members.get(key, 0)
+
+        room = UPDATE_EXPRESSION_BUDGET - len("SET ")
+        if xp:
+            room -= len(_XP_CLAUSE) + 2
+        if raise_max:
+            room -= len(_MAX_CLAUSE) + 2
+        time_items, hour_items, head, rest = _split_by_budget(times, hour_buckets, pair_time, room)
+
+        expression, time_names = _meta_expression(
+            tuple(k for k, _ in time_items),
+            tuple(h for h, _ in hour_items),
+            len(head),
+            bool(xp),
+            raise_max,
+        )
+        if expression is None:
+            return None, rest
+
+        values: Dict[str, Any] = {":zero": _ZERO}
+        for i, (_, v) in enumerate(time_items):
+            values[f":t{i}"] = codec.num(v)
+        for h, v in hour_items:
+            values[f":h{h}"] = codec.num(v)
+        names = dict(time_names)
+        for i, (oid, v) in enumerate(head):
+            names[_PAIR_NAMES[i]] = oid
+            values[_PAIR_VALUES[i]] = codec.num(v)
+        if xp:
+            values[":dxp"] = codec.num(xp)
+
+        params: Dict[str, Any] = {
+            "TableName": self.table_name,
+            "Key": self._key(gid, uid),
+            "UpdateExpression": expression,
+            "ExpressionAttributeValues": values,
+        }
+        if names:
+            params["ExpressionAttributeNames"] = names
+        if raise_max:
+            values[":mmc"] = codec.num(int(max_member_count))
+            params["ConditionExpression"] = _RAISE_MAX_CONDITION
+            params["ReturnValuesOnConditionCheckFailure"] = "ALL_OLD"
+        return params, rest
+
+    def _add_rest(self, gid: int, uid: int, rest: Dict[str, Dict], on_written) -> None:
+        # 1 回の式に入りきらなかった分（meta だけを追加の UpdateItem で加算。さらに溢れたら続けて分ける）
+        if any(rest.values()):
+            self._write_activity(
+                gid, uid, 0.0, rest["times"], 0, rest["hour_buckets"], rest["pair_time"], on_written,
+            )
+
+    # =============================
+    #    VC 1ユーザー分の書き込み（XP + meta）
+    # =============================
+    def add_voice_activity(
+        self,
+        gid: int,
+        uid: int,
+        *,
+        xp: float,
+        times: Dict[str, float],
+        max_member_count: int,
+        hour_buckets: Dict[int, float],
+        pair_time: Dict[str, float],
+        on_written: Optional[Callable[..., None]] = None,
+    ) -> bool:
+        """
+        voice_xp と meta の加算を 1 つの UpdateExpression にまとめて書く。XP と統計がずれない。
+        （日次テーブルの分数は data.store.daily_buffer が別に書く）
+
+        式が UPDATE_EXPRESSION_BUDGET を超える分は続けて UpdateItem を投げるので、途中で失敗すると
+        一部だけが書かれた状態になる。on_written を渡すと、UpdateItem が 1 つ通るたびに
+        その回で書いた分を on_written(xp=, times=, max_member_count=, hour_buckets=, pair_time=) で知らせる。
+        戻り値: この呼び出しで (guild, user) のアイテムが新規作成されたら True
+        """
+        return self._write_activity(
+            gid, uid, xp, times, max_member_count, hour_buckets, pair_time, on_written,
+        )
+
+    def _write_activity(
+        self,
+        gid: int,
+        uid: int,
+        xp: float,
+        times: Dict[str, float],
+        max_member_count: int,
+        hour_buckets: Dict[int, float],
+        pair_time: Dict[str, float],
+        on_written: Optional[Callable[..., None]],
+        *,
+        init_if_missing: bool = True,
+        written_max: Optional[int] = None,
+    ) -> bool:
+        # written_max: 書き終わったものとして知らせる最大人数（DB の方が大きくて SET を外したときは元の値）
+        key = (gid, uid)
+        params, rest = self.build_meta_update(
+            gid, uid,
+            xp=xp,
+            times=times,
+            max_member_count=max_member_count,
+            hour_buckets=hour_buckets,
+            pair_time=pair_time,
+        )
+        if params is None:
+            # 書くものが無い（最大人数も DB の方が大きいと分かっている）
+            if on_written is not None and max_member_count:
+                on_written(xp=0.0, times={}, max_member_count=max_member_count, hour_buckets={}, pair_time={})
+            return False
+        raise_max = "ConditionExpression" in params
+
+        try:
+            self.client.update_item(**params)
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+
+            if code == "ConditionalCheckFailedException" and raise_max:
+                # すでに DB の方が大きい → 最大人数の更新だけ外してやり直す
+                # （ALL_OLD は低レベルの AttributeValue 形式で返ってくる）
+                old_meta = e.response.get("Item", {}).get("meta", {}).get("M", {})
+                old_max = old_meta.get("max_member_count", {}).get("N")
+                self._known_max_members[key] = int(float(old_max)) if old_max else max_member_count
+                return self._write_activity(
+                    gid, uid, xp, times, 0, hour_buckets, pair_time, on_written,
+                    init_if_missing=init_if_missing,
+                    written_max=max_member_count,
+                )
+
+            if code == "ValidationException" and init_if_missing:
+                # meta（かその中の hour_buckets / pair_time）がまだ無いアイテム
+                # → 空の形を用意してからもう一度（新規作成の判定はここで行う）
+                created = self._init_meta(gid, uid)
+                self._write_activity(
+                    gid, uid, xp, times, max_member_count, hour_buckets, pair_time, on_written,
+                    init_if_missing=False,
+                    written_max=written_max,
+                )
+                return created
+
+            raise
+
+        if raise_max:
+            self._known_max_members[key] = max_member_count
+        if on_written is not None:
+            on_written(
+                xp=xp,
+                times={k: v for k, v in times.items() if k not in rest["times"]},
+                max_member_count=max_member_count if written_max is None else written_max,
+                hour_buckets={h: v for h, v in hour_buckets.items() if int(h) not in rest["hour_buckets"]},
+                pair_time={k: v for k, v in pair_time.items() if k not in rest["pair_time"]},
+            )
+        self._add_rest(gid, uid, rest, on_written)
+        return False
+
+    def _init_meta(self, gid: int, uid: int) -> bool:
+        """
+        meta の空の形を用意する。
+        戻り値: アイテム自体が無かった（新規作成した）なら True
+        """
+        # XP は作成時に両方とも入るので、どちらも無かった = 新規アイテム
+        resp = self.client.update_item(
+            TableName=self.table_name,
+            Key=self._key(gid, uid),
+            UpdateExpression=(
+                "SET meta = if_not_exists(meta, :empty), "
+                "voice_xp = if_not_exists(voice_xp, :zero), "
+                "text_xp = if_not_exists(text_xp, :zero)"
+            ),
+            ExpressionAttributeValues={":empty": _EMPTY_META_AV, ":zero": _ZERO},
+            ReturnValues="UPDATED_OLD",
+        )
+        # 既存の meta に hour_buckets / pair_time が無い（古いデータ）場合
+        self.client.update_item(
+            TableName=self.table_name,
+            Key=self._key(gid, uid),
+            UpdateExpression=(
+                "SET meta.hour_buckets = if_not_exists(meta.hour_buckets, :hb), "
+                "meta.pair_time = if_not_exists(meta.pair_time, :pt)"
+            ),
+            ExpressionAttributeValues={":hb": _EMPTY_HOURS_AV, ":pt": _EMPTY_MAP_AV},
+        )
+        return not resp.get("Attributes")
+
     # =============================
     #    ギルド全メンバー取得
     # =============================
+    def iter_guild_user_stats(self, gid: int) -> Iterator[Tuple[int, Dict[str, float]]]:
+        """
+        ギルドの全ユーザーの (user_id, {"voice_xp", "text_xp"}) を 1 件ずつ返す。
+
+        - LastEvaluatedKey をたどってパーティション全体を読む（1MB で切れない）
+        - ProjectionExpression で XP だけ取得する（大きい meta は転送しない）
+        - ページを受け取るたびに yield するので、呼び出し側は最後のページを待たずに処理できる
+        """
+        params: Dict[str, Any] = {
+            "TableName": self.table_name,
+            "KeyConditionExpression": "guild_id = :gid",
+            "ExpressionAttributeValues": {":gid": {"S": str(gid)}},
+            "ProjectionExpression": "user_id, voice_xp, text_xp",
+        }
+
+        while True:
+            resp = self.client.query(**params)
+            for item in resp.get("Items", []):
+                yield int(item["user_id"]["S"]), _xp_of(item)
+
+            last_key = resp.get("LastEvaluatedKey")
+            if not last_key:
+                break
+            params["ExclusiveStartKey"] = last_key
+
     def get_guild_user_stats(self, gid: int) -> Dict[int, Dict[str, float]]:
-        resp = self.table.query(
-            KeyConditionExpression=Key("guild_id").eq(str(gid))
-        )
-        items = resp.get("Items", [])
-
-        result: Dict[int, Dict[str, float]] = {}
-        for item in items:
-            uid = int(item["user_id"])
-            result[uid] = {
-                "voice_xp": float(item.get("voice_xp", 0.0)),
-                "text_xp": float(item.get("text_xp", 0.0))
-            }
-        return result
+        return dict(self.iter_guild_user_stats(gid))
 
     # =============================
     #    内部：1件取得
     # =============================
-    def _get_item(self, gid: int, uid: int) -> Dict[str, Any]:
-        resp = self.table.get_item(Key=self._key(gid, uid))
+    def _get_item(self, gid: int, uid: int, projection: Optional[str] = None) -> Dict[str, Any]:
+        """
+        1 件読む（AttributeValue 形式のまま返す。必要な属性だけ呼び出し側で変換する）。
+        projection を渡すとその属性だけ読む（XP を読むのに meta を転送しない）。
+        """
+        params: Dict[str, Any] = {"TableName": self.table_name, "Key": self._key(gid, uid)}
+        if projection:
+            params["ProjectionExpression"] = projection
+        resp = self.client.get_item(**params)
         return resp.get("Item", {})
 
-
-    def _to_decimal(value):
-        """Pythonの数値 → DynamoDB対応のDecimalに変換"""
-        if isinstance(value, float) or isinstance(value, int):
-            return Decimal(str(value))
-        elif isinstance(value, dict):
-            return {k: _to_decimal(v) for k, v in value.items()}
-        elif isinstance(value, list):
-            return [_to_decimal(v) for v in value]
-        return value
-    
     # =============================
     #    RankCard 背景キー
     # =============================
     def get_rank_bg_key(self, gid: int, uid: int) -> Optional[str]:
-        item = self._get_item(gid, uid)
-        return item.get("rank_bg_key")
\ No newline at end of file
+        bg = self._get_item(gid, uid, "rank_bg_key").get("rank_bg_key")
+        return bg.get("S") if bg else None
+
+
+def _xp_of(item: Dict[str, Any]) -> Dict[str, float]:
+    """低レベル形式のアイテムから XP だけ取り出す"""
+    voice = item.get("voice_xp")
+    text = item.get("text_xp")
+    return {
+        "voice_xp": float(voice["N"]) if voice else 0.0,
+        "text_xp": float(text["N"]) if text else 0.0,
+    }
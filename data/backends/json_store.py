@@ -2,14 +2,43 @@
 
 import json
 import os
-from typing import Dict
-from data.store_base import BaseStore
+import shutil
+import threading
+from typing import Dict, Optional
+from data.store_base import BaseStore, new_voice_meta
+from data.voice_buffer import apply_meta_delta
 
 
 class JsonStore(BaseStore):
-
-    def __init__(self, path: str):
+    """
+    XP / meta を 1 つの JSON ファイルに保存するバックエンド。
+
+    加算のたびにファイルを書き直すと、1 回の加算でも全ギルド分をシリアライズする
+    ことになるので、メモリ上で書き換えて「変更あり」の印だけ付けておく。
+    ファイルへの書き込みは flush_interval 秒ごと（バックグラウンドスレッド）と
+    flush() / close() のときにまとめて行う。
+    書き込みは一時ファイル → os.replace なので、途中で落ちても前回の内容が残る。
+
+    journal=True なら、変更は 1 件ずつ {path}.journal に 1 行で追記する（追記は O(1)）。
+    起動時はスナップショット（path）を読んでから journal を再生し、
+    journal が compact_bytes を超えたら新しいスナップショットに畳み込む。
+    スナップショットには畳み込んだ最後の seq を入れておくので、畳み込みの途中で
+    落ちても同じ変更を二重に再生しない。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        flush_interval: Optional[float] = 5.0,
+        *,
+        journal: bool = False,
+        compact_bytes: int = 4 * 1024 * 1024,
+    ):
         self.path = path
+        self.journal_path = f"{path}.journal"
+        # 畳み込み中（スナップショットを書いている間）の journal
+        self._compacting_path = f"{path}.journal.old"
+        self.compact_bytes = compact_bytes
 
         # XPデータ
         self.data: Dict[int, Dict[int, Dict[str, float]]] = {}
@@ -17,8 +46,38 @@ class JsonStore(BaseStore):
         # VoiceMeta（統計データ）
         self.meta: Dict[int, Dict[int, Dict[str, float]]] = {}
 
+        # data / meta の読み書きはストア用スレッドプールから同時に来る
+        self._lock = threading.RLock()
+        # ファイルへの書き込みは 1 つずつ（一時ファイルを取り合わないように）
+        self._write_lock = threading.Lock()
+        self._dirty = False
+
+        # journal の通し番号（スナップショットに入っている最後の番号から続ける）
+        self._seq = 0
+        self._journal = None
+        self._journal_bytes = 0
+
         self._load()
 
+        if journal:
+            replayed = self._replay_journal()
+            self._open_journal()
+            # 再生した分はすぐ畳み込んで、次の起動で読む journal を空にしておく
+            if replayed:
+                self.compact()
+
+        # flush_interval=None なら定期書き込みはせず、flush() を呼んだときだけ書く
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        if flush_interval is not None:
+            self._flusher = threading.Thread(
+                target=self._flush_loop,
+                args=(flush_interval,),
+                name="json-store-flush",
+                daemon=True,
+            )
+            self._flusher.start()
+
     # -----------------------------
     # JSON 読み込み / 保存
     # -----------------------------
@@ -31,28 +90,7 @@ class JsonStore(BaseStore):
         with open(self.path, "r", encoding="utf-8") as f:
             raw = json.load(f)
 
-        # XP
-        raw_data = raw.get("data", {})
-        self.data = {
-            int(gid): {
-                int(uid): {
-                    "voice_xp": float(stats.get("voice_xp", 0.0)),
-                    "text_xp": float(stats.get("text_xp", 0.0)),
-                }
-                for uid, stats in users.items()
-            }
-            for gid, users in raw_data.items()
-        }
-
-        # Meta（統計）
-    def _load(self):
-        if not os.path.exists(self.path):
-            self.data = {}
-            self.meta = {}
-            return
-
-        with open(self.path, "r", encoding="utf-8") as f:
-            raw = json.load(f)
+        self._seq = int(raw.get("journal_seq", 0))
 
         # XP
         raw_data = raw.get("data", {})
@@ -113,7 +151,81 @@ class JsonStore(BaseStore):
                     "pair_time": pair_time,  # ★ ここ
                 }
 
-    def _save(self):
+    def _save(self, record: Dict):
+        """
+        変更を 1 件記録する。
+
+        journal モードなら journal に 1 行追記、そうでなければ変更ありの印を
+        付けるだけ（実際の書き込みは flush()）。ロックを持った状態で呼ぶ。
+        """
+        if self._journal is None:
+            self._dirty = True
+            return
+
+        self._seq += 1
+        line = json.dumps({"seq": self._seq, **record}, ensure_ascii=False, separators=(",", ":"))
+        line += "\n"
+        self._journal.write(line)
+        # プロセスが落ちても OS には渡っているように、行ごとに flush する
+        # （fsync は flush_interval ごと）
+        self._journal.flush()
+        self._journal_bytes += len(line.encode("utf-8"))
+
+    # -----------------------------
+    # journal
+    # -----------------------------
+    def _open_journal(self):
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._journal_bytes = self._journal.tell()
+
+    def _replay_journal(self) -> int:
+        """畳み込み途中の journal → 今の journal の順に再生する。再生した件数を返す"""
+        replayed = 0
+        for path in (self._compacting_path, self.journal_path):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 追記の途中で落ちた最後の行など
+                        print(f"[JsonStore] journal の壊れた行を読み飛ばしました: {path}")
+                        continue
+                    seq = int(record.get("seq", 0))
+                    if seq <= self._seq:
+                        continue  # スナップショットに入っている分
+                    self._apply(record)
+                    self._seq = seq
+                    replayed += 1
+        return replayed
+
+    def _apply(self, record: Dict):
+        """journal の 1 件をメモリ上のデータに反映する"""
+        op = record["op"]
+        gid = int(record["g"])
+        uid = int(record["u"])
+        u = self._ensure_user(gid, uid)
+
+        if op == "voice_xp":
+            u["voice_xp"] += record["v"]
+        elif op == "text_xp":
+            u["text_xp"] += record["v"]
+        elif op == "meta_set":
+            self.meta[gid][uid].update(record["m"])
+        elif op == "meta_add":
+            self.meta[gid][uid] = apply_meta_delta(
+                self.meta[gid][uid],
+                times=record["times"],
+                max_member_count=record["max_member_count"],
+                # JSON のキーは文字列になっているので時間帯は int に戻す
+                hour_buckets={int(h): v for h, v in record["hour_buckets"].items()},
+                pair_time=record["pair_time"],
+            )
+        else:
+            print(f"[JsonStore] 未知の journal レコードを無視しました: {op}")
+
+    def _snapshot(self) -> str:
         out_data = {}
         for gid, users in self.data.items():
             out_data[str(gid)] = {}
@@ -139,10 +251,101 @@ class JsonStore(BaseStore):
                     "pair_time": m.get("pair_time", {}),  # ★ ここ
                 }
 
-        obj = {"data": out_data, "meta": out_meta}
+        obj = {"data": out_data, "meta": out_meta, "journal_seq": self._seq}
+        return json.dumps(obj, ensure_ascii=False, indent=2)
+
+    def _write_snapshot(self, text: str):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def flush(self) -> bool:
+        """
+        変更をファイルに書き出す。スナップショットを書いたら True。
+
+        journal モードでは journal を fsync し、compact_bytes を超えていたら畳み込む。
+        書き込みに失敗したら変更ありのまま残すので、次回の flush で書き直す。
+        """
+        if self._journal is not None:
+            with self._lock:
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+                over = self._journal_bytes >= self.compact_bytes
+            return self.compact() if over else False
+
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty:
+                    return False
+                text = self._snapshot()
+                self._dirty = False
+
+            try:
+                self._write_snapshot(text)
+            except Exception:
+                with self._lock:
+                    self._dirty = True
+                raise
+            return True
+
+    def compact(self) -> bool:
+        """
+        journal をスナップショットに畳み込む。書いたら True。
+
+        ロックを持つのはスナップショットの文字列化と journal の差し替えの間だけで、
+        ファイルへの書き込み中も新しい変更は新しい journal に追記できる。
+        """
+        if self._journal is None:
+            return self.flush()
+
+        with self._write_lock:
+            with self._lock:
+                if self._journal_bytes == 0 and not os.path.exists(self._compacting_path):
+                    return False
+                text = self._snapshot()
+
+                self._journal.close()
+                if os.path.exists(self._compacting_path):
+                    # 前回の畳み込みが失敗して残っている分の後ろにつなげる
+                    with open(self._compacting_path, "a", encoding="utf-8") as dst, \
+                            open(self.journal_path, "r", encoding="utf-8") as src:
+                        shutil.copyfileobj(src, dst)
+                    os.remove(self.journal_path)
+                else:
+                    os.replace(self.journal_path, self._compacting_path)
+                self._open_journal()
+
+            # 失敗したら .journal.old が残り、次の畳み込み / 起動時の再生で拾う
+            self._write_snapshot(text)
+            os.remove(self._compacting_path)
+            return True
+
+    def _flush_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[JsonStore] flush error: {e!r}")
+
+    def close(self):
+        """定期書き込みを止めて、残っている変更を書き切る"""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+
+        if self._journal is None:
+            self.flush()
+            return
 
-        with open(self.path, "w", encoding="utf-8") as f:
-            json.dump(obj, f, ensure_ascii=False, indent=2)
+        # 次の起動で journal を再生しなくていいように畳み込んでから閉じる
+        self.compact()
+        with self._lock:
+            self._journal.close()
+            self._journal = None
 
     # -----------------------------
     # XP 操作
@@ -152,52 +355,77 @@ class JsonStore(BaseStore):
         u = g.setdefault(user_id, {"voice_xp": 0.0, "text_xp": 0.0})
 
         mg = self.meta.setdefault(guild_id, {})
-        mg.setdefault(
-            user_id,
-            {
-                "total_time": 0.0,
-                "solo_time": 0.0,
-                "small_group_time": 0.0,
-                "mid_group_time": 0.0,
-                "big_group_time": 0.0,
-                "muted_time": 0.0,
-                "max_member_count": 0,
-                "hour_buckets": [0.0] * 24,
-                "pair_time": {},          # ★ ここ追加
-            },
-        )
+        mg.setdefault(user_id, new_voice_meta())
         return u
 
     def add_voice_xp(self, guild_id, user_id, xp):
-        u = self._ensure_user(guild_id, user_id)
-        u["voice_xp"] += xp
-        self._save()
+        with self._lock:
+            created = user_id not in self.data.get(guild_id, {})
+            record = {"op": "voice_xp", "g": guild_id, "u": user_id, "v": xp}
+            self._save(record)
+            self._apply(record)
+        return created
 
     def get_voice_xp(self, guild_id, user_id):
         return self.data.get(guild_id, {}).get(user_id, {}).get("voice_xp", 0.0)
 
     def add_text_xp(self, guild_id, user_id, xp):
-        u = self._ensure_user(guild_id, user_id)
-        u["text_xp"] += xp
-        self._save()
+        with self._lock:
+            created = user_id not in self.data.get(guild_id, {})
+            record = {"op": "text_xp", "g": guild_id, "u": user_id, "v": xp}
+            self._save(record)
+            self._apply(record)
+        return created
 
     def get_text_xp(self, guild_id, user_id):
         return self.data.get(guild_id, {}).get(user_id, {}).get("text_xp", 0.0)
 
     def get_guild_user_stats(self, guild_id):
-        return self.data.get(guild_id, {})
+        # 呼び出し側が読んでいる間に加算で書き換わらないようにコピーして返す
+        with self._lock:
+            return {uid: dict(stats) for uid, stats in self.data.get(guild_id, {}).items()}
 
     # -----------------------------
     # Voice Meta 操作
     # -----------------------------
     def get_voice_meta(self, guild_id: int, user_id: int) -> Dict[str, float]:
-        self._ensure_user(guild_id, user_id)
-        return self.meta[guild_id][user_id]
+        with self._lock:
+            self._ensure_user(guild_id, user_id)
+            return self.meta[guild_id][user_id]
 
     def update_voice_meta(self, guild_id: int, user_id: int, new_data: Dict[str, float]):
-        self._ensure_user(guild_id, user_id)
-
-        for k, v in new_data.items():
-            self.meta[guild_id][user_id][k] = v
+        with self._lock:
+            record = {"op": "meta_set", "g": guild_id, "u": user_id, "m": dict(new_data)}
+            self._save(record)
+            self._apply(record)
+
+    def add_voice_meta(
+        self,
+        guild_id: int,
+        user_id: int,
+        *,
+        times: Dict[str, float],
+        max_member_count: int,
+        hour_buckets: Dict[int, float],
+        pair_time: Dict[str, float],
+    ) -> None:
+        # meta 全体ではなく加算値だけを記録する
+        record = {
+            "op": "meta_add",
+            "g": guild_id,
+            "u": user_id,
+            "times": times,
+            "max_member_count": max_member_count,
+            "hour_buckets": hour_buckets,
+            "pair_time": pair_time,
+        }
+        with self._lock:
+            self._save(record)
+            self._apply(record)
 
-        self._save()
+    # -----------------------------
+    # RankCard 背景キー
+    # -----------------------------
+    def get_rank_bg_key(self, guild_id: int, user_id: int) -> Optional[str]:
+        # JSON にはユーザー個別の背景を持たない（ギルド設定 → Default になる）
+        return None
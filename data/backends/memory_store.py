@@ -1,28 +1,36 @@
 # data/backends/memory_store.py
 
+import copy
 from typing import Dict
-from data.store_base import BaseStore
+from data.store_base import BaseStore, new_voice_meta
 
 class MemoryStore(BaseStore):
     def __init__(self):
         # {guild_id:{user_id:{voice_xp:..., text_xp:...}}}
         self.data: Dict[int, Dict[int, Dict[str, float]]] = {}
 
+        # {guild_id:{user_id:meta}}（new_voice_meta() の形）
+        self.meta: Dict[int, Dict[int, Dict]] = {}
+
     def _ensure_user(self, guild_id: int, user_id: int):
         g = self.data.setdefault(guild_id, {})
         u = g.setdefault(user_id, {"voice_xp": 0.0, "text_xp": 0.0})
         return u
 
     def add_voice_xp(self, guild_id, user_id, xp):
+        created = user_id not in self.data.get(guild_id, {})
         u = self._ensure_user(guild_id, user_id)
         u["voice_xp"] += xp
+        return created
 
     def get_voice_xp(self, guild_id, user_id):
         return self.data.get(guild_id, {}).get(user_id, {}).get("voice_xp", 0.0)
 
     def add_text_xp(self, guild_id, user_id, xp):
+        created = user_id not in self.data.get(guild_id, {})
         u = self._ensure_user(guild_id, user_id)
         u["text_xp"] += xp
+        return created
 
     def get_text_xp(self, guild_id, user_id):
         return self.data.get(guild_id, {}).get(user_id, {}).get("text_xp", 0.0)
@@ -30,3 +38,21 @@ class MemoryStore(BaseStore):
     def get_guild_user_stats(self, guild_id):
         return self.data.get(guild_id, {})
 
+    # -----------------------------
+    # Voice Meta 操作
+    # -----------------------------
+    def get_voice_meta(self, guild_id, user_id):
+        meta = self.meta.get(guild_id, {}).get(user_id)
+        # 呼び出し側が書き換えても中身が変わらないようにコピーで返す
+        return copy.deepcopy(meta) if meta is not None else new_voice_meta()
+
+    def update_voice_meta(self, guild_id, user_id, meta):
+        current = self.meta.setdefault(guild_id, {}).setdefault(user_id, new_voice_meta())
+        current.update(copy.deepcopy(meta))
+
+    # -----------------------------
+    # RankCard 背景キー
+    # -----------------------------
+    def get_rank_bg_key(self, guild_id, user_id):
+        # ユーザー個別の背景は持たない（ギルド設定 → Default になる）
+        return None
@@ -0,0 +1,425 @@
+# data/backends/sqlite_store.py
+
+import datetime
+import sqlite3
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from data.store_base import BaseStore
+
+# meta のうち「分」を積み上げる列（voice_meta テーブルの列名と同じ）
+META_TIME_FIELDS = (
+    "total_time",
+    "solo_time",
+    "small_group_time",
+    "mid_group_time",
+    "big_group_time",
+    "muted_time",
+)
+
+# 日次テーブルの列（voice_daily_store.build_daily_update の引数と同じ）
+DAILY_MIN_FIELDS = (
+    "total_min",
+    "solo_min",
+    "small_group_min",
+    "mid_group_min",
+    "big_group_min",
+    "muted_min",
+)
+
+XP_FIELDS = ("voice_xp", "text_xp")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_xp (
+    guild_id    INTEGER NOT NULL,
+    user_id     INTEGER NOT NULL,
+    voice_xp    REAL    NOT NULL DEFAULT 0,
+    text_xp     REAL    NOT NULL DEFAULT 0,
+    rank_bg_key TEXT,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_user_xp_voice ON user_xp (guild_id, voice_xp DESC);
+CREATE INDEX IF NOT EXISTS idx_user_xp_text  ON user_xp (guild_id, text_xp DESC);
+
+CREATE TABLE IF NOT EXISTS voice_meta (
+    guild_id         INTEGER NOT NULL,
+    user_id          INTEGER NOT NULL,
+    total_time       REAL    NOT NULL DEFAULT 0,
+    solo_time        REAL    NOT NULL DEFAULT 0,
+    small_group_time REAL    NOT NULL DEFAULT 0,
+    mid_group_time   REAL    NOT NULL DEFAULT 0,
+    big_group_time   REAL    NOT NULL DEFAULT 0,
+    muted_time       REAL    NOT NULL DEFAULT 0,
+    max_member_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS voice_hour_buckets (
+    guild_id INTEGER NOT NULL,
+    user_id  INTEGER NOT NULL,
+    hour     INTEGER NOT NULL,
+    minutes  REAL    NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, user_id, hour)
+);
+
+CREATE TABLE IF NOT EXISTS voice_pair_time (
+    guild_id INTEGER NOT NULL,
+    user_id  INTEGER NOT NULL,
+    other_id TEXT    NOT NULL,
+    minutes  REAL    NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, user_id, other_id)
+);
+
+CREATE TABLE IF NOT EXISTS voice_daily (
+    guild_id        INTEGER NOT NULL,
+    day             TEXT    NOT NULL,
+    user_id         INTEGER NOT NULL,
+    total_min       REAL    NOT NULL DEFAULT 0,
+    solo_min        REAL    NOT NULL DEFAULT 0,
+    small_group_min REAL    NOT NULL DEFAULT 0,
+    mid_group_min   REAL    NOT NULL DEFAULT 0,
+    big_group_min   REAL    NOT NULL DEFAULT 0,
+    muted_min       REAL    NOT NULL DEFAULT 0,
+    updated_at      TEXT,
+    PRIMARY KEY (guild_id, day, user_id)
+);
+-- ユーザー単位の期間集計用（voice_daily_store の USER_DATE_INDEX と同じ並び）
+CREATE INDEX IF NOT EXISTS idx_voice_daily_user ON voice_daily (guild_id, user_id, day);
+"""
+
+# ---- よく使う文（sqlite3 が文字列ごとにプリペアド文をキャッシュする） ----
+SQL_INSERT_USER = "INSERT OR IGNORE INTO user_xp (guild_id, user_id) VALUES (?, ?)"
+SQL_ADD_XP = {
+    field: f"UPDATE user_xp SET {field} = {field} + ? WHERE guild_id = ? AND user_id = ?"
+    for field in XP_FIELDS
+}
+SQL_ADD_META = (
+    "INSERT INTO voice_meta (guild_id, user_id, "
+    + ", ".join(META_TIME_FIELDS)
+    + ", max_member_count) VALUES (?, ?, "
+    + ", ".join("?" for _ in META_TIME_FIELDS)
+    + ", ?) ON CONFLICT (guild_id, user_id) DO UPDATE SET "
+    + ", ".join(f"{f} = {f} + excluded.{f}" for f in META_TIME_FIELDS)
+    + ", max_member_count = MAX(max_member_count, excluded.max_member_count)"
+)
+SQL_ADD_HOUR = (
+    "INSERT INTO voice_hour_buckets (guild_id, user_id, hour, minutes) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (guild_id, user_id, hour) DO UPDATE SET minutes = minutes + excluded.minutes"
+)
+SQL_ADD_PAIR = (
+    "INSERT INTO voice_pair_time (guild_id, user_id, other_id, minutes) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (guild_id, user_id, other_id) DO UPDATE SET minutes = minutes + excluded.minutes"
+)
+SQL_ADD_DAILY = (
+    "INSERT INTO voice_daily (guild_id, day, user_id, "
+    + ", ".join(DAILY_MIN_FIELDS)
+    + ", updated_at) VALUES (?, ?, ?, "
+    + ", ".join("?" for _ in DAILY_MIN_FIELDS)
+    + ", ?) ON CONFLICT (guild_id, day, user_id) DO UPDATE SET "
+    + ", ".join(f"{f} = {f} + excluded.{f}" for f in DAILY_MIN_FIELDS)
+    + ", updated_at = excluded.updated_at"
+)
+
+
+class SQLiteStore(BaseStore):
+    """
+    1 台で動かすとき用の SQLite バックエンド（ネットワーク無し）。
+
+    - WAL + synchronous=NORMAL で、コミットのたびにファイル全体を fsync しない
+    - XP / meta / 日次分数は INSERT ... ON CONFLICT DO UPDATE で加算（読み込み無し）
+    - (guild_id, voice_xp) / (guild_id, text_xp) のインデックスで上位 N 件をそのまま引ける
+    - 日次分数は voice_daily_store の zero_bot_voice_daily_stats と同じ列を持つ
+
+    ストア用スレッドプールから同時に呼ばれるので、接続は 1 本をロックで守って使う。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        # 自前でトランザクションを張るので isolation_level=None（autocommit）
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL なら NORMAL でもコミット済みのデータは壊れない（電源断で直近数件を失うだけ）
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Cursor]:
+        """ロックを取って BEGIN IMMEDIATE 〜 COMMIT（例外なら ROLLBACK）"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn.cursor()
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # -----------------------------
+    # XP 操作
+    # -----------------------------
+    def _add_xp(self, cur: sqlite3.Cursor, guild_id: int, user_id: int, field: str, xp: float) -> bool:
+        created = cur.execute(SQL_INSERT_USER, (guild_id, user_id)).rowcount == 1
+        cur.execute(SQL_ADD_XP[field], (xp, guild_id, user_id))
+        return created
+
+    def add_voice_xp(self, guild_id, user_id, xp):
+        with self._transaction() as cur:
+            return self._add_xp(cur, guild_id, user_id, "voice_xp", xp)
+
+    def add_text_xp(self, guild_id, user_id, xp):
+        with self._transaction() as cur:
+            return self._add_xp(cur, guild_id, user_id, "text_xp", xp)
+
+    def _add_xp_many(self, guild_id: int, deltas: Dict[int, float], field: str) -> int:
+        rows = [(guild_id, uid) for uid in deltas]
+        with self._transaction() as cur:
+            cur.executemany(SQL_INSERT_USER, rows)
+            created = cur.rowcount
+            cur.executemany(SQL_ADD_XP[field], [(xp, guild_id, uid) for uid, xp in deltas.items()])
+        return max(0, created)
+
+    def add_voice_xp_many(self, guild_id, deltas):
+        return self._add_xp_many(guild_id, deltas, "voice_xp")
+
+    def add_text_xp_many(self, guild_id, deltas):
+        return self._add_xp_many(guild_id, deltas, "text_xp")
+
+    def get_xp_many(self, guild_id: int, user_ids: Iterable[int]) -> Dict[int, Dict[str, float]]:
+        uids = list(user_ids)
+        out = {uid: {"voice_xp": 0.0, "text_xp": 0.0} for uid in uids}
+        # SQLite のプレースホルダ上限（古い版で 999）に収まるように分ける
+        with self._lock:
+            for start in range(0, len(uids), 500):
+                chunk = uids[start:start + 500]
+                rows = self._conn.execute(
+                    "SELECT user_id, voice_xp, text_xp FROM user_xp "
+                    f"WHERE guild_id = ? AND user_id IN ({', '.join('?' for _ in chunk)})",
+                    (guild_id, *chunk),
+                ).fetchall()
+                for uid, v, t in rows:
+                    out[uid] = {"voice_xp": float(v), "text_xp": float(t)}
+        return out
+
+    def _get_xp(self, guild_id: int, user_id: int, field: str) -> float:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {field} FROM user_xp WHERE guild_id = ? AND user_id = ?",
+                (guild_id, user_id),
+            ).fetchone()
+        return float(row[0]) if row else 0.0
+
+    def get_voice_xp(self, guild_id, user_id):
+        return self._get_xp(guild_id, user_id, "voice_xp")
+
+    def get_text_xp(self, guild_id, user_id):
+        return self._get_xp(guild_id, user_id, "text_xp")
+
+    def get_guild_user_stats(self, guild_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user_id, voice_xp, text_xp FROM user_xp WHERE guild_id = ?",
+                (guild_id,),
+            ).fetchall()
+        return {uid: {"voice_xp": float(v), "text_xp": float(t)} for uid, v, t in rows}
+
+    def get_top_users(
+        self,
+        guild_id: int,
+        field: str,
+        limit: int,
+        offset: int = 0,
+    ) -> List[Tuple[int, float]]:
+        """field（voice_xp / text_xp）の上位から [(user_id, xp), ...]（XP > 0 のみ）"""
+        if field not in XP_FIELDS:
+            raise ValueError(f"unknown xp field: {field}")
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT user_id, {field} FROM user_xp "
+                f"WHERE guild_id = ? AND {field} > 0 "
+                f"ORDER BY {field} DESC, user_id LIMIT ? OFFSET ?",
+                (guild_id, limit, offset),
+            ).fetchall()
+        return [(uid, float(xp)) for uid, xp in rows]
+
+    # -----------------------------
+    # Voice Meta 操作
+    # -----------------------------
+    def get_voice_meta(self, guild_id: int, user_id: int) -> Dict[str, float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT " + ", ".join(META_TIME_FIELDS) + ", max_member_count "
+                "FROM voice_meta WHERE guild_id = ? AND user_id = ?",
+                (guild_id, user_id),
+            ).fetchone()
+            hours = self._conn.execute(
+                "SELECT hour, minutes FROM voice_hour_buckets WHERE guild_id = ? AND user_id = ?",
+                (guild_id, user_id),
+            ).fetchall()
+            pairs = self._conn.execute(
+                "SELECT other_id, minutes FROM voice_pair_time WHERE guild_id = ? AND user_id = ?",
+                (guild_id, user_id),
+            ).fetchall()
+
+        meta: Dict = {f: 0.0 for f in META_TIME_FIELDS}
+        meta["max_member_count"] = 0
+        if row:
+            meta.update({f: float(v) for f, v in zip(META_TIME_FIELDS, row)})
+            meta["max_member_count"] = int(row[-1])
+
+        hour_buckets = [0.0] * 24
+        for h, minutes in hours:
+            hour_buckets[h] = float(minutes)
+        meta["hour_buckets"] = hour_buckets
+        meta["pair_time"] = {other: float(minutes) for other, minutes in pairs}
+        return meta
+
+    def update_voice_meta(self, guild_id: int, user_id: int, new_data: Dict[str, float]):
+        """渡されたキーだけ上書きする（JsonStore と同じ）"""
+        with self._transaction() as cur:
+            cur.execute(
+                "INSERT OR IGNORE INTO voice_meta (guild_id, user_id) VALUES (?, ?)",
+                (guild_id, user_id),
+            )
+            for field in META_TIME_FIELDS + ("max_member_count",):
+                if field in new_data:
+                    cur.execute(
+                        f"UPDATE voice_meta SET {field} = ? WHERE guild_id = ? AND user_id = ?",
+                        (new_data[field], guild_id, user_id),
+                    )
+
+            hb = new_data.get("hour_buckets")
+            if isinstance(hb, list) and len(hb) == 24:
+                cur.execute(
+                    "DELETE FROM voice_hour_buckets WHERE guild_id = ? AND user_id = ?",
+                    (guild_id, user_id),
+                )
+                cur.executemany(
+                    SQL_ADD_HOUR,
+                    [(guild_id, user_id, h, float(v)) for h, v in enumerate(hb) if v],
+                )
+
+            pt = new_data.get("pair_time")
+            if isinstance(pt, dict):
+                cur.execute(
+                    "DELETE FROM voice_pair_time WHERE guild_id = ? AND user_id = ?",
+                    (guild_id, user_id),
+                )
+                cur.executemany(
+                    SQL_ADD_PAIR,
+                    [(guild_id, user_id, str(k), float(v)) for k, v in pt.items()],
+                )
+
+    def add_voice_meta(
+        self,
+        guild_id: int,
+        user_id: int,
+        *,
+        times: Dict[str, float],
+        max_member_count: int,
+        hour_buckets: Dict[int, float],
+        pair_time: Dict[str, float],
+    ) -> None:
+        """meta の各フィールドに 1 トランザクションで加算する（読み込み無し）"""
+        with self._transaction() as cur:
+            self._add_meta(cur, guild_id, user_id, times, max_member_count, hour_buckets, pair_time)
+
+    def _add_meta(self, cur, guild_id, user_id, times, max_member_count, hour_buckets, pair_time):
+        unknown = set(times) - set(META_TIME_FIELDS)
+        if unknown:
+            raise ValueError(f"unknown meta fields: {sorted(unknown)}")
+
+        cur.execute(
+            SQL_ADD_META,
+            (guild_id, user_id, *(float(times.get(f, 0.0)) for f in META_TIME_FIELDS), max_member_count),
+        )
+        cur.executemany(
+            SQL_ADD_HOUR,
+            [(guild_id, user_id, int(h), float(v)) for h, v in hour_buckets.items()],
+        )
+        cur.executemany(
+            SQL_ADD_PAIR,
+            [(guild_id, user_id, str(oid), float(v)) for oid, v in pair_time.items()],
+        )
+
+    # -----------------------------
+    # 日次VC集計（voice_daily_store と同じ形）
+    # -----------------------------
+    def add_daily_voice_minutes(
+        self,
+        guild_id: int,
+        user_id: int,
+        *,
+        day: Optional[datetime.date] = None,
+        **minutes: float,
+    ) -> None:
+        # data.store → utils.helpers → data.store の循環 import を避ける
+        from utils.helpers import jst_now
+
+        unknown = set(minutes) - set(DAILY_MIN_FIELDS)
+        if unknown:
+            raise ValueError(f"unknown daily fields: {sorted(unknown)}")
+
+        now_jst = jst_now()
+        today = day or now_jst.date()
+        with self._transaction() as cur:
+            cur.execute(
+                SQL_ADD_DAILY,
+                (
+                    guild_id,
+                    today.isoformat(),
+                    user_id,
+                    *(float(minutes.get(f, 0.0)) for f in DAILY_MIN_FIELDS),
+                    now_jst.isoformat(),
+                ),
+            )
+
+    def get_user_total_minutes_in_range(
+        self,
+        guild_id: int,
+        user_id: int,
+        date_from: datetime.date,
+        date_to: datetime.date,
+    ) -> float:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(total_min), 0) FROM voice_daily "
+                "WHERE guild_id = ? AND user_id = ? AND day BETWEEN ? AND ?",
+                (guild_id, user_id, date_from.isoformat(), date_to.isoformat()),
+            ).fetchone()
+        return float(row[0])
+
+    def get_guild_total_minutes_in_range(
+        self,
+        guild_id: int,
+        date_from: datetime.date,
+        date_to: datetime.date,
+    ) -> dict[int, float]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user_id, total_min FROM voice_daily "
+                "WHERE guild_id = ? AND day BETWEEN ? AND ?",
+                (guild_id, date_from.isoformat(), date_to.isoformat()),
+            ).fetchall()
+
+        totals: dict[int, float] = defaultdict(float)
+        for uid, total_min in rows:
+            totals[uid] += float(total_min)
+        return dict(totals)
+
+    # -----------------------------
+    # RankCard 背景キー
+    # -----------------------------
+    def get_rank_bg_key(self, guild_id: int, user_id: int) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT rank_bg_key FROM user_xp WHERE guild_id = ? AND user_id = ?",
+                (guild_id, user_id),
+            ).fetchone()
+        return row[0] if row else None
+
@@ -0,0 +1,94 @@
+# data/dynamo_codec.py
+"""
+DynamoDB の低レベル client 用の AttributeValue 変換。
+
+resource 層（boto3 の TypeSerializer / TypeDeserializer）は数値を必ず Decimal に通すので、
+このリポジトリでは書くたびに _to_decimal、読むたびに _from_decimal で
+meta（hour_buckets / pair_time を含む）を丸ごと 2 回たどっていた。
+ここでは Python の値と AttributeValue を 1 回の走査で直接変換する。
+
+- 数値は float / int / Decimal のどれでも {"N": 文字列} にする（NaN / Infinity は TypeError）
+- 読むと数値はすべて float になる（今までの _from_decimal と同じ）
+- bool は BOOL、None は NULL、set は SS / NS
+"""
+
+import math
+from decimal import Decimal
+from typing import Any, Dict
+
+
+def num(value) -> Dict[str, str]:
+    """数値 1 つを {"N": ...} にする"""
+    if type(value) is float:
+        if not math.isfinite(value):
+            raise TypeError(f"DynamoDB cannot store {value!r}")
+        return {"N": repr(value)}
+    if type(value) is int:
+        return {"N": str(value)}
+    if isinstance(value, Decimal):
+        if not value.is_finite():
+            raise TypeError(f"DynamoDB cannot store {value!r}")
+        return {"N": str(value)}
+    raise TypeError(f"not a number: {value!r}")
+
+
+def encode(value: Any) -> Dict[str, Any]:
+    """Python の値 → AttributeValue"""
+    t = type(value)
+    if t is str:
+        return {"S": value}
+    if t is float or t is int or isinstance(value, Decimal):
+        return num(value)
+    if t is bool:
+        return {"BOOL": value}
+    if t is dict:
+        return {"M": {k: encode(v) for k, v in value.items()}}
+    if t is list or t is tuple:
+        return {"L": [encode(v) for v in value]}
+    if value is None:
+        return {"NULL": True}
+    if t is set or t is frozenset:
+        if all(type(v) is str for v in value):
+            return {"SS": list(value)}
+        return {"NS": [num(v)["N"] for v in value]}
+    if t is bytes:
+        return {"B": value}
+    if isinstance(value, dict):
+        return {"M": {k: encode(v) for k, v in value.items()}}
+    raise TypeError(f"unsupported type for DynamoDB: {t.__name__}")
+
+
+def encode_item(item: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """{属性名: Python の値} → {属性名: AttributeValue}（Item / Key / ExpressionAttributeValues 用）"""
+    return {k: encode(v) for k, v in item.items()}
+
+
+def decode(av: Dict[str, Any]) -> Any:
+    """AttributeValue → Python の値（数値は float）"""
+    (tag, value), = av.items()
+    if tag == "N":
+        return float(value)
+    if tag == "S":
+        return value
+    if tag == "M":
+        return {k: decode(v) for k, v in value.items()}
+    if tag == "L":
+        return [decode(v) for v in value]
+    if tag == "BOOL":
+        return value
+    if tag == "NULL":
+        return None
+    if tag == "SS":
+        return set(value)
+    if tag == "NS":
+        return {float(v) for v in value}
+    if tag == "B":
+        return value
+    if tag == "BS":
+        return set(value)
+    raise TypeError(f"unsupported AttributeValue: {tag}")
+
+
+def decode_item(item: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """{属性名: AttributeValue} → {属性名: Python の値}"""
+    return {k: decode(v) for k, v in item.items()}
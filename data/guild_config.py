@@ -0,0 +1,257 @@
+# data/guild_config.py
+"""
+guild_config（DynamoDB の生 dict）を、型付きのイミュータブルな設定オブジェクトに変換する。
+
+設定を読むたびに int() 変換や set() 作成をしなくていいように、
+GuildConfigStore のキャッシュには「変換済み」の GuildConfig を載せておく。
+不正な値はここで 1 回だけログに出して、その値だけ無視する。
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, FrozenSet, List, Mapping, Optional, Tuple
+
+
+# =========================
+#  変換ヘルパ
+# =========================
+def _section(raw: Mapping, name: str, errors: List[str]) -> Mapping:
+    value = raw.get(name)
+    if value is None:
+        return {}
+    if not isinstance(value, Mapping):
+        errors.append(f"{name}: dict ではありません ({value!r})")
+        return {}
+    return value
+
+
+def _to_int(value: Any) -> int:
+    # DynamoDB からは数値が float（Decimal 変換後）で来ることもある
+    if isinstance(value, bool):
+        raise ValueError(value)
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError(value)
+        return int(value)
+    return int(str(value).strip())
+
+
+def _opt_int(section: Mapping, key: str, path: str, errors: List[str]) -> Optional[int]:
+    value = section.get(key)
+    if value is None or value == "":
+        return None
+    try:
+        return _to_int(value)
+    except (TypeError, ValueError):
+        errors.append(f"{path}.{key}: 数値IDではありません ({value!r})")
+        return None
+
+
+def _int_list(section: Mapping, key: str, path: str, errors: List[str]) -> Tuple[int, ...]:
+    raw_ids = section.get(key) or []
+    if not isinstance(raw_ids, (list, tuple, set, frozenset)):
+        raw_ids = [raw_ids]
+
+    ids = []
+    for x in raw_ids:
+        try:
+            ids.append(_to_int(x))
+        except (TypeError, ValueError):
+            errors.append(f"{path}.{key}: 数値IDではない要素を無視しました ({x!r})")
+    return tuple(ids)
+
+
+def _id_set(section: Mapping, key: str, path: str, errors: List[str]) -> FrozenSet[int]:
+    return frozenset(_int_list(section, key, path, errors))
+
+
+def _opt_str(section: Mapping, key: str) -> Optional[str]:
+    value = section.get(key)
+    if value is None or value == "":
+        return None
+    return str(value)
+
+
+def _bool(section: Mapping, key: str, default: bool) -> bool:
+    value = section.get(key, default)
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def parse_color(value: Any) -> int:
+    """0x206694 / 2122388 / "0x206694" / "#206694" のどれでも int のカラーにする。"""
+    if isinstance(value, str):
+        s = value.strip()
+        if s.startswith("#"):
+            return int(s[1:], 16)
+        return int(s, 0)
+    return _to_int(value)
+
+
+# =========================
+#  セクションごとの設定
+# =========================
+@dataclass(frozen=True)
+class LevelingConfig:
+    ignored_category_ids: FrozenSet[int] = frozenset()
+    ignored_channel_ids: FrozenSet[int] = frozenset()
+
+    def is_ignored_channel(self, channel) -> bool:
+        """XP / 統計の対象外チャンネルか（VC そのもの or 属するカテゴリ）"""
+        if channel.id in self.ignored_channel_ids:
+            return True
+        category_id = getattr(channel, "category_id", None)
+        return category_id is not None and category_id in self.ignored_category_ids
+
+
+@dataclass(frozen=True)
+class GenderRole:
+    role_id: int
+    color: int
+
+
+@dataclass(frozen=True)
+class ProfileConfig:
+    excluded_category_ids: FrozenSet[int] = frozenset()
+    leave_message_delete_excluded_category_ids: FrozenSet[int] = frozenset()
+    excluded_voice_channel_ids: FrozenSet[int] = frozenset()
+    # 探索順があるので tuple
+    profile_source_channel_ids: Tuple[int, ...] = ()
+    male: Optional[GenderRole] = None
+    female: Optional[GenderRole] = None
+
+
+@dataclass(frozen=True)
+class LoggingConfig:
+    voice_text_category_id: Optional[int] = None
+    voice_text_category_name: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ArchiveConfig:
+    category_id: Optional[int] = None
+    category_name: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class OyanmoConfig:
+    target_voice_channel_id: Optional[int] = None
+    allowed_role_ids: FrozenSet[int] = frozenset()
+    default_countdown_seconds: int = 10
+    enable_stop_button: bool = True
+    stop_button_only_command_user: bool = True
+    completion_messages: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class RankcardConfig:
+    rank_bg_key: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class GuildConfig:
+    guild_id: int
+    leveling: LevelingConfig = LevelingConfig()
+    profile: ProfileConfig = ProfileConfig()
+    logging: LoggingConfig = LoggingConfig()
+    archive: ArchiveConfig = ArchiveConfig()
+    oyanmo: OyanmoConfig = OyanmoConfig()
+    rankcard: RankcardConfig = RankcardConfig()
+    # 変換前の dict（管理用。ホットパスでは使わない）
+    raw: Mapping = field(default_factory=dict, compare=False, repr=False)
+    # 変換時に見つかった不正値
+    errors: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_dict(cls, guild_id: int, raw: Optional[Mapping]) -> "GuildConfig":
+        raw = raw or {}
+        errors: List[str] = []
+
+        # ----- leveling -----
+        lv = _section(raw, "leveling", errors)
+        leveling = LevelingConfig(
+            ignored_category_ids=_id_set(lv, "ignored_category_ids", "leveling", errors),
+            ignored_channel_ids=_id_set(lv, "ignored_channel_ids", "leveling", errors),
+        )
+
+        # ----- profile -----
+        pf = _section(raw, "profile", errors)
+        gender_roles = pf.get("gender_roles") or {}
+        if not isinstance(gender_roles, Mapping):
+            errors.append(f"profile.gender_roles: dict ではありません ({gender_roles!r})")
+            gender_roles = {}
+
+        def _gender(key: str) -> Optional[GenderRole]:
+            g = gender_roles.get(key)
+            if not g:
+                return None
+            try:
+                return GenderRole(role_id=_to_int(g["role_id"]), color=parse_color(g["color"]))
+            except (KeyError, TypeError, ValueError):
+                errors.append(f"profile.gender_roles.{key}: role_id / color が不正です ({g!r})")
+                return None
+
+        profile = ProfileConfig(
+            excluded_category_ids=_id_set(pf, "excluded_category_ids", "profile", errors),
+            leave_message_delete_excluded_category_ids=_id_set(
+                pf, "leave_message_delete_excluded_category_ids", "profile", errors
+            ),
+            excluded_voice_channel_ids=_id_set(pf, "excluded_voice_channel_ids", "profile", errors),
+            profile_source_channel_ids=_int_list(pf, "profile_source_channel_ids", "profile", errors),
+            male=_gender("male"),
+            female=_gender("female"),
+        )
+
+        # ----- logging -----
+        lg = _section(raw, "logging", errors)
+        logging_cfg = LoggingConfig(
+            voice_text_category_id=_opt_int(lg, "voice_text_category_id", "logging", errors),
+            voice_text_category_name=_opt_str(lg, "voice_text_category_name"),
+        )
+
+        # ----- archive -----
+        ar = _section(raw, "archive", errors)
+        archive = ArchiveConfig(
+            category_id=_opt_int(ar, "category_id", "archive", errors),
+            category_name=_opt_str(ar, "category_name"),
+        )
+
+        # ----- oyanmo -----
+        oy = _section(raw, "oyanmo", errors)
+        raw_seconds = oy.get("default_countdown_seconds", 10)
+        try:
+            # ★ float → int に変換（DynamoDB からは float で来る）
+            countdown_seconds = int(float(raw_seconds))
+        except (TypeError, ValueError):
+            errors.append(f"oyanmo.default_countdown_seconds: 数値ではありません ({raw_seconds!r})")
+            countdown_seconds = 10
+
+        raw_messages = oy.get("completion_messages") or []
+        if not isinstance(raw_messages, (list, tuple)):
+            errors.append(f"oyanmo.completion_messages: リストではありません ({raw_messages!r})")
+            raw_messages = []
+
+        oyanmo = OyanmoConfig(
+            target_voice_channel_id=_opt_int(oy, "target_voice_channel_id", "oyanmo", errors),
+            allowed_role_ids=_id_set(oy, "allowed_role_ids", "oyanmo", errors),
+            default_countdown_seconds=countdown_seconds,
+            enable_stop_button=_bool(oy, "enable_stop_button", True),
+            stop_button_only_command_user=_bool(oy, "stop_button_only_command_user", True),
+            completion_messages=tuple(str(m) for m in raw_messages if m),
+        )
+
+        # ----- rankcard -----
+        rc = _section(raw, "rankcard", errors)
+        rankcard = RankcardConfig(rank_bg_key=_opt_str(rc, "rank_bg_key"))
+
+        return cls(
+            guild_id=int(guild_id),
+            leveling=leveling,
+            profile=profile,
+            logging=logging_cfg,
+            archive=archive,
+            oyanmo=oyanmo,
+            rankcard=rankcard,
+            raw=raw,
+            errors=tuple(errors),
+        )
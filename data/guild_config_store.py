@@ -1,50 +1,153 @@
-import boto3
-from decimal import Decimal
-
-def _to_decimal(v):
-    if isinstance(v, float) or isinstance(v, int):
-        return Decimal(str(v))
-    if isinstance(v, dict):
-        return {k: _to_decimal(x) for k, x in v.items()}
-    if isinstance(v, list):
-        return [_to_decimal(x) for x in v]
-    return v
-
-def _from_decimal(v):
-    if isinstance(v, Decimal):
-        return float(v)
-    if isinstance(v, dict):
-        return {k: _from_decimal(x) for k, x in v.items()}
-    if isinstance(v, list):
-        return [_from_decimal(x) for x in v]
-    return v
+import threading
+import time
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from config import GUILD_CONFIG_CACHE_TTL_SECONDS
+from data import aws_clients, dynamo_codec as codec
+from data.guild_config import GuildConfig
+
+
+class ConfigCache:
+    """
+    ギルド設定の TTL キャッシュ（プロセス全体で共有）。
+
+    - TTL が切れるまでは DynamoDB を読まない
+    - 同じギルドの読み込みが同時に来たら、実際に読むのは 1 スレッドだけ
+      （他は読み終わるのを待って同じ結果を使う）
+    - invalidate() 後に古い読み込みが終わっても、その結果は捨てる
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, Tuple[float, GuildConfig]] = {}  # key → (期限, 設定)
+        self._inflight: Dict[Hashable, threading.Event] = {}
+        self._generation: Dict[Hashable, int] = {}
+
+    def peek(self, key: Hashable) -> Optional[GuildConfig]:
+        """期限内のキャッシュがあれば返す（なければ None）。読み込みはしない。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+            return None
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], GuildConfig]) -> GuildConfig:
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    return entry[1]
+
+                event = self._inflight.get(key)
+                if event is None:
+                    # 自分が読み込み担当
+                    event = self._inflight[key] = threading.Event()
+                    generation = self._generation.get(key, 0)
+                    leader = True
+                else:
+                    leader = False
+
+            if not leader:
+                # 担当スレッドの読み込み完了を待ってから、もう一度キャッシュを見る
+                event.wait()
+                continue
+
+            try:
+                value = loader()
+                with self._lock:
+                    if self._generation.get(key, 0) == generation:
+                        self._entries[key] = (time.monotonic() + self.ttl, value)
+                return value
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                event.set()
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generation[key] = self._generation.get(key, 0) + 1
+
+
+# GuildConfigStore をいくつ作っても同じキャッシュを使う
+_config_cache = ConfigCache(ttl=GUILD_CONFIG_CACHE_TTL_SECONDS)
 
 
 class GuildConfigStore:
-    def __init__(self, table_name="zero_bot_guild_config", region="ap-northeast-1"):
-        dynamodb = boto3.resource("dynamodb", region_name=region)
-        self.table = dynamodb.Table(table_name)
+    def __init__(self, table_name="zero_bot_guild_config", region=None, dynamodb=None):
+        # dynamodb / region の意味は DynamoStore と同じ（省略すると data.aws_clients の共有 resource）
+        self.table_name = table_name
+        self.region = region
+        self._dynamodb = dynamodb
+        self._client = None
+
+    @property
+    def client(self):
+        # 値の変換は data.dynamo_codec で行うので、resource 層ではなく低レベル client を使う
+        # （最初に DynamoDB を読むときまで作らない）
+        if self._client is None:
+            self._client = (self._dynamodb or aws_clients.dynamodb(self.region)).meta.client
+        return self._client
+
+    def _cache_key(self, guild_id: int) -> Tuple[str, str]:
+        return (self.table_name, str(guild_id))
+
+    def get_guild_config(self, guild_id: int) -> GuildConfig:
+        """
+        変換済みのギルド設定を返す（TTL キャッシュ経由）。
+        DynamoDB から読み直したときだけ GuildConfig.from_dict で変換する。
+        """
+        return _config_cache.get_or_load(
+            self._cache_key(guild_id),
+            lambda: self._compile(guild_id, self._load_config(guild_id)),
+        )
+
+    def get_cached_guild_config(self, guild_id: int) -> Optional[GuildConfig]:
+        """キャッシュに載っていればそれを返す（DynamoDB は読まない）。"""
+        return _config_cache.peek(self._cache_key(guild_id))
 
     def get_config(self, guild_id: int) -> dict:
-        resp = self.table.get_item(Key={"guild_id": str(guild_id)})
+        """
+        生の設定 dict を返す（TTL キャッシュ経由）。
+        返り値はキャッシュと共有しているので、書き換えずに読むだけにすること。
+        """
+        return self.get_guild_config(guild_id).raw
+
+    def _compile(self, guild_id: int, raw: dict) -> GuildConfig:
+        cfg = GuildConfig.from_dict(guild_id, raw)
+        # 不正値は読み込み（= 設定の版）ごとに 1 回だけ出す
+        for err in cfg.errors:
+            print(f"[GuildConfig] guild={guild_id} 不正な設定値: {err}")
+        return cfg
+
+    def invalidate(self, guild_id: int):
+        _config_cache.invalidate(self._cache_key(guild_id))
+
+    def _load_config(self, guild_id: int) -> dict:
+        resp = self.client.get_item(
+            TableName=self.table_name,
+            Key={"guild_id": {"S": str(guild_id)}},
+        )
         item = resp.get("Item")
         if not item:
             return {}
 
         # もし今後 "config" フィールドにまとめる設計に変えたくなったとき用の両対応
         if "config" in item:
-            return _from_decimal(item["config"])
+            return codec.decode(item["config"])
 
         # 今は guild_id 以外をそのまま設定として返す
-        item = {k: v for k, v in item.items() if k != "guild_id"}
-        return _from_decimal(item)
+        return {k: codec.decode(v) for k, v in item.items() if k != "guild_id"}
 
     def save_config(self, guild_id: int, config: dict):
-        cfg = _to_decimal(config)
-        self.table.put_item(
+        self.client.put_item(
+            TableName=self.table_name,
             Item={
-                "guild_id": str(guild_id),
-                # 今のテーブル構造に合わせて、cfg の中身をそのまま展開する
-                **cfg,
-            }
+                "guild_id": {"S": str(guild_id)},
+                # 今のテーブル構造に合わせて、config の中身をそのまま展開する
+                **codec.encode_item(config),
+            },
         )
+        # 保存した内容をすぐ反映させる
+        self.invalidate(guild_id)
@@ -0,0 +1,164 @@
+# data/leaderboard.py
+"""
+ギルドごとの XP ランキングをメモリ上に持っておくインデックス。
+
+ランクカードや /zbadmin voicerank / textrank のたびにギルド全員を Query して
+ソートしなくていいように、最初の 1 回だけ読み込んで、あとは XP の加算に
+合わせてその場で並べ替える。
+
+- XpIndex          : 1 種類の XP（voice / text）の並び。順位は bisect で O(log n)
+- GuildLeaderboard : 1 ギルド分（voice と text）
+- LeaderboardCache : guild_id → GuildLeaderboard（読み込み / 再読み込み / 加算の反映）
+"""
+
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+XP_KINDS = ("voice_xp", "text_xp")
+
+
+class XpIndex:
+    """
+    XP > 0 のユーザーを XP 降順に並べたもの。
+    （-xp, user_id）のソート済みリストなので、同点は user_id の小さい方が上。
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[float, int]] = []
+        self._xp: Dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def get(self, uid: int) -> float:
+        return self._xp.get(uid, 0.0)
+
+    def set(self, uid: int, xp: float):
+        old = self._xp.get(uid)
+        if old is not None:
+            i = bisect_left(self._keys, (-old, uid))
+            del self._keys[i]
+            del self._xp[uid]
+
+        # 今までの表示と同じく XP 0 以下は順位に入れない
+        if xp > 0:
+            self._xp[uid] = xp
+            insort(self._keys, (-xp, uid))
+
+    def add(self, uid: int, delta: float):
+        self.set(uid, self.get(uid) + delta)
+
+    def load(self, items: Iterable[Tuple[int, float]]):
+        """空の XpIndex にまとめて入れる（set を繰り返すと挿入ごとに O(n) かかるので、最後に 1 回だけ並べる）"""
+        for uid, xp in items:
+            if xp > 0:
+                self._xp[uid] = xp
+        self._keys = sorted((-xp, uid) for uid, xp in self._xp.items())
+
+    def rank_of(self, uid: int) -> Optional[Tuple[int, int]]:
+        """(順位, 対象人数)。XP が無いユーザーは None"""
+        xp = self._xp.get(uid)
+        if xp is None:
+            return None
+        return bisect_left(self._keys, (-xp, uid)) + 1, len(self._keys)
+
+    def top(self, k: Optional[int] = None, offset: int = 0) -> List[Tuple[int, float]]:
+        """上位から [(user_id, xp), ...]（offset から k 件。k=None なら最後まで）"""
+        end = None if k is None else offset + k
+        return [(uid, -neg_xp) for neg_xp, uid in self._keys[offset:end]]
+
+    def __iter__(self) -> Iterator[Tuple[int, float]]:
+        for neg_xp, uid in self._keys:
+            yield uid, -neg_xp
+
+
+class GuildLeaderboard:
+    def __init__(self, stats: Iterable[Tuple[int, Dict[str, float]]]):
+        """stats: (user_id, {"voice_xp", "text_xp"}) を流すもの（1 ページ読むごとに返すジェネレータでよい）"""
+        self.voice = XpIndex()
+        self.text = XpIndex()
+        self.loaded_at = time.monotonic()
+
+        voice: List[Tuple[int, float]] = []
+        text: List[Tuple[int, float]] = []
+        for uid, data in stats:
+            voice.append((uid, float(data.get("voice_xp", 0.0))))
+            text.append((uid, float(data.get("text_xp", 0.0))))
+        self.voice.load(voice)
+        self.text.load(text)
+
+    def index(self, kind: str) -> XpIndex:
+        return self.voice if kind == "voice_xp" else self.text
+
+
+class LeaderboardCache:
+    """
+    guild_id → GuildLeaderboard。
+
+    loader（iter_guild_user_stats 相当）で読み込んだあとは add() で加算を反映する。
+    読み込み中に来た加算は反映しない（読み込み結果に入っているかどうか
+    区別できないため）。その分のずれは reload_seconds ごとの読み直しで消える。
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[int], Iterable[Tuple[int, Dict[str, float]]]],
+        reload_seconds: float,
+    ):
+        self._loader = loader
+        self.reload_seconds = reload_seconds
+        self._lock = threading.Lock()
+        self._boards: Dict[int, GuildLeaderboard] = {}
+
+    def peek(self, gid: int) -> Optional[GuildLeaderboard]:
+        """読み込み済みで期限内ならそれを返す（DB には行かない）"""
+        with self._lock:
+            board = self._boards.get(gid)
+        if board is None or time.monotonic() - board.loaded_at >= self.reload_seconds:
+            return None
+        return board
+
+    def get(self, gid: int) -> GuildLeaderboard:
+        board = self.peek(gid)
+        if board is not None:
+            return board
+
+        board = GuildLeaderboard(self._loader(gid))
+        with self._lock:
+            self._boards[gid] = board
+        return board
+
+    def rank_of(self, gid: int, uid: int, kind: str) -> Optional[Tuple[int, int]]:
+        """(順位, 対象人数)。XP が無いユーザーは None"""
+        board = self.get(gid)
+        with self._lock:
+            return board.index(kind).rank_of(uid)
+
+    def top(
+        self,
+        gid: int,
+        kind: str,
+        k: Optional[int] = None,
+        offset: int = 0,
+    ) -> List[Tuple[int, float]]:
+        """上位から [(user_id, xp), ...]"""
+        board = self.get(gid)
+        with self._lock:
+            return board.index(kind).top(k, offset)
+
+    def add(self, gid: int, uid: int, kind: str, delta: float):
+        if not delta:
+            return
+        with self._lock:
+            board = self._boards.get(gid)
+            if board is not None:
+                board.index(kind).add(uid, delta)
+
+    def invalidate(self, gid: Optional[int] = None):
+        with self._lock:
+            if gid is None:
+                self._boards.clear()
+            else:
+                self._boards.pop(gid, None)
@@ -0,0 +1,1157 @@
+# data/local_dynamo.py
+"""
+プロセス内で動く DynamoDB の代用品（AWS 無しで負荷試験するため）。
+
+boto3.resource("dynamodb") の代わりに DynamoStore / GuildConfigStore /
+voice_daily_store に渡すと、テーブルの中身をメモリ上に持って同じように動く。
+
+    from data.local_dynamo import LocalDynamoDB
+    ddb = LocalDynamoDB(latency=0.008, throttle_rate=0.01)
+    store = DynamoStore("zero_bot_xp", dynamodb=ddb)
+
+対応しているもの（この Bot が実際に使う範囲）:
+- resource: Table(name), batch_get_item, batch_write_item, meta.client
+- Table   : get_item / put_item / update_item / delete_item / query
+- client  : 上と同じ操作の低レベル（AttributeValue 形式）版
+            + describe_table / update_table（GSI の追加だけ。すぐ ACTIVE になる）
+- UpdateExpression   : SET（if_not_exists / list_append / + / -）, ADD, REMOVE
+                       ネストしたパス（a.b / a[3] / #name）。4KB を超える式は ValidationException
+- ConditionExpression: AND / OR / NOT / 比較 / BETWEEN / IN /
+                       attribute_exists / attribute_not_exists / begins_with / contains
+- query              : KeyConditionExpression（boto3.dynamodb.conditions か文字列）,
+                       IndexName（GSI。キー属性を持つアイテムだけ載る疎なインデックス）,
+                       FilterExpression, ProjectionExpression, Limit, ExclusiveStartKey,
+                       ScanIndexForward。page_size で 1 ページの件数上限（1MB 相当）も再現する
+- scan               : FilterExpression, ProjectionExpression, Limit, ExclusiveStartKey
+
+latency / jitter 秒だけ 1 回の呼び出しごとに待ち、throttle_rate の確率で
+ProvisionedThroughputExceededException を投げる（batch 系はキー単位で Unprocessed に回す）。
+botocore のような自動リトライはしないので、throttle_rate はリトライし切った後の失敗率として使う。
+"""
+
+import copy
+import random
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+# この Bot が使うテーブルのキー（パーティションキー, ソートキー）
+KNOWN_TABLES: Dict[str, Tuple[str, Optional[str]]] = {
+    "zero_bot_xp": ("guild_id", "user_id"),
+    "zero_bot_guild_config": ("guild_id", None),
+    "zero_bot_voice_daily_stats": ("guild_date", "user_id"),
+}
+
+# テーブルごとのセカンダリインデックス {インデックス名: (パーティションキー, ソートキー)}
+KNOWN_INDEXES: Dict[str, Dict[str, Tuple[str, Optional[str]]]] = {
+    "zero_bot_voice_daily_stats": {
+        "guild_user-stat_date-index": ("guild_user", "stat_date"),
+    },
+}
+
+# BatchGetItem / BatchWriteItem 1 回の上限
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
+
+# 1 つの式の長さの上限（バイト）
+MAX_EXPRESSION_BYTES = 4096
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+def _error(code: str, message: str, operation: str, **extra) -> ClientError:
+    response = {"Error": {"Code": code, "Message": message}, **extra}
+    return ClientError(response, operation)
+
+
+class _ValidationError(Exception):
+    """式の評価で DynamoDB が ValidationException を返す場面"""
+
+
+class _ConditionFailed(Exception):
+    def __init__(self, old_item: Optional[Dict[str, Any]]):
+        super().__init__("The conditional request failed")
+        self.old_item = old_item
+
+
+def _check_types(value: Any):
+    """resource 層と同じく float を拒否する（Decimal を使っていない書き込みを見つけるため）"""
+    if isinstance(value, float):
+        raise TypeError("Float types are not supported. Use Decimal types instead.")
+    if isinstance(value, dict):
+        for v in value.values():
+            _check_types(v)
+    elif isinstance(value, (list, set, tuple)):
+        for v in value:
+            _check_types(v)
+
+
+# =========================
+#  式のパース / 評価
+# =========================
+_TOKEN_RE = re.compile(
+    r"\s*(?:"
+    r"(?P<op><>|<=|>=|=|<|>|\+|-|\(|\)|\[|\]|,|\.)"
+    r"|(?P<num>\d+)"
+    r"|(?P<name>[#:]?[A-Za-z_][A-Za-z0-9_\-]*)"
+    r")"
+)
+
+_MISSING = object()
+
+
+def _tokenize(expr: str) -> List[str]:
+    tokens = []
+    pos = 0
+    expr = expr.strip()
+    while pos < len(expr):
+        m = _TOKEN_RE.match(expr, pos)
+        if not m or m.end() == pos:
+            raise _ValidationError(f"Invalid expression near: {expr[pos:pos + 20]!r}")
+        tokens.append(m.group("op") or m.group("num") or m.group("name"))
+        pos = m.end()
+        while pos < len(expr) and expr[pos].isspace():
+            pos += 1
+    return tokens
+
+
+class _Parser:
+    """UpdateExpression / ConditionExpression / ProjectionExpression 共通の小さなパーサ"""
+
+    def __init__(self, expr: str, names: Dict[str, str], values: Dict[str, Any]):
+        self.tokens = _tokenize(expr)
+        self.i = 0
+        self.names = names or {}
+        self.values = values or {}
+
+    # ---- トークン操作 ----
+    def peek(self, offset: int = 0) -> Optional[str]:
+        j = self.i + offset
+        return self.tokens[j] if j < len(self.tokens) else None
+
+    def next(self) -> str:
+        tok = self.peek()
+        if tok is None:
+            raise _ValidationError("Unexpected end of expression")
+        self.i += 1
+        return tok
+
+    def expect(self, tok: str):
+        got = self.next()
+        if got.upper() != tok.upper():
+            raise _ValidationError(f"Expected {tok!r} but got {got!r}")
+
+    def at_keyword(self, *words: str) -> bool:
+        tok = self.peek()
+        return tok is not None and tok.upper() in words
+
+    def done(self) -> bool:
+        return self.i >= len(self.tokens)
+
+    # ---- パス / 値 ----
+    def _name(self, tok: str) -> str:
+        if tok.startswith("#"):
+            if tok not in self.names:
+                raise _ValidationError(f"Undefined attribute name placeholder {tok}")
+            return self.names[tok]
+        if tok.startswith(":") or not re.match(r"[A-Za-z_]", tok):
+            raise _ValidationError(f"Invalid attribute name {tok!r}")
+        return tok
+
+    def path(self) -> List[Any]:
+        parts: List[Any] = [self._name(self.next())]
+        while self.peek() in (".", "["):
+            if self.next() == ".":
+                parts.append(self._name(self.next()))
+            else:
+                parts.append(int(self.next()))
+                self.expect("]")
+        return parts
+
+    def value_ref(self) -> Any:
+        tok = self.next()
+        if tok not in self.values:
+            raise _ValidationError(f"Undefined attribute value placeholder {tok}")
+        return self.values[tok]
+
+    def operand(self):
+        """(kind, payload)。kind は 'value' か 'path'"""
+        tok = self.peek()
+        if tok is not None and tok.startswith(":"):
+            return ("value", self.value_ref())
+        return ("path", self.path())
+
+
+def _get_path(item: Dict[str, Any], path: List[Any]) -> Any:
+    cur: Any = item
+    for part in path:
+        if isinstance(part, int):
+            if not isinstance(cur, list) or part >= len(cur):
+                return _MISSING
+            cur = cur[part]
+        else:
+            if not isinstance(cur, dict) or part not in cur:
+                return _MISSING
+            cur = cur[part]
+    return cur
+
+
+def _set_path(item: Dict[str, Any], path: List[Any], value: Any):
+    parent = _get_path(item, path[:-1]) if len(path) > 1 else item
+    last = path[-1]
+    if isinstance(last, int):
+        if not isinstance(parent, list):
+            raise _ValidationError("The document path provided in the update expression is invalid for update")
+        if last < len(parent):
+            parent[last] = value
+        else:
+            # 範囲外のインデックスへの SET は末尾への追加になる
+            parent.append(value)
+    else:
+        if not isinstance(parent, dict):
+            raise _ValidationError("The document path provided in the update expression is invalid for update")
+        parent[last] = value
+
+
+def _remove_path(item: Dict[str, Any], path: List[Any]):
+    parent = _get_path(item, path[:-1]) if len(path) > 1 else item
+    last = path[-1]
+    if isinstance(last, int):
+        if isinstance(parent, list) and last < len(parent):
+            del parent[last]
+    elif isinstance(parent, dict):
+        parent.pop(last, None)
+
+
+def _operand_value(item: Dict[str, Any], operand) -> Any:
+    kind, payload = operand
+    return payload if kind == "value" else _get_path(item, payload)
+
+
+def _is_number(v: Any) -> bool:
+    return isinstance(v, (Decimal, int)) and not isinstance(v, bool)
+
+
+def _compare(a: Any, op: str, b: Any) -> bool:
+    if a is _MISSING or b is _MISSING:
+        return False
+    if op == "=":
+        return a == b
+    if op == "<>":
+        return a != b
+    # 大小比較は同じ型（数値同士 / 文字列同士 / バイナリ同士）のときだけ
+    same = (_is_number(a) and _is_number(b)) or (type(a) is type(b) and isinstance(a, (str, bytes)))
+    if not same:
+        return False
+    return {"<": a < b, "<=": a <= b, ">": a > b, ">=": a >= b}[op]
+
+
+def _eval_condition(p: _Parser, item: Dict[str, Any]) -> bool:
+    result = _eval_and(p, item)
+    while p.at_keyword("OR"):
+        p.next()
+        rhs = _eval_and(p, item)
+        result = result or rhs
+    return result
+
+
+def _eval_and(p: _Parser, item: Dict[str, Any]) -> bool:
+    result = _eval_not(p, item)
+    while p.at_keyword("AND"):
+        p.next()
+        rhs = _eval_not(p, item)
+        result = result and rhs
+    return result
+
+
+def _eval_not(p: _Parser, item: Dict[str, Any]) -> bool:
+    if p.at_keyword("NOT"):
+        p.next()
+        return not _eval_not(p, item)
+    return _eval_primary(p, item)
+
+
+def _eval_primary(p: _Parser, item: Dict[str, Any]) -> bool:
+    tok = p.peek()
+    if tok == "(":
+        p.next()
+        result = _eval_condition(p, item)
+        p.expect(")")
+        return result
+
+    func = (tok or "").lower()
+    if p.peek(1) == "(" and func in ("attribute_exists", "attribute_not_exists", "begins_with", "contains"):
+        p.next()
+        p.expect("(")
+        if func in ("attribute_exists", "attribute_not_exists"):
+            exists = _get_path(item, p.path()) is not _MISSING
+            p.expect(")")
+            return exists if func == "attribute_exists" else not exists
+        a = _operand_value(item, p.operand())
+        p.expect(",")
+        b = _operand_value(item, p.operand())
+        p.expect(")")
+        if a is _MISSING or b is _MISSING:
+            return False
+        if func == "begins_with":
+            return isinstance(a, (str, bytes)) and type(a) is type(b) and a.startswith(b)
+        if isinstance(a, (str, bytes)):
+            return type(a) is type(b) and b in a
+        return isinstance(a, (list, set)) and b in a
+
+    a = _operand_value(item, p.operand())
+    if p.at_keyword("BETWEEN"):
+        p.next()
+        lo = _operand_value(item, p.operand())
+        p.expect("AND")
+        hi = _operand_value(item, p.operand())
+        return _compare(a, ">=", lo) and _compare(a, "<=", hi)
+    if p.at_keyword("IN"):
+        p.next()
+        p.expect("(")
+        candidates = [_operand_value(item, p.operand())]
+        while p.peek() == ",":
+            p.next()
+            candidates.append(_operand_value(item, p.operand()))
+        p.expect(")")
+        return a is not _MISSING and a in candidates
+
+    op = p.next()
+    if op not in ("=", "<>", "<", "<=", ">", ">="):
+        raise _ValidationError(f"Invalid comparison operator {op!r}")
+    b = _operand_value(item, p.operand())
+    return _compare(a, op, b)
+
+
+def evaluate_condition(expr: str, item: Dict[str, Any], names=None, values=None) -> bool:
+    p = _Parser(expr, names, values)
+    result = _eval_condition(p, item)
+    if not p.done():
+        raise _ValidationError(f"Unexpected token {p.peek()!r} in condition")
+    return result
+
+
+def _eval_set_value(p: _Parser, item: Dict[str, Any]) -> Any:
+    value = _eval_set_operand(p, item)
+    if p.peek() in ("+", "-"):
+        op = p.next()
+        rhs = _eval_set_operand(p, item)
+        if not (_is_number(value) and _is_number(rhs)):
+            raise _ValidationError("An operand in the update expression has an incorrect data type")
+        value = value + rhs if op == "+" else value - rhs
+    return value
+
+
+def _eval_set_operand(p: _Parser, item: Dict[str, Any]) -> Any:
+    tok = (p.peek() or "").lower()
+    if p.peek(1) == "(" and tok in ("if_not_exists", "list_append"):
+        p.next()
+        p.expect("(")
+        if tok == "if_not_exists":
+            current = _get_path(item, p.path())
+            p.expect(",")
+            fallback = _eval_set_value(p, item)
+            p.expect(")")
+            return fallback if current is _MISSING else current
+        a = _eval_set_value(p, item)
+        p.expect(",")
+        b = _eval_set_value(p, item)
+        p.expect(")")
+        if not isinstance(a, list) or not isinstance(b, list):
+            raise _ValidationError("An operand in the update expression has an incorrect data type")
+        return a + b
+
+    value = _operand_value(item, p.operand())
+    if value is _MISSING:
+        raise _ValidationError("The provided expression refers to an attribute that does not exist in the item")
+    return copy.deepcopy(value)
+
+
+def apply_update(
+    item: Dict[str, Any],
+    expr: str,
+    names=None,
+    values=None,
+) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    UpdateExpression を当てた新しいアイテムと、更新したトップレベルの属性名を返す。
+    右辺はすべて更新前のアイテムで評価する（DynamoDB と同じ）。
+    """
+    p = _Parser(expr, names, values)
+    actions: List[Tuple[str, List[Any], Any]] = []
+
+    while not p.done():
+        clause = p.next().upper()
+        if clause not in ("SET", "ADD", "REMOVE"):
+            raise _ValidationError(f"Unsupported update clause {clause!r}")
+        while True:
+            path = p.path()
+            if clause == "SET":
+                p.expect("=")
+                actions.append(("SET", path, _eval_set_value(p, item)))
+            elif clause == "ADD":
+                actions.append(("ADD", path, p.value_ref()))
+            else:
+                actions.append(("REMOVE", path, None))
+            if p.peek() != ",":
+                break
+            p.next()
+
+    new_item = copy.deepcopy(item)
+    touched: List[str] = []
+    for action, path, value in actions:
+        if path[0] not in touched:
+            touched.append(path[0])
+        if action == "SET":
+            _set_path(new_item, path, value)
+        elif action == "REMOVE":
+            _remove_path(new_item, path)
+        else:
+            current = _get_path(new_item, path)
+            if current is _MISSING:
+                _set_path(new_item, path, copy.deepcopy(value))
+            elif _is_number(current) and _is_number(value):
+                _set_path(new_item, path, current + value)
+            elif isinstance(current, set) and isinstance(value, set):
+                _set_path(new_item, path, current | value)
+            else:
+                raise _ValidationError("An operand in the update expression has an incorrect data type")
+    return new_item, touched
+
+
+def _project(item: Dict[str, Any], expr: Optional[str], names=None) -> Dict[str, Any]:
+    if not expr:
+        return copy.deepcopy(item)
+    p = _Parser(expr, names, {})
+    out: Dict[str, Any] = {}
+    while True:
+        path = p.path()
+        # ネストしたパスはトップレベルの属性ごと返す（この Bot の使い方では十分）
+        if path[0] in item:
+            out[path[0]] = copy.deepcopy(item[path[0]])
+        if p.peek() != ",":
+            break
+        p.next()
+    return out
+
+
+def _build_condition(cond, names: Dict[str, str], values: Dict[str, Any], is_key: bool) -> str:
+    """boto3.dynamodb.conditions の条件なら式の文字列にして、名前 / 値を names, values に足す"""
+    if isinstance(cond, str):
+        return cond
+    if not isinstance(cond, ConditionBase):
+        raise TypeError(f"unsupported condition: {cond!r}")
+    built = ConditionExpressionBuilder().build_expression(cond, is_key_condition=is_key)
+    # 呼び出し側のプレースホルダと被らないように付け替える
+    expr = built.condition_expression
+    for ph, name in built.attribute_name_placeholders.items():
+        new = f"#local{len(names)}"
+        names[new] = name
+        expr = re.sub(re.escape(ph) + r"\b", new, expr)
+    for ph, value in built.attribute_value_placeholders.items():
+        new = f":local{len(values)}"
+        values[new] = value
+        expr = re.sub(re.escape(ph) + r"\b", new, expr)
+    return expr
+
+
+# =========================
+#  テーブル
+# =========================
+class _IndexData:
+    """
+    セカンダリインデックス 1 つ分。
+    {インデックスのパーティションキー値: [(インデックスのソートキー値, テーブルの hk, テーブルの rk)]}
+    """
+
+    def __init__(self, name: str, hash_key: str, range_key: Optional[str]):
+        self.name = name
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.entries: Dict[Any, List[Tuple[Any, Any, Any]]] = {}
+
+    def entry_of(self, item: Dict[str, Any], hk, rk) -> Optional[Tuple[Any, Tuple[Any, Any, Any]]]:
+        if self.hash_key not in item or (self.range_key and self.range_key not in item):
+            return None
+        return item[self.hash_key], (item.get(self.range_key) if self.range_key else None, hk, rk)
+
+    def add(self, item, hk, rk):
+        entry = self.entry_of(item, hk, rk)
+        if entry:
+            insort(self.entries.setdefault(entry[0], []), entry[1])
+
+    def remove(self, item, hk, rk):
+        entry = self.entry_of(item, hk, rk)
+        if entry:
+            rows = self.entries[entry[0]]
+            rows.remove(entry[1])
+            if not rows:
+                del self.entries[entry[0]]
+
+
+class _TableData:
+    """1 テーブル分の中身。{パーティションキー値: {ソートキー値: アイテム}} + ソート済みのキー"""
+
+    def __init__(
+        self,
+        name: str,
+        hash_key: str,
+        range_key: Optional[str],
+        indexes: Optional[Dict[str, Tuple[str, Optional[str]]]] = None,
+    ):
+        self.name = name
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.partitions: Dict[Any, Dict[Any, Dict[str, Any]]] = {}
+        self.sort_keys: Dict[Any, List[Any]] = {}
+        self.indexes: Dict[str, _IndexData] = {
+            idx: _IndexData(idx, ihk, irk) for idx, (ihk, irk) in (indexes or {}).items()
+        }
+
+    def key_of(self, key: Dict[str, Any], operation: str) -> Tuple[Any, Any]:
+        expected = {self.hash_key} | ({self.range_key} if self.range_key else set())
+        if set(key) != expected:
+            raise _error(
+                "ValidationException",
+                "The provided key element does not match the schema",
+                operation,
+            )
+        return key[self.hash_key], key.get(self.range_key) if self.range_key else None
+
+    def key_attrs(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        out = {self.hash_key: item[self.hash_key]}
+        if self.range_key:
+            out[self.range_key] = item[self.range_key]
+        return out
+
+    def get(self, hk, rk) -> Optional[Dict[str, Any]]:
+        return self.partitions.get(hk, {}).get(rk)
+
+    def put(self, hk, rk, item: Dict[str, Any]):
+        part = self.partitions.setdefault(hk, {})
+        old = part.get(rk)
+        if old is None:
+            insort(self.sort_keys.setdefault(hk, []), rk)
+        for index in self.indexes.values():
+            if old is not None:
+                index.remove(old, hk, rk)
+            index.add(item, hk, rk)
+        part[rk] = item
+
+    def delete(self, hk, rk):
+        part = self.partitions.get(hk)
+        if not part or rk not in part:
+            return
+        for index in self.indexes.values():
+            index.remove(part[rk], hk, rk)
+        del part[rk]
+        self.sort_keys[hk].remove(rk)
+        if not part:
+            del self.partitions[hk]
+            del self.sort_keys[hk]
+
+
+class LocalTable:
+    """boto3 の Table と同じ呼び方ができるテーブル（値は Python の型 / Decimal）"""
+
+    def __init__(self, db: "LocalDynamoDB", data: _TableData):
+        self._db = db
+        self._data = data
+        self.name = data.name
+        self.table_name = data.name
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, **_):
+        self._db._call("GetItem")
+        with self._db._lock:
+            item = self._data.get(*self._data.key_of(Key, "GetItem"))
+            if item is None:
+                return {}
+            return {"Item": _project(item, ProjectionExpression, ExpressionAttributeNames)}
+
+    def put_item(
+        self,
+        Item,
+        ConditionExpression=None,
+        ExpressionAttributeNames=None,
+        ExpressionAttributeValues=None,
+        ReturnValues="NONE",
+        **_,
+    ):
+        _check_types(Item)
+        _check_types(ExpressionAttributeValues)
+        self._db._call("PutItem")
+        with self._db._lock:
+            return self._db._put(self._data, Item, ConditionExpression, ExpressionAttributeNames,
+                                 ExpressionAttributeValues, ReturnValues, "PutItem")
+
+    def update_item(
+        self,
+        Key,
+        UpdateExpression=None,
+        ConditionExpression=None,
+        ExpressionAttributeNames=None,
+        ExpressionAttributeValues=None,
+        ReturnValues="NONE",
+        ReturnValuesOnConditionCheckFailure="NONE",
+        **_,
+    ):
+        _check_types(ExpressionAttributeValues)
+        self._db._call("UpdateItem")
+        with self._db._lock:
+            return self._db._update(
+                self._data, Key, UpdateExpression, ConditionExpression,
+                ExpressionAttributeNames, ExpressionAttributeValues,
+                ReturnValues, ReturnValuesOnConditionCheckFailure, "UpdateItem",
+            )
+
+    def delete_item(
+        self,
+        Key,
+        ConditionExpression=None,
+        ExpressionAttributeNames=None,
+        ExpressionAttributeValues=None,
+        ReturnValues="NONE",
+        **_,
+    ):
+        self._db._call("DeleteItem")
+        with self._db._lock:
+            return self._db._delete(self._data, Key, ConditionExpression, ExpressionAttributeNames,
+                                    ExpressionAttributeValues, ReturnValues, "DeleteItem")
+
+    def query(
+        self,
+        KeyConditionExpression,
+        IndexName=None,
+        FilterExpression=None,
+        ProjectionExpression=None,
+        ExpressionAttributeNames=None,
+        ExpressionAttributeValues=None,
+        ExclusiveStartKey=None,
+        Limit=None,
+        ScanIndexForward=True,
+        Select=None,
+        **_,
+    ):
+        self._db._call("Query")
+        with self._db._lock:
+            return self._db._query(
+                self._data, IndexName, KeyConditionExpression, FilterExpression, ProjectionExpression,
+                ExpressionAttributeNames, ExpressionAttributeValues, ExclusiveStartKey,
+                Limit, ScanIndexForward, Select,
+            )
+
+    def scan(
+        self,
+        FilterExpression=None,
+        ProjectionExpression=None,
+        ExpressionAttributeNames=None,
+        ExpressionAttributeValues=None,
+        ExclusiveStartKey=None,
+        Limit=None,
+        Select=None,
+        **_,
+    ):
+        self._db._call("Scan")
+        with self._db._lock:
+            return self._db._scan(
+                self._data, FilterExpression, ProjectionExpression, ExpressionAttributeNames,
+                ExpressionAttributeValues, ExclusiveStartKey, Limit, Select,
+            )
+
+
+class _Meta:
+    def __init__(self, client):
+        self.client = client
+
+
+class LocalDynamoDB:
+    """
+    boto3.resource("dynamodb") の代わり。
+
+    latency      : 1 回の呼び出しで待つ秒数
+    jitter       : latency に足す 0〜jitter 秒のばらつき
+    throttle_rate: 1 回の呼び出し（batch はキー単位）がスロットリングされる確率
+    page_size    : Query の 1 ページの件数上限（None なら Limit だけ）
+    tables       : {テーブル名: (パーティションキー, ソートキー or None)}（KNOWN_TABLES に追加）
+    indexes      : {テーブル名: {インデックス名: (パーティションキー, ソートキー)}}（KNOWN_INDEXES に追加）
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        throttle_rate: float = 0.0,
+        page_size: Optional[int] = None,
+        tables: Optional[Dict[str, Tuple[str, Optional[str]]]] = None,
+        indexes: Optional[Dict[str, Dict[str, Tuple[str, Optional[str]]]]] = None,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.page_size = page_size
+        self.calls: Counter = Counter()
+        self.throttled: Counter = Counter()
+
+        self._lock = threading.RLock()
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._tables: Dict[str, _TableData] = {}
+        all_indexes = {**KNOWN_INDEXES, **(indexes or {})}
+        for name, (hk, rk) in {**KNOWN_TABLES, **(tables or {})}.items():
+            self.create_table(name, hk, rk, all_indexes.get(name))
+
+        self.meta = _Meta(LocalDynamoDBClient(self))
+
+    # ---- テーブル ----
+    def create_table(
+        self,
+        name: str,
+        hash_key: str,
+        range_key: Optional[str] = None,
+        indexes: Optional[Dict[str, Tuple[str, Optional[str]]]] = None,
+    ) -> LocalTable:
+        with self._lock:
+            self._tables[name] = _TableData(name, hash_key, range_key, indexes)
+        return self.Table(name)
+
+    def Table(self, name: str) -> LocalTable:
+        return LocalTable(self, self._table(name, "DescribeTable"))
+
+    def add_index(self, table: str, name: str, hash_key: str, range_key: Optional[str] = None):
+        """既存のテーブルに GSI を足して、今あるアイテムを載せる（作成はすぐ終わって ACTIVE になる）"""
+        with self._lock:
+            data = self._table(table, "UpdateTable")
+            index = data.indexes[name] = _IndexData(name, hash_key, range_key)
+            for hk, part in data.partitions.items():
+                for rk, item in part.items():
+                    index.add(item, hk, rk)
+
+    def _table(self, name: str, operation: str) -> _TableData:
+        data = self._tables.get(name)
+        if data is None:
+            raise _error("ResourceNotFoundException", f"Requested resource not found: Table: {name} not found", operation)
+        return data
+
+    # ---- 遅延 / スロットリング ----
+    def _roll(self) -> bool:
+        if not self.throttle_rate:
+            return False
+        with self._rng_lock:
+            return self._rng.random() < self.throttle_rate
+
+    def _call(self, operation: str, *, throttle: bool = True):
+        """1 回分の往復を待ち、スロットリングに当たったら例外にする"""
+        self.calls[operation] += 1
+        wait = self.latency
+        if self.jitter:
+            with self._rng_lock:
+                wait += self._rng.uniform(0.0, self.jitter)
+        if wait > 0:
+            time.sleep(wait)
+        if throttle and self._roll():
+            self.throttled[operation] += 1
+            raise _error(
+                "ProvisionedThroughputExceededException",
+                "The level of configured provisioned throughput for the table was exceeded.",
+                operation,
+            )
+
+    # ---- 操作本体（ロックを持った状態で呼ぶ） ----
+    def _check_condition(self, item, expr, names, values, return_on_fail):
+        if not expr:
+            return
+        names = dict(names or {})
+        values = dict(values or {})
+        expr = _build_condition(expr, names, values, is_key=False)
+        if not evaluate_condition(expr, item or {}, names, values):
+            raise _ConditionFailed(item if return_on_fail == "ALL_OLD" else None)
+
+    @staticmethod
+    def _validation(operation: str, e: Exception) -> ClientError:
+        return _error("ValidationException", str(e), operation)
+
+    @staticmethod
+    def _condition_failed(operation: str, e: "_ConditionFailed") -> ClientError:
+        extra = {}
+        if e.old_item is not None:
+            extra["Item"] = {k: _serializer.serialize(v) for k, v in e.old_item.items()}
+        return _error("ConditionalCheckFailedException", "The conditional request failed", operation, **extra)
+
+    def _put(self, data, item, cond, names, values, return_values, operation):
+        if data.hash_key not in item or (data.range_key and data.range_key not in item):
+            raise _error("ValidationException", "One of the required keys was not given a value", operation)
+        hk, rk = item[data.hash_key], item.get(data.range_key) if data.range_key else None
+        old = data.get(hk, rk)
+        try:
+            self._check_condition(old, cond, names, values, "NONE")
+        except _ValidationError as e:
+            raise self._validation(operation, e)
+        except _ConditionFailed as e:
+            raise self._condition_failed(operation, e)
+        data.put(hk, rk, copy.deepcopy(item))
+        if return_values == "ALL_OLD" and old is not None:
+            return {"Attributes": copy.deepcopy(old)}
+        return {}
+
+    def _update(self, data, key, update, cond, names, values, return_values, return_on_fail,
+                operation):
+        hk, rk = data.key_of(key, operation)
+        if update and len(update.encode("utf-8")) > MAX_EXPRESSION_BYTES:
+            raise _error(
+                "ValidationException",
+                "Invalid UpdateExpression: Expression size has exceeded the maximum allowed size",
+                operation,
+            )
+        old = data.get(hk, rk)
+        # apply_update はコピーに書くので、ここでは元のアイテムをそのまま渡す
+        base = old if old is not None else dict(key)
+        try:
+            self._check_condition(old, cond, names, values, return_on_fail)
+            new, touched = apply_update(base, update, names, values) if update else (copy.deepcopy(base), [])
+        except _ValidationError as e:
+            raise self._validation(operation, e)
+        except _ConditionFailed as e:
+            raise self._condition_failed(operation, e)
+
+        if any(k in touched for k in data.key_attrs(base)):
+            raise _error("ValidationException", "Cannot update attribute: this attribute is part of the key", operation)
+        data.put(hk, rk, new)
+
+        if return_values == "ALL_NEW":
+            return {"Attributes": copy.deepcopy(new)}
+        if return_values == "ALL_OLD":
+            return {"Attributes": copy.deepcopy(old)} if old is not None else {}
+        if return_values in ("UPDATED_OLD", "UPDATED_NEW"):
+            src = (old or {}) if return_values == "UPDATED_OLD" else new
+            attrs = {k: copy.deepcopy(src[k]) for k in touched if k in src}
+            return {"Attributes": attrs} if attrs else {}
+        return {}
+
+    def _delete(self, data, key, cond, names, values, return_values, operation):
+        hk, rk = data.key_of(key, operation)
+        old = data.get(hk, rk)
+        try:
+            self._check_condition(old, cond, names, values, "NONE")
+        except _ValidationError as e:
+            raise self._validation(operation, e)
+        except _ConditionFailed as e:
+            raise self._condition_failed(operation, e)
+        data.delete(hk, rk)
+        if return_values == "ALL_OLD" and old is not None:
+            return {"Attributes": copy.deepcopy(old)}
+        return {}
+
+    def _query(self, data, index_name, key_cond, filter_expr, projection, names, values, start_key,
+               limit, forward, select):
+        names = dict(names or {})
+        values = dict(values or {})
+        if index_name is None:
+            hash_key, range_key = data.hash_key, data.range_key
+        elif index_name in data.indexes:
+            index = data.indexes[index_name]
+            hash_key, range_key = index.hash_key, index.range_key
+        else:
+            raise _error(
+                "ValidationException",
+                f"The table does not have the specified index: {index_name}",
+                "Query",
+            )
+        try:
+            key_expr = _build_condition(key_cond, names, values, is_key=True)
+            filter_expr = _build_condition(filter_expr, names, values, is_key=False) if filter_expr else None
+
+            # パーティションキーは = で 1 つに決まっている必要がある
+            hv = self._partition_value(hash_key, key_expr, names, values)
+        except _ValidationError as e:
+            raise self._validation("Query", e)
+
+        # (ソートキー値, テーブルの hk, テーブルの rk) の昇順
+        if index_name is None:
+            rows = [(rk, hv, rk) for rk in data.sort_keys.get(hv, [])]
+        else:
+            rows = data.indexes[index_name].entries.get(hv, [])
+
+        if start_key:
+            s_hk, s_rk = data.key_of({k: v for k, v in start_key.items()
+                                      if k in (data.hash_key, data.range_key)}, "Query")
+            start = (start_key.get(range_key) if range_key else None, s_hk, s_rk)
+            rows = rows[bisect_right(rows, start):] if forward else rows[:bisect_left(rows, start)]
+        if not forward:
+            rows = list(reversed(rows))
+
+        page_limit = min(x for x in (limit, self.page_size, len(rows) + 1) if x)
+        items: List[Dict[str, Any]] = []
+        scanned = 0
+        last_key = None
+        for _, hk, rk in rows:
+            item = data.get(hk, rk)
+            if not evaluate_condition(key_expr, item, names, values):
+                continue
+            scanned += 1
+            if filter_expr is None or evaluate_condition(filter_expr, item, names, values):
+                items.append(item)
+            if scanned >= page_limit:
+                last_key = data.key_attrs(item)
+                if index_name is not None:
+                    last_key[hash_key] = item[hash_key]
+                    if range_key:
+                        last_key[range_key] = item[range_key]
+                break
+
+        resp: Dict[str, Any] = {"Count": len(items), "ScannedCount": scanned}
+        if select != "COUNT":
+            resp["Items"] = [_project(i, projection, names) for i in items]
+        if last_key is not None:
+            resp["LastEvaluatedKey"] = copy.deepcopy(last_key)
+        return resp
+
+    def _scan(self, data, filter_expr, projection, names, values, start_key, limit, select):
+        names = dict(names or {})
+        values = dict(values or {})
+        try:
+            filter_expr = _build_condition(filter_expr, names, values, is_key=False) if filter_expr else None
+        except _ValidationError as e:
+            raise self._validation("Scan", e)
+
+        keys = [(hk, rk) for hk, rks in data.sort_keys.items() for rk in rks]
+        if start_key:
+            start = data.key_of(start_key, "Scan")
+            keys = keys[keys.index(start) + 1:] if start in keys else []
+
+        page_limit = min(x for x in (limit, self.page_size, len(keys) + 1) if x)
+        items: List[Dict[str, Any]] = []
+        scanned = 0
+        last_key = None
+        for hk, rk in keys:
+            item = data.get(hk, rk)
+            scanned += 1
+            if filter_expr is None or evaluate_condition(filter_expr, item, names, values):
+                items.append(item)
+            if scanned >= page_limit:
+                last_key = data.key_attrs(item)
+                break
+
+        resp: Dict[str, Any] = {"Count": len(items), "ScannedCount": scanned}
+        if select != "COUNT":
+            resp["Items"] = [_project(i, projection, names) for i in items]
+        if last_key is not None:
+            resp["LastEvaluatedKey"] = copy.deepcopy(last_key)
+        return resp
+
+    @staticmethod
+    def _partition_value(hash_key: str, key_expr: str, names, values):
+        p = _Parser(key_expr, names, values)
+        # "<pk> = :v [AND ...]" か "(<pk> = :v) AND ..." の形
+        while p.peek() == "(":
+            p.next()
+        path = p.path()
+        p.expect("=")
+        value = p.value_ref()
+        if path != [hash_key]:
+            raise _ValidationError("Query condition missed key schema element: " + hash_key)
+        return value
+
+    # ---- batch ----
+    def batch_get_item(self, RequestItems, **_):
+        self._call("BatchGetItem", throttle=False)
+        total = sum(len(req["Keys"]) for req in RequestItems.values())
+        if total > BATCH_GET_LIMIT:
+            raise _error("ValidationException", "Too many items requested for the BatchGetItem call", "BatchGetItem")
+
+        responses: Dict[str, List[Dict[str, Any]]] = {}
+        unprocessed: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for name, req in RequestItems.items():
+                data = self._table(name, "BatchGetItem")
+                names = req.get("ExpressionAttributeNames")
+                for key in req["Keys"]:
+                    if self._roll():
+                        self.throttled["BatchGetItem"] += 1
+                        rest = unprocessed.setdefault(name, {k: v for k, v in req.items() if k != "Keys"})
+                        rest.setdefault("Keys", []).append(copy.deepcopy(key))
+                        continue
+                    item = data.get(*data.key_of(key, "BatchGetItem"))
+                    if item is not None:
+                        responses.setdefault(name, []).append(
+                            _project(item, req.get("ProjectionExpression"), names)
+                        )
+        return {"Responses": responses, "UnprocessedKeys": unprocessed}
+
+    def batch_write_item(self, RequestItems, **_):
+        self._call("BatchWriteItem", throttle=False)
+        total = sum(len(reqs) for reqs in RequestItems.values())
+        if total > BATCH_WRITE_LIMIT:
+            raise _error("ValidationException", "Too many items requested for the BatchWriteItem call", "BatchWriteItem")
+
+        unprocessed: Dict[str, List[Dict[str, Any]]] = {}
+        with self._lock:
+            for name, reqs in RequestItems.items():
+                data = self._table(name, "BatchWriteItem")
+                for req in reqs:
+                    if self._roll():
+                        self.throttled["BatchWriteItem"] += 1
+                        unprocessed.setdefault(name, []).append(copy.deepcopy(req))
+                        continue
+                    if "PutRequest" in req:
+                        _check_types(req["PutRequest"]["Item"])
+                        self._put(data, req["PutRequest"]["Item"], None, None, None, "NONE", "BatchWriteItem")
+                    else:
+                        self._delete(data, req["DeleteRequest"]["Key"], None, None, None, "NONE", "BatchWriteItem")
+        return {"UnprocessedItems": unprocessed}
+
+    # ---- 中身の確認用 ----
+    def item_count(self, table_name: str) -> int:
+        with self._lock:
+            return sum(len(p) for p in self._table(table_name, "Scan").partitions.values())
+
+
+# =========================
+#  低レベル client
+# =========================
+def _deser(av: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: _deserializer.deserialize(v) for k, v in (av or {}).items()}
+
+
+def _ser(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: _serializer.serialize(v) for k, v in item.items()}
+
+
+class LocalDynamoDBClient:
+    """boto3.client("dynamodb") 相当。入出力は AttributeValue 形式"""
+
+    def __init__(self, db: LocalDynamoDB):
+        self._db = db
+
+    @staticmethod
+    def _in(params: Dict[str, Any]) -> Dict[str, Any]:
+        out = {k: v for k, v in params.items() if k != "TableName"}
+        for k in ("Key", "Item", "ExpressionAttributeValues", "ExclusiveStartKey"):
+            if k in out:
+                out[k] = _deser(out[k])
+        return out
+
+    @staticmethod
+    def _out(resp: Dict[str, Any]) -> Dict[str, Any]:
+        out = dict(resp)
+        for k in ("Item", "Attributes", "LastEvaluatedKey"):
+            if k in out:
+                out[k] = _ser(out[k])
+        if "Items" in out:
+            out["Items"] = [_ser(i) for i in out["Items"]]
+        return out
+
+    def describe_table(self, TableName, **_):
+        data = self._db._table(TableName, "DescribeTable")
+
+        def _schema(hk, rk):
+            return [{"AttributeName": hk, "KeyType": "HASH"}] + (
+                [{"AttributeName": rk, "KeyType": "RANGE"}] if rk else []
+            )
+
+        return {"Table": {
+            "TableName": TableName,
+            "TableStatus": "ACTIVE",
+            "KeySchema": _schema(data.hash_key, data.range_key),
+            "BillingModeSummary": {"BillingMode": "PAY_PER_REQUEST"},
+            "GlobalSecondaryIndexes": [
+                {"IndexName": i.name, "IndexStatus": "ACTIVE", "KeySchema": _schema(i.hash_key, i.range_key)}
+                for i in data.indexes.values()
+            ],
+        }}
+
+    def update_table(self, TableName, GlobalSecondaryIndexUpdates=(), **_):
+        """GSI の Create だけ対応"""
+        for update in GlobalSecondaryIndexUpdates:
+            create = update.get("Create")
+            if create is None:
+                raise _error("ValidationException", f"Unsupported index update {list(update)}", "UpdateTable")
+            keys = {k["KeyType"]: k["AttributeName"] for k in create["KeySchema"]}
+            self._db.add_index(TableName, create["IndexName"], keys["HASH"], keys.get("RANGE"))
+        return self.describe_table(TableName)
+
+    def get_item(self, TableName, **params):
+        return self._out(self._db.Table(TableName).get_item(**self._in(params)))
+
+    def put_item(self, TableName, **params):
+        return self._out(self._db.Table(TableName).put_item(**self._in(params)))
+
+    def update_item(self, TableName, **params):
+        return self._out(self._db.Table(TableName).update_item(**self._in(params)))
+
+    def delete_item(self, TableName, **params):
+        return self._out(self._db.Table(TableName).delete_item(**self._in(params)))
+
+    def query(self, TableName, **params):
+        return self._out(self._db.Table(TableName).query(**self._in(params)))
+
+    def scan(self, TableName, **params):
+        return self._out(self._db.Table(TableName).scan(**self._in(params)))
+
+    def batch_get_item(self, RequestItems, **_):
+        request = {
+            name: {**req, "Keys": [_deser(k) for k in req["Keys"]]}
+            for name, req in RequestItems.items()
+        }
+        resp = self._db.batch_get_item(RequestItems=request)
+        return {
+            "Responses": {n: [_ser(i) for i in items] for n, items in resp["Responses"].items()},
+            "UnprocessedKeys": {
+                n: {**req, "Keys": [_ser(k) for k in req["Keys"]]}
+                for n, req in resp["UnprocessedKeys"].items()
+            },
+        }
+
+    def batch_write_item(self, RequestItems, **_):
+        def _conv(req, f):
+            if "PutRequest" in req:
+                return {"PutRequest": {"Item": f(req["PutRequest"]["Item"])}}
+            return {"DeleteRequest": {"Key": f(req["DeleteRequest"]["Key"])}}
+
+        request = {n: [_conv(r, _deser) for r in reqs] for n, reqs in RequestItems.items()}
+        resp = self._db.batch_write_item(RequestItems=request)
+        return {
+            "UnprocessedItems": {
+                n: [_conv(r, _ser) for r in reqs] for n, reqs in resp["UnprocessedItems"].items()
+            }
+        }
+
+
+# =========================
+#  プロセス全体で共有するインスタンス
+# =========================
+_shared: Optional[LocalDynamoDB] = None
+_shared_lock = threading.Lock()
+
+
+def shared_local_dynamodb() -> LocalDynamoDB:
+    """
+    DYNAMODB_LOCAL=true のときに DynamoStore / GuildConfigStore / voice_daily_store が
+    同じ中身を見るための共有インスタンス（設定は config.DYNAMODB_LOCAL_*）。
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            from config import (
+                DYNAMODB_LOCAL_LATENCY_MS,
+                DYNAMODB_LOCAL_JITTER_MS,
+                DYNAMODB_LOCAL_THROTTLE_RATE,
+                DYNAMODB_LOCAL_PAGE_SIZE,
+            )
+            _shared = LocalDynamoDB(
+                latency=DYNAMODB_LOCAL_LATENCY_MS / 1000,
+                jitter=DYNAMODB_LOCAL_JITTER_MS / 1000,
+                throttle_rate=DYNAMODB_LOCAL_THROTTLE_RATE,
+                page_size=DYNAMODB_LOCAL_PAGE_SIZE or None,
+            )
+        return _shared
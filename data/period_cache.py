@@ -0,0 +1,123 @@
+# data/period_cache.py
+"""
+閉じた日（と週 / 月の集計）の日次VC集計をローカルに持っておくキャッシュ。
+
+JST で閉じた日の zero_bot_voice_daily_stats の行はもう変わらないので、
+一度読んだら {user_id: total_min} をファイルに保存して、次からは DynamoDB を読まない。
+
+    root/
+      <guild_id>/
+        2025-11-30.json     # 日
+        W2025-11-24.json    # 週（月曜始まり）
+        M2025-11.json       # 月
+
+キーは guild_date パーティションキーの "#" より後ろ（voice_daily_store._period_key と同じ）。
+ファイルは一時ファイルに書いてから os.replace するので、読み手が書きかけを見ることはない。
+閉じた日に遅れて書き込みがあったら、書いた側が invalidate でその日と週 / 月を消す。
+"""
+
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# ファイル名にしてよいキー（日 / 週 / 月）
+_KEY_RE = re.compile(r"^[WM]?\d{4}-\d{2}(-\d{2})?$")
+
+
+class PeriodCache:
+    """
+    (guild_id, パーティションのキー) → {user_id: total_min}。
+
+    ディスクに加えて、最近使った max_entries 件はメモリにも載せておく。
+    """
+
+    def __init__(self, root: str, max_entries: int = 4096):
+        self.root = root
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[Tuple[int, str], Dict[int, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # invalidate のたびに増える（読み始めたあとに消された分を put で書き戻さないため）
+        self.generation = 0
+
+    def _path(self, guild_id: int, key: str) -> str:
+        if not _KEY_RE.match(key):
+            raise ValueError(f"invalid period key: {key!r}")
+        return os.path.join(self.root, str(int(guild_id)), f"{key}.json")
+
+    def _remember(self, ck: Tuple[int, str], totals: Dict[int, float]):
+        # ロックを持った状態で呼ぶ
+        self._memory[ck] = totals
+        self._memory.move_to_end(ck)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, guild_id: int, key: str) -> Optional[Dict[int, float]]:
+        """キャッシュがあれば {user_id: total_min}（呼び出し側で書き換えないこと）、なければ None"""
+        ck = (guild_id, key)
+        with self._lock:
+            totals = self._memory.get(ck)
+            if totals is not None:
+                self._memory.move_to_end(ck)
+                self.hits += 1
+                return totals
+
+        try:
+            with open(self._path(guild_id, key), "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            totals = {int(uid): float(v) for uid, v in raw.items()}
+        except FileNotFoundError:
+            totals = None
+        except (OSError, ValueError, AttributeError) as e:
+            # 壊れたファイルは無いものとして DynamoDB から読み直す（put で上書きされる）
+            print(f"[PeriodCache] ignore broken cache {guild_id}/{key}: {e!r}")
+            totals = None
+
+        with self._lock:
+            if totals is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(ck, totals)
+        return totals
+
+    def put(self, guild_id: int, key: str, totals: Dict[int, float], generation: Optional[int] = None):
+        """
+        閉じた期間の集計を保存する。書き込みに失敗してもメモリには載せる。
+        generation を渡すと、そのあとに invalidate があったときは保存しない（読んだ値が古いかもしれない）。
+        """
+        path = self._path(guild_id, key)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._remember((guild_id, key), dict(totals))
+
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({str(uid): v for uid, v in totals.items()}, f, separators=(",", ":"))
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[PeriodCache] write error {guild_id}/{key}: {e!r}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def invalidate(self, guild_id: int, key: str):
+        """保存した集計を消す（次は DynamoDB から読み直す）"""
+        path = self._path(guild_id, key)
+        with self._lock:
+            self.generation += 1
+            self._memory.pop((guild_id, key), None)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"[PeriodCache] remove error {guild_id}/{key}: {e!r}")
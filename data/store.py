@@ -1,49 +1,371 @@
 # data/store.py
-from typing import Dict, Optional
+import datetime
+import math
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import LEADERBOARD_RELOAD_SECONDS, VOICE_DAILY_FLUSH_RETRIES
 
 # from data.backends.json_store import JsonStore
 # from data.backends.memory_store import MemoryStore
+# from data.backends.sqlite_store import SQLiteStore
 from data.backends.dynamo_store import DynamoStore
 from data.guild_config_store import GuildConfigStore
+from data.leaderboard import LeaderboardCache
+from data.voice_buffer import (
+    BufferKey,
+    DailyKey,
+    DailyMinutesBuffer,
+    FlushSummary,
+    PendingVoice,
+    VoiceWriteBuffer,
+)
+from utils.metrics import metrics
 
 # =========================
 #  永続化バックエンド選択
 # =========================
+# DynamoDB の接続は data.aws_clients の共有 resource を最初の呼び出しで作る
+# （DYNAMODB_LOCAL=true ならプロセス内の代用品。負荷試験用で、再起動で中身は消える）
 store = DynamoStore(table_name="zero_bot_xp")
+# store = SQLiteStore("zero_bot_xp.sqlite3")  # 1 台で動かすとき（日次分数も同じファイルに持つ）
 guild_config_store = GuildConfigStore()
 
+# VC tick ごとの加算をまとめて書くための write-behind バッファ
+voice_buffer = VoiceWriteBuffer()
+
+# 日次テーブルの分数は期間集計でしか読まないので、別のバッファでさらに長く溜める
+daily_buffer = DailyMinutesBuffer()
+
+
+def daily_store():
+    """
+    日次VC集計の書き込み / 期間集計を受け持つもの。
+    バックエンドが日次分数も持っている（SQLiteStore）ならそれ、なければ voice_daily_store。
+    """
+    if hasattr(store, "add_daily_voice_minutes"):
+        return store
+    # data.voice_daily_store → utils.helpers → data.store の循環 import を避ける
+    from data import voice_daily_store
+    return voice_daily_store
+
+def close_store() -> None:
+    """プロセス終了時に呼ぶ（メモリに溜めているバックエンドの変更を書き切る）"""
+    # DynamoStore は呼び出しごとに書き込むので close を持たない
+    close = getattr(store, "close", None)
+    if close is not None:
+        close()
+
 
 # =========================
 #  XP 読み書き用ラッパ関数
 # =========================
+def _count_created_user(gid: int, created: bool) -> None:
+    # このプロセスが起動してから新規作成したユーザー数（保存済みユーザーの総数ではない。
+    # 再起動で 0 に戻る）
+    if created:
+        metrics.incr("store.users_created_since_boot")
+        metrics.incr(f"store.users_created_since_boot.guild.{gid}")
+
 def add_voice_xp(gid: int, uid: int, xp: float) -> None:
-    store.add_voice_xp(gid, uid, xp)
+    _count_created_user(gid, store.add_voice_xp(gid, uid, xp))
+    leaderboard.add(gid, uid, "voice_xp", xp)
 
 def get_voice_xp(gid: int, uid: int) -> float:
-    return store.get_voice_xp(gid, uid)
+    # バッファ上の未書き込み分も足して返す
+    return store.get_voice_xp(gid, uid) + voice_buffer.pending_voice_xp(gid, uid)
 
 def add_text_xp(gid: int, uid: int, xp: float) -> None:
-    store.add_text_xp(gid, uid, xp)
+    _count_created_user(gid, store.add_text_xp(gid, uid, xp))
+    leaderboard.add(gid, uid, "text_xp", xp)
 
 def get_text_xp(gid: int, uid: int) -> float:
     return store.get_text_xp(gid, uid)
 
+def iter_guild_user_stats(gid: int) -> Iterator[Tuple[int, Dict[str, float]]]:
+    """
+    ギルド全員の (user_id, {"voice_xp", "text_xp"}) を 1 件ずつ返す（バッファの未書き込み分も重ねる）。
+    バックエンドが iter_guild_user_stats を持っていれば（DynamoStore）、ページを受け取るたびに流す。
+    """
+    pending = voice_buffer.pending_guild_voice_xp(gid)
+    iter_stats = getattr(store, "iter_guild_user_stats", None)
+    rows = iter_stats(gid) if iter_stats is not None else store.get_guild_user_stats(gid).items()
+    for uid, data in rows:
+        xp = pending.pop(uid, 0.0)
+        if xp:
+            # バックエンドの dict を書き換えないようにコピーしてから重ねる
+            data = {**data, "voice_xp": float(data.get("voice_xp", 0.0)) + xp}
+        yield uid, data
+    # まだ DB に 1 回も書いていないユーザー
+    for uid, xp in pending.items():
+        yield uid, {"voice_xp": xp, "text_xp": 0.0}
+
 def get_guild_user_stats(gid: int) -> Dict[int, Dict[str, float]]:
-    return store.get_guild_user_stats(gid)
+    return dict(iter_guild_user_stats(gid))
+
+# =========================
+#  XP ランキング
+# =========================
+# 最初の 1 回だけ iter_guild_user_stats で読み込み（ページごとに並べながら）、以降は XP の加算をその場で反映する
+leaderboard = LeaderboardCache(
+    loader=iter_guild_user_stats,
+    reload_seconds=LEADERBOARD_RELOAD_SECONDS,
+)
+
+def get_xp_rank(gid: int, uid: int, kind: str) -> Optional[Tuple[int, int]]:
+    """
+    kind（"voice_xp" / "text_xp"）での (順位, 対象人数)。
+    XP が 0 以下のユーザーは None。
+    """
+    return leaderboard.rank_of(gid, uid, kind)
+
+def get_xp_ranking(
+    gid: int,
+    kind: str,
+    k: Optional[int] = None,
+    offset: int = 0,
+) -> List[Tuple[int, float]]:
+    """kind の XP 降順で [(user_id, xp), ...]（XP > 0 のみ）"""
+    return leaderboard.top(gid, kind, k, offset)
 
 # ★ 統計情報向けラッパー追記
 def get_voice_meta(gid: int, uid: int) -> Dict[str, float]:
-    return store.get_voice_meta(gid, uid)
+    return voice_buffer.apply_pending_meta(gid, uid, store.get_voice_meta(gid, uid))
 
 def update_voice_meta(gid: int, uid: int, meta: Dict[str, float]) -> None:
     store.update_voice_meta(gid, uid, meta)
 
+# =========================
+#  VC tick 書き込みバッファ
+# =========================
+def record_voice_tick(
+    gid: int,
+    uid: int,
+    *,
+    xp: float,
+    minutes: float,
+    group_key: str,
+    is_muted: bool,
+    member_count: int,
+    hour: int,
+    partner_ids: Iterable[int],
+    day: datetime.date,
+) -> None:
+    """
+    VC 1tick 分の XP / meta / 日次分数をバッファに積む。
+    実際の書き込みは flush_voice_buffer()（XP / meta）と flush_daily_buffer()（日次分数）で行う。
+    ランキングには積んだ時点で反映する（get_voice_xp と同じく未書き込み分も含む）。
+    """
+    voice_buffer.add(
+        gid,
+        uid,
+        xp=xp,
+        minutes=minutes,
+        group_key=group_key,
+        is_muted=is_muted,
+        member_count=member_count,
+        hour=hour,
+        partner_ids=partner_ids,
+    )
+    daily_buffer.add_tick(gid, uid, day, minutes=minutes, group_key=group_key, is_muted=is_muted)
+    leaderboard.add(gid, uid, "voice_xp", xp)
+
+def flush_voice_entry(key: BufferKey, *, wait: bool = False) -> bool:
+    """
+    1ユーザー分の加算を書き込む。
+
+    voice_buffer.claim() で書き込み担当になってから書くので、同じユーザーを
+    2 つの flush が同時に書くことはない（他が書き込み中なら何もせず False、
+    wait=True なら終わるのを待ってから残りを書く）。
+    戻り値: 書き込み担当になれたら True（書き込みに失敗したら例外）
+    """
+    pending = voice_buffer.claim(key, wait=wait)
+    if pending is None:
+        return False
+    try:
+        _write_voice_entry(key, pending)
+    finally:
+        voice_buffer.release(key)
+    return True
+
+def _write_voice_entry(key: BufferKey, pending: PendingVoice) -> None:
+    """
+    DynamoStore なら XP + meta（ユーザーのアイテム）を 1 回の UpdateItem 相当で書く
+    （式が長くて UpdateItem が分かれたら、通った分ずつ引く）。
+    それ以外のバックエンドは XP → meta の順に書く。どちらも書き終わった分だけ
+    mark_*_flushed で引くので、途中で例外になっても残りだけが次回に再送される。
+    （日次テーブルの分数は daily_buffer が別に書く）
+    """
+    gid, uid = key
+
+    add_voice_activity = getattr(store, "add_voice_activity", None)
+    if add_voice_activity is not None:
+        def _mark(*, xp: float, **meta) -> None:
+            # 長い式は複数の UpdateItem に分かれるので、通った分ずつ引く
+            voice_buffer.mark_xp_flushed(key, xp)
+            voice_buffer.mark_meta_flushed(key, PendingVoice.of(**meta))
+
+        created = add_voice_activity(gid, uid, xp=pending.voice_xp, **pending.meta_delta(), on_written=_mark)
+        _count_created_user(gid, created)
+        return
+
+    if pending.voice_xp:
+        _count_created_user(gid, store.add_voice_xp(gid, uid, pending.voice_xp))
+        voice_buffer.mark_xp_flushed(key, pending.voice_xp)
+
+    if pending.has_meta():
+        # 読み込み無しでフィールド単位に加算（meta 全体は書き戻さない）
+        store.add_voice_meta(gid, uid, **pending.meta_delta())
+        voice_buffer.mark_meta_flushed(key, pending)
+
+def flush_voice_buffer() -> FlushSummary:
+    """
+    バッファに溜まった加算を (guild, user) ごとに 1 回ずつ、順番に書き込む。
+    失敗した分はバッファに残り、次回の flush で再送される。
+    （Bot からは並列 + 締め切りつきの data.async_store.flush_voice_buffer を使う）
+    """
+    summary = FlushSummary()
+
+    for key in voice_buffer.begin_flush():
+        try:
+            if flush_voice_entry(key):
+                summary.processed += 1
+            else:
+                summary.deferred += 1
+        except Exception as e:
+            print(f"[VoiceBuffer] flush error guild={key[0]} user={key[1]}: {e}")
+            summary.failed += 1
+
+    summary.carried = voice_buffer.end_flush()
+    return summary
+
+# =========================
+#  日次VC集計（書き込みバッファ経由）
+# =========================
+def add_daily_voice_minutes(
+    gid: int,
+    uid: int,
+    *,
+    day: Optional[datetime.date] = None,
+    **minutes: float,
+) -> None:
+    """
+    日次テーブルに積む分数をバッファに足す（書き込みは flush_daily_buffer()）。
+    day を省略すると JST の今日。
+    """
+    if day is None:
+        # data.voice_daily_store → utils.helpers → data.store の循環 import を避ける
+        from utils.helpers import jst_now
+        day = jst_now().date()
+    daily_buffer.add(gid, uid, day, **minutes)
+
+def flush_daily_entry(key: DailyKey, *, wait: bool = False) -> bool:
+    """
+    (guild, date, user) 1 件分を日次テーブルに書く。
+    daily_buffer.claim() で書き込み担当になってから書くので、同じ行を 2 つの flush が
+    同時に書くことはない（他が書き込み中なら何もせず False、wait=True なら終わるのを待って残りを書く）。
+    失敗したら少し待って VOICE_DAILY_FLUSH_RETRIES 回まで書き直し、それでもだめなら例外
+    （バッファに残るので次回の flush で再送される）。
+    戻り値: 書き込み担当になれたら True
+    """
+    minutes = daily_buffer.claim(key, wait=wait)
+    if minutes is None:
+        return False
+    gid, day, uid = key
+    add = daily_store().add_daily_voice_minutes
+    delay = 0.2
+    try:
+        for attempt in range(VOICE_DAILY_FLUSH_RETRIES):
+            try:
+                add(gid, uid, day=day, **minutes)
+                break
+            except Exception:
+                if attempt + 1 >= VOICE_DAILY_FLUSH_RETRIES:
+                    raise
+                time.sleep(delay)
+                delay *= 2
+        daily_buffer.mark_flushed(key, minutes)
+    finally:
+        daily_buffer.release(key)
+    return True
+
+def flush_daily_buffer(before: Optional[datetime.date] = None) -> FlushSummary:
+    """
+    日次バッファを 1 件ずつ順番に書き込む（before を渡すとその日より前の分だけ）。
+    （Bot からは並列で書く data.async_store.flush_daily_buffer を使う）
+    """
+    summary = FlushSummary()
+    for key in daily_buffer.begin_flush(before):
+        try:
+            if flush_daily_entry(key):
+                summary.processed += 1
+            else:
+                summary.deferred += 1
+        except Exception as e:
+            print(f"[DailyBuffer] flush error guild={key[0]} day={key[1]} user={key[2]}: {e}")
+            summary.failed += 1
+
+    summary.carried = daily_buffer.carried()
+    return summary
+
+def get_user_total_minutes_in_range(
+    gid: int,
+    uid: int,
+    date_from: datetime.date,
+    date_to: datetime.date,
+) -> float:
+    """期間の total_min 合計（分）。まだ書いていないバッファの分も含める"""
+    total = daily_store().get_user_total_minutes_in_range(
+        guild_id=gid, user_id=uid, date_from=date_from, date_to=date_to,
+    )
+    return total + daily_buffer.pending_minutes(gid, date_from, date_to, uid).get(uid, 0.0)
+
+def get_guild_total_minutes_in_range(
+    gid: int,
+    date_from: datetime.date,
+    date_to: datetime.date,
+) -> Dict[int, float]:
+    """ギルド内ユーザー別の期間 total_min 合計。まだ書いていないバッファの分も含める"""
+    totals = dict(daily_store().get_guild_total_minutes_in_range(
+        guild_id=gid, date_from=date_from, date_to=date_to,
+    ))
+    for uid, minutes in daily_buffer.pending_minutes(gid, date_from, date_to).items():
+        totals[uid] = totals.get(uid, 0.0) + minutes
+    return totals
+
 # =========================
 #  レベル計算ロジック
 # =========================
 LEVEL_BASE_XP = 20.0  # XP_to_next(L) = LEVEL_BASE_XP * L
 
 
+def xp_for_level(level: int) -> float:
+    """
+    そのレベルになるのに必要な通算XP。
+
+    XP_to_next(L) = LEVEL_BASE_XP * L なので、Lv.L までの合計は
+    LEVEL_BASE_XP * (1 + 2 + ... + (L-1)) = LEVEL_BASE_XP * L * (L-1) / 2
+    """
+    if level <= 1:
+        return 0.0
+    return LEVEL_BASE_XP * level * (level - 1) / 2
+
+
+def _level_of(xp: float) -> int:
+    if xp <= 0:
+        return 1
+
+    # xp_for_level(L) <= xp を満たす最大の L（2次方程式の解）
+    level = max(1, int((1.0 + math.sqrt(1.0 + 8.0 * xp / LEVEL_BASE_XP)) / 2.0))
+
+    # sqrt の丸めで境界をまたいでいたら 1 つずらす
+    while level > 1 and xp_for_level(level) > xp:
+        level -= 1
+    while xp_for_level(level + 1) <= xp:
+        level += 1
+    return level
+
+
 def calc_level_from_xp(xp: float) -> tuple[int, float, float]:
     """
     XP からレベルを計算する。
@@ -56,18 +378,13 @@ def calc_level_from_xp(xp: float) -> tuple[int, float, float]:
     if xp <= 0:
         return 1, 0.0, LEVEL_BASE_XP  # Lv1, 0/20XP
 
-    level = 1
-    remaining = xp
-    need = LEVEL_BASE_XP * level  # このレベルから次へ必要なXP
+    level = _level_of(xp)
+    return level, xp - xp_for_level(level), LEVEL_BASE_XP * level
 
-    # XP_to_next(L) = 20 * L で、足りる限りレベルを上げていく
-    while remaining >= need:
-        remaining -= need
-        level += 1
-        need = LEVEL_BASE_XP * level
 
-    # remaining がそのレベルの中で貯まっているXP
-    return level, remaining, need
+def calc_levels(xps: Iterable[float]) -> List[int]:
+    """ランキング表示用に、まとめてレベルだけ求める"""
+    return [_level_of(xp) for xp in xps]
 
 def get_rank_bg_key(gid: int, uid: int) -> str:
     # 2) DynamoDB のユーザー個別設定
@@ -76,10 +393,9 @@ def get_rank_bg_key(gid: int, uid: int) -> str:
         return user_bg_key
 
     # 1) ギルド設定（zero_bot_guild_config）
-    guild_cfg = guild_config_store.get_config(gid) or {}
-    rankcard_cfg = guild_cfg.get("rankcard") or {}
+    guild_cfg = guild_config_store.get_guild_config(gid)
 
-    guild_bg_key = rankcard_cfg.get("rank_bg_key")
+    guild_bg_key = guild_cfg.rankcard.rank_bg_key
     if guild_bg_key:
         return guild_bg_key
 
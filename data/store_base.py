@@ -1,14 +1,52 @@
 # data/store_base.py
-from typing import Dict
+from typing import Dict, Iterable, Optional
+
+from data.voice_buffer import apply_meta_delta
+
+
+def new_voice_meta() -> Dict:
+    """まだ統計の無いユーザーの meta（どのバックエンドもこの形で返す）"""
+    return {
+        "total_time": 0.0,
+        "solo_time": 0.0,
+        "small_group_time": 0.0,
+        "mid_group_time": 0.0,
+        "big_group_time": 0.0,
+        "muted_time": 0.0,
+        "max_member_count": 0,
+        "hour_buckets": [0.0] * 24,
+        "pair_time": {},
+    }
+
 
 class BaseStore:
-    def add_voice_xp(self, guild_id: int, user_id: int, xp: float):
+    """
+    XP / VC 統計 / RankCard 背景キーの永続化バックエンドの共通インターフェース。
+
+    data.store はこれだけを使うので、どのバックエンドに差し替えても動く。
+    *_many は 1 件ずつの版を繰り返すデフォルト実装があり、
+    まとめて書ける / 読めるバックエンドは上書きする。
+    """
+
+    def flush(self) -> None:
+        """メモリ上に溜めている変更があれば書き出す（すぐ書くバックエンドは何もしない）"""
+
+    def close(self) -> None:
+        """終了時に呼ぶ。残っている変更を書き切る"""
+        self.flush()
+
+    # -----------------------------
+    # XP
+    # -----------------------------
+    def add_voice_xp(self, guild_id: int, user_id: int, xp: float) -> bool:
+        """戻り値: (guild, user) のデータがこの呼び出しで新規作成されたら True"""
         raise NotImplementedError
 
     def get_voice_xp(self, guild_id: int, user_id: int) -> float:
         raise NotImplementedError
 
-    def add_text_xp(self, guild_id: int, user_id: int, xp: float):
+    def add_text_xp(self, guild_id: int, user_id: int, xp: float) -> bool:
+        """戻り値: (guild, user) のデータがこの呼び出しで新規作成されたら True"""
         raise NotImplementedError
 
     def get_text_xp(self, guild_id: int, user_id: int) -> float:
@@ -16,3 +54,66 @@ class BaseStore:
 
     def get_guild_user_stats(self, guild_id: int) -> Dict[int, Dict[str, float]]:
         raise NotImplementedError
+
+    def add_voice_xp_many(self, guild_id: int, deltas: Dict[int, float]) -> int:
+        """{user_id: 加算XP} をまとめて加算する。戻り値: 新規作成したユーザー数"""
+        return sum(bool(self.add_voice_xp(guild_id, uid, xp)) for uid, xp in deltas.items())
+
+    def add_text_xp_many(self, guild_id: int, deltas: Dict[int, float]) -> int:
+        """add_voice_xp_many の text_xp 版"""
+        return sum(bool(self.add_text_xp(guild_id, uid, xp)) for uid, xp in deltas.items())
+
+    def get_xp_many(self, guild_id: int, user_ids: Iterable[int]) -> Dict[int, Dict[str, float]]:
+        """
+        指定ユーザーの {user_id: {"voice_xp", "text_xp"}}。
+        データの無いユーザーも 0.0 で入れて返す。
+        """
+        return {
+            uid: {
+                "voice_xp": self.get_voice_xp(guild_id, uid),
+                "text_xp": self.get_text_xp(guild_id, uid),
+            }
+            for uid in user_ids
+        }
+
+    # -----------------------------
+    # VC 統計（meta）
+    # -----------------------------
+    def get_voice_meta(self, guild_id: int, user_id: int) -> Dict[str, float]:
+        """new_voice_meta() と同じ形の meta。データが無ければ new_voice_meta()"""
+        raise NotImplementedError
+
+    def update_voice_meta(self, guild_id: int, user_id: int, meta: Dict[str, float]) -> None:
+        """meta のうち渡されたキーだけを上書きする"""
+        raise NotImplementedError
+
+    def add_voice_meta(
+        self,
+        guild_id: int,
+        user_id: int,
+        *,
+        times: Dict[str, float],
+        max_member_count: int,
+        hour_buckets: Dict[int, float],
+        pair_time: Dict[str, float],
+    ) -> None:
+        """
+        VC 統計（meta）に加算する。
+        デフォルトは get_voice_meta → update_voice_meta の読み書き。
+        （DynamoStore はフィールド単位の 1 回の UpdateItem で行う）
+        """
+        meta = apply_meta_delta(
+            self.get_voice_meta(guild_id, user_id),
+            times=times,
+            max_member_count=max_member_count,
+            hour_buckets=hour_buckets,
+            pair_time=pair_time,
+        )
+        self.update_voice_meta(guild_id, user_id, meta)
+
+    # -----------------------------
+    # RankCard 背景キー
+    # -----------------------------
+    def get_rank_bg_key(self, guild_id: int, user_id: int) -> Optional[str]:
+        """ユーザー個別の背景キー。設定が無ければ None"""
+        raise NotImplementedError
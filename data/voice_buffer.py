@@ -0,0 +1,496 @@
+# data/voice_buffer.py
+
+import datetime
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# meta に積み上げる「分」系のキー
+META_TIME_KEYS = (
+    "total_time",
+    "solo_time",
+    "small_group_time",
+    "mid_group_time",
+    "big_group_time",
+    "muted_time",
+)
+
+# meta の人数帯キー → 日次テーブルのカラム名
+DAILY_GROUP_KEYS = {
+    "solo_time": "solo_min",
+    "small_group_time": "small_group_min",
+    "mid_group_time": "mid_group_min",
+    "big_group_time": "big_group_min",
+}
+
+BufferKey = Tuple[int, int]  # (guild_id, user_id)
+DailyKey = Tuple[int, datetime.date, int]  # (guild_id, date, user_id)
+
+
+def apply_meta_delta(
+    meta: Dict,
+    *,
+    times: Dict[str, float],
+    max_member_count: int,
+    hour_buckets: Dict[int, float],
+    pair_time: Dict[str, float],
+) -> Dict:
+    """meta に加算値を足したコピーを返す（読み込み → 書き戻し型のバックエンド用）。"""
+    merged = dict(meta)
+
+    for k, v in times.items():
+        merged[k] = float(merged.get(k, 0.0)) + v
+
+    if max_member_count:
+        merged["max_member_count"] = max(
+            int(merged.get("max_member_count", 0)),
+            max_member_count,
+        )
+
+    if hour_buckets:
+        buckets = merged.get("hour_buckets")
+        if not isinstance(buckets, list) or len(buckets) != 24:
+            buckets = [0.0] * 24
+        buckets = [float(x) for x in buckets]
+        for h, v in hour_buckets.items():
+            buckets[h] += v
+        merged["hour_buckets"] = buckets
+
+    if pair_time:
+        pairs = merged.get("pair_time")
+        pairs = dict(pairs) if isinstance(pairs, dict) else {}
+        for oid, v in pair_time.items():
+            pairs[oid] = float(pairs.get(oid, 0.0)) + v
+        merged["pair_time"] = pairs
+
+    return merged
+
+
+class PendingVoice:
+    """
+    1ユーザー分の「まだ DB に書いていない」VC 加算値。
+
+    - voice_xp        : XP の加算値
+    - times           : total_time / solo_time ... の加算値（分）
+    - max_member_count: この間に見た最大人数
+    - hour_buckets    : {hour: 分}
+    - pair_time       : {相手のuser_id(str): 分}
+
+    日次テーブルの分数は DailyMinutesBuffer が別に溜める。
+    """
+
+    __slots__ = ("voice_xp", "times", "max_member_count", "hour_buckets", "pair_time")
+
+    def __init__(self):
+        self.voice_xp = 0.0
+        self.times: Dict[str, float] = {}
+        self.max_member_count = 0
+        self.hour_buckets: Dict[int, float] = {}
+        self.pair_time: Dict[str, float] = {}
+
+    # -----------------------------
+    # 状態
+    # -----------------------------
+    def has_meta(self) -> bool:
+        return bool(self.times or self.max_member_count or self.hour_buckets or self.pair_time)
+
+    def is_empty(self) -> bool:
+        return not self.voice_xp and not self.has_meta()
+
+    @classmethod
+    def of(
+        cls,
+        *,
+        times: Dict[str, float],
+        max_member_count: int,
+        hour_buckets: Dict[int, float],
+        pair_time: Dict[str, float],
+    ) -> "PendingVoice":
+        """meta_delta() と同じ形の加算値から作る（XP は 0）"""
+        p = cls()
+        p.times = dict(times)
+        p.max_member_count = max_member_count
+        p.hour_buckets = dict(hour_buckets)
+        p.pair_time = dict(pair_time)
+        return p
+
+    def copy(self) -> "PendingVoice":
+        c = PendingVoice()
+        c.voice_xp = self.voice_xp
+        c.times = dict(self.times)
+        c.max_member_count = self.max_member_count
+        c.hour_buckets = dict(self.hour_buckets)
+        c.pair_time = dict(self.pair_time)
+        return c
+
+    def subtract_xp(self, written: float):
+        left = self.voice_xp - written
+        self.voice_xp = 0.0 if abs(left) < 1e-9 else left
+
+    def subtract_meta(self, written: "PendingVoice"):
+        """書き込んだ meta の分だけ引く（書いていない分は残す）"""
+        for src, done in (
+            (self.times, written.times),
+            (self.hour_buckets, written.hour_buckets),
+            (self.pair_time, written.pair_time),
+        ):
+            for k, v in done.items():
+                left = src.get(k, 0.0) - v
+                if abs(left) < 1e-9:
+                    src.pop(k, None)
+                else:
+                    src[k] = left
+        if written.max_member_count >= self.max_member_count:
+            self.max_member_count = 0
+
+    # -----------------------------
+    # 加算 / マージ
+    # -----------------------------
+    def merge(self, other: "PendingVoice"):
+        self.voice_xp += other.voice_xp
+        for k, v in other.times.items():
+            self.times[k] = self.times.get(k, 0.0) + v
+        self.max_member_count = max(self.max_member_count, other.max_member_count)
+        for h, v in other.hour_buckets.items():
+            self.hour_buckets[h] = self.hour_buckets.get(h, 0.0) + v
+        for oid, v in other.pair_time.items():
+            self.pair_time[oid] = self.pair_time.get(oid, 0.0) + v
+
+    def meta_delta(self) -> Dict:
+        """add_voice_meta() にそのまま渡せる形の meta 加算値"""
+        return {
+            "times": self.times,
+            "max_member_count": self.max_member_count,
+            "hour_buckets": self.hour_buckets,
+            "pair_time": self.pair_time,
+        }
+
+    def apply_to_meta(self, meta: Dict) -> Dict:
+        """DB から読んだ meta に、未書き込み分を足したコピーを返す。"""
+        return apply_meta_delta(meta, **self.meta_delta())
+
+
+class FlushSummary:
+    """1回の flush の結果（処理済み / 次回に持ち越し / 失敗 のユーザー数）"""
+
+    __slots__ = ("processed", "deferred", "failed", "carried")
+
+    def __init__(self, processed: int = 0, deferred: int = 0, failed: int = 0, carried: int = 0):
+        self.processed = processed
+        self.deferred = deferred    # 締め切りまでに始められなかった
+        self.failed = failed        # 書き込みでエラーになった
+        self.carried = carried      # flushing に残った（deferred + failed の重複なし件数）
+
+    def __bool__(self) -> bool:
+        return bool(self.processed or self.deferred or self.failed)
+
+    def __str__(self) -> str:
+        return f"processed={self.processed} deferred={self.deferred} failed={self.failed}"
+
+
+class VoiceWriteBuffer:
+    """
+    VC の XP / 統計を (guild_id, user_id) ごとにメモリへ溜めておき、
+    flush 時にまとめて 1 回ずつ書き込むための write-behind バッファ。
+
+    読み取り側（data.store の get_voice_xp など）は pending / flushing の
+    両方を重ねて返すので、未書き込みの加算もすぐ見える。
+
+    flush の流れ:
+      begin_flush()  … pending を flushing に移して、書き込み対象のキーを返す
+      claim(key)     … 書き込み担当になって、その時点の flushing のコピーを受け取る
+      mark_*_flushed … 書き込めた分だけ flushing から引く
+      release(key)   … 担当を外れる（書けなかった分は flushing に残って次回に再送）
+    書き込み中（claim 済み）のキーには他の flush が手を出さず、pending もそこへは足さない。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # release() で claim(wait=True) を起こす
+        self._released = threading.Condition(self._lock)
+        self._pending: Dict[BufferKey, PendingVoice] = {}
+        # flush 中（drain 済みだけど書き込み完了前）のもの
+        self._flushing: Dict[BufferKey, PendingVoice] = {}
+        # claim されて書き込み中のキー
+        self._inflight: Set[BufferKey] = set()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    # -----------------------------
+    # 書き込み（tick ごと）
+    # -----------------------------
+    def add(
+        self,
+        gid: int,
+        uid: int,
+        *,
+        xp: float,
+        minutes: float,
+        group_key: str,
+        is_muted: bool,
+        member_count: int,
+        hour: int,
+        partner_ids: Iterable[int],
+    ):
+        with self._lock:
+            p = self._pending.get((gid, uid))
+            if p is None:
+                p = self._pending[(gid, uid)] = PendingVoice()
+
+            p.voice_xp += xp
+
+            p.times["total_time"] = p.times.get("total_time", 0.0) + minutes
+            p.times[group_key] = p.times.get(group_key, 0.0) + minutes
+            if is_muted:
+                p.times["muted_time"] = p.times.get("muted_time", 0.0) + minutes
+
+            p.max_member_count = max(p.max_member_count, member_count)
+            p.hour_buckets[hour] = p.hour_buckets.get(hour, 0.0) + minutes
+
+            for oid in partner_ids:
+                key = str(oid)
+                p.pair_time[key] = p.pair_time.get(key, 0.0) + minutes
+
+    # -----------------------------
+    # 読み取り用オーバーレイ
+    # -----------------------------
+    def _entries(self, key: BufferKey) -> List[PendingVoice]:
+        return [p for p in (self._flushing.get(key), self._pending.get(key)) if p is not None]
+
+    def pending_voice_xp(self, gid: int, uid: int) -> float:
+        with self._lock:
+            return sum(p.voice_xp for p in self._entries((gid, uid)))
+
+    def apply_pending_meta(self, gid: int, uid: int, meta: Dict) -> Dict:
+        with self._lock:
+            for p in self._entries((gid, uid)):
+                meta = p.apply_to_meta(meta)
+            return meta
+
+    def pending_guild_voice_xp(self, gid: int) -> Dict[int, float]:
+        """{user_id: 未書き込みの voice_xp}（ギルド単位）"""
+        result: Dict[int, float] = {}
+        with self._lock:
+            for src in (self._flushing, self._pending):
+                for (g, u), p in src.items():
+                    if g == gid and p.voice_xp:
+                        result[u] = result.get(u, 0.0) + p.voice_xp
+        return result
+
+    # -----------------------------
+    # flush 用
+    # -----------------------------
+    def begin_flush(self) -> List[BufferKey]:
+        """
+        pending を flushing に移して、書き込み対象のキーを返す。
+        書き込み中のキーの pending は移さずに残す（その書き込みが終わってから claim で移す）。
+        """
+        with self._lock:
+            keep: Dict[BufferKey, PendingVoice] = {}
+            for key, p in self._pending.items():
+                if key in self._inflight:
+                    keep[key] = p
+                    continue
+                cur = self._flushing.get(key)
+                if cur is None:
+                    self._flushing[key] = p
+                else:
+                    # 前回書けずに持ち越した分（誰も書いていないので足してよい）
+                    cur.merge(p)
+            self._pending = keep
+            return list(self._flushing)
+
+    def claim(self, key: BufferKey, *, wait: bool = False) -> Optional[PendingVoice]:
+        """
+        key の書き込み担当になって、書き込む値（コピー）を返す。
+        他の flush が書き込み中なら None（wait=True なら終わるまで待ってから残りを取る）。
+        書くものが無くても None。claim できたら必ず release() すること。
+        """
+        with self._lock:
+            while key in self._inflight:
+                if not wait:
+                    return None
+                self._released.wait()
+            # 書き込み中だったので begin_flush が残しておいた分も、ここで一緒に書く
+            extra = self._pending.pop(key, None)
+            if extra is not None:
+                cur = self._flushing.get(key)
+                if cur is None:
+                    self._flushing[key] = extra
+                else:
+                    cur.merge(extra)
+            p = self._flushing.get(key)
+            if p is None or p.is_empty():
+                return None
+            self._inflight.add(key)
+            return p.copy()
+
+    def mark_xp_flushed(self, key: BufferKey, written: float):
+        """書き込んだ voice_xp の分だけ flushing から引く"""
+        with self._lock:
+            p = self._flushing.get(key)
+            if p is not None:
+                p.subtract_xp(written)
+
+    def mark_meta_flushed(self, key: BufferKey, written: PendingVoice):
+        """書き込んだ meta の分だけ flushing から引く"""
+        with self._lock:
+            p = self._flushing.get(key)
+            if p is not None:
+                p.subtract_meta(written)
+
+    def release(self, key: BufferKey):
+        with self._lock:
+            self._inflight.discard(key)
+            p = self._flushing.get(key)
+            if p is not None and p.is_empty():
+                del self._flushing[key]
+            self._released.notify_all()
+
+    def end_flush(self) -> int:
+        """
+        書き込みが終わったものを flushing から外す。
+        失敗して残った分は次回の flush で再送する。
+        戻り値: 次回に持ち越した件数（他の flush が書き込み中のものも含む）
+        """
+        with self._lock:
+            self._flushing = {
+                k: p for k, p in self._flushing.items()
+                if k in self._inflight or not p.is_empty()
+            }
+            return len(self._flushing)
+
+
+class DailyMinutesBuffer:
+    """
+    日次テーブル（zero_bot_voice_daily_stats）に積む分数を
+    (guild_id, date, user_id) ごとにメモリへ溜めておく write-behind バッファ。
+
+    日次の行は期間集計でしか読まないので、XP より長い間隔でまとめて書く。
+    期間集計の読み取り側は pending_minutes で未書き込み分を重ねるので、結果は変わらない。
+
+    flush の流れは VoiceWriteBuffer と同じ（begin_flush → claim → mark_flushed → release）。
+    書き込み中（claim 済み）のキーには他の flush が手を出さず、pending もそこへは足さない。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # release() で claim(wait=True) を起こす
+        self._released = threading.Condition(self._lock)
+        self._pending: Dict[DailyKey, Dict[str, float]] = {}
+        # flush 中（drain 済みだけど書き込み完了前）のもの
+        self._flushing: Dict[DailyKey, Dict[str, float]] = {}
+        # claim されて書き込み中のキー
+        self._inflight: Set[DailyKey] = set()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def add(self, gid: int, uid: int, day: datetime.date, **minutes: float):
+        """minutes: total_min / solo_min / ... / muted_min"""
+        with self._lock:
+            cur = self._pending.setdefault((gid, day, uid), {})
+            for col, v in minutes.items():
+                if v:
+                    cur[col] = cur.get(col, 0.0) + v
+
+    def add_tick(self, gid: int, uid: int, day: datetime.date, *, minutes: float, group_key: str, is_muted: bool):
+        """VC 1tick 分（VoiceWriteBuffer.add と同じ引数）を日次の列に振り分けて積む"""
+        mins = {"total_min": minutes, DAILY_GROUP_KEYS[group_key]: minutes}
+        if is_muted:
+            mins["muted_min"] = minutes
+        self.add(gid, uid, day, **mins)
+
+    # -----------------------------
+    # 読み取り用オーバーレイ
+    # -----------------------------
+    def pending_minutes(
+        self,
+        gid: int,
+        date_from: datetime.date,
+        date_to: datetime.date,
+        uid: Optional[int] = None,
+        col: str = "total_min",
+    ) -> Dict[int, float]:
+        """期間内の未書き込み分 {user_id: 分}（uid を渡すとそのユーザーだけ）"""
+        result: Dict[int, float] = {}
+        with self._lock:
+            for src in (self._flushing, self._pending):
+                for (g, day, u), mins in src.items():
+                    if g != gid or not (date_from <= day <= date_to) or (uid is not None and u != uid):
+                        continue
+                    if mins.get(col):
+                        result[u] = result.get(u, 0.0) + mins[col]
+        return result
+
+    # -----------------------------
+    # flush 用
+    # -----------------------------
+    @staticmethod
+    def _merge(dst: Dict[str, float], src: Dict[str, float]):
+        for col, v in src.items():
+            dst[col] = dst.get(col, 0.0) + v
+
+    def begin_flush(self, before: Optional[datetime.date] = None) -> List[DailyKey]:
+        """
+        pending を flushing に移して、書き込み対象のキーを返す。
+        before を渡すとその日より前の分だけ（日付が変わったときに前日分を閉じる用）。
+        書き込み中のキーの pending は移さずに残す（その書き込みが終わってから claim で移す）。
+        """
+        with self._lock:
+            keep: Dict[DailyKey, Dict[str, float]] = {}
+            for key, mins in self._pending.items():
+                if (before is not None and key[1] >= before) or key in self._inflight:
+                    keep[key] = mins
+                    continue
+                self._merge(self._flushing.setdefault(key, {}), mins)
+            self._pending = keep
+            return [key for key in self._flushing if before is None or key[1] < before]
+
+    def claim(self, key: DailyKey, *, wait: bool = False) -> Optional[Dict[str, float]]:
+        """
+        key の書き込み担当になって、書き込む分数（コピー）を返す。
+        他の flush が書き込み中なら None（wait=True なら終わるまで待ってから残りを取る）。
+        書くものが無くても None。claim できたら必ず release() すること。
+        """
+        with self._lock:
+            while key in self._inflight:
+                if not wait:
+                    return None
+                self._released.wait()
+            # 書き込み中だったので begin_flush が残しておいた分も、ここで一緒に書く
+            extra = self._pending.pop(key, None)
+            if extra is not None:
+                self._merge(self._flushing.setdefault(key, {}), extra)
+            mins = self._flushing.get(key)
+            if not mins:
+                return None
+            self._inflight.add(key)
+            return dict(mins)
+
+    def mark_flushed(self, key: DailyKey, written: Dict[str, float]):
+        """書き込んだ分だけ flushing から引く"""
+        with self._lock:
+            cur = self._flushing.get(key)
+            if cur is None:
+                return
+            for col, v in written.items():
+                left = cur.get(col, 0.0) - v
+                if abs(left) < 1e-9:
+                    cur.pop(col, None)
+                else:
+                    cur[col] = left
+
+    def release(self, key: DailyKey):
+        with self._lock:
+            self._inflight.discard(key)
+            if not self._flushing.get(key, True):
+                del self._flushing[key]
+            self._released.notify_all()
+
+    def carried(self) -> int:
+        """書き込めずに次回へ持ち越している件数"""
+        with self._lock:
+            return len(self._flushing)
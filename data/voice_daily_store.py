@@ -1,26 +1,93 @@
 # data/voice_daily_store.py
 
 import datetime
-import boto3
+import time
+from typing import Optional
 from decimal import Decimal
 from collections import defaultdict
-from boto3.dynamodb.conditions import Key
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
 
 
+from config import (
+    DAILY_QUERY_CONCURRENCY,
+    VOICE_DAILY_CACHE_DIR,
+    VOICE_DAILY_CACHE_MAX_ENTRIES,
+    VOICE_ROLLUP_GRACE_HOURS,
+)
+from data import aws_clients
+from data.period_cache import PeriodCache
 from utils.helpers import jst_now
 
-DYNAMO_REGION = "ap-northeast-1"
 TABLE_NAME = "zero_bot_voice_daily_stats"
 
-dynamodb = boto3.resource("dynamodb", region_name=DYNAMO_REGION)
-table = dynamodb.Table(TABLE_NAME)
+# ユーザー単位の期間集計用 GSI
+#   パーティションキー: guild_user (String) "guild_id#user_id"
+#   ソートキー        : stat_date  (String) "2025-11-30"
+#   射影              : INCLUDE total_min（ALL でもよい）
+# 日付を ISO 形式の文字列で持つので、期間はソートキーの BETWEEN で 1 回の Query になる。
+USER_DATE_INDEX = "guild_user-stat_date-index"
+
+# backfill_user_index() が最後まで終わったことを記録する行（guild_date, user_id）
+# この行ができるまでは、ユーザー単位の期間集計は USER_DATE_INDEX を使わずに日ごとに読む
+MIGRATIONS_PK = "#migrations"
+USER_INDEX_MARKER = (MIGRATIONS_PK, USER_DATE_INDEX)
+
+# USER_DATE_INDEX が使えなかったとき、次に確かめ直すまでの秒数
+USER_INDEX_RECHECK_SECONDS = 600
+
+# 日次行の分数の列（build_daily_update の引数と同じ）
+MIN_FIELDS = (
+    "total_min",
+    "solo_min",
+    "small_group_min",
+    "mid_group_min",
+    "big_group_min",
+    "muted_min",
+)
+
+# 週 / 月の集計パーティションに最後に書く行の user_id（これがあれば集計が書き切れている）
+ROLLUP_SENTINEL = "#rollup"
+
+# table() が最初に呼ばれたときに作る
+_table = None
+
+# USER_DATE_INDEX を使ってよいか（使えると分かったらそのまま。使えなければ時々確かめ直す）
+_user_index_ready = False
+_user_index_checked_at: Optional[float] = None
+
+
+def table():
+    """日次テーブル（data.aws_clients の共有 resource から、最初に使うときに作る）"""
+    global _table
+    if _table is None:
+        _table = aws_clients.dynamodb().Table(TABLE_NAME)
+    return _table
+
+
+# 閉じた日 / 週 / 月の {user_id: total_min}（空文字ならキャッシュしない）
+period_cache = (
+    PeriodCache(VOICE_DAILY_CACHE_DIR, max_entries=VOICE_DAILY_CACHE_MAX_ENTRIES)
+    if VOICE_DAILY_CACHE_DIR else None
+)
+
+# 期間集計の日ごとの Query 用（同時に走る期間集計どうしでも合計 DAILY_QUERY_CONCURRENCY 本まで）
+_query_pool = ThreadPoolExecutor(
+    max_workers=DAILY_QUERY_CONCURRENCY,
+    thread_name_prefix="voice-daily",
+)
 
 
 def _make_guild_date_key(guild_id: int, date: datetime.date) -> str:
     return f"{guild_id}#{date.isoformat()}"  # "2025-11-30"
 
 
-def add_daily_voice_minutes(
+def _make_guild_user_key(guild_id: int, user_id: int) -> str:
+    return f"{guild_id}#{user_id}"
+
+
+def build_daily_update(
     guild_id: int,
     user_id: int,
     *,
@@ -30,16 +97,14 @@ def add_daily_voice_minutes(
     mid_group_min: float = 0.0,
     big_group_min: float = 0.0,
     muted_min: float = 0.0,
-):
+    day: Optional[datetime.date] = None,
+) -> dict:
     """
-    今日の分のVC滞在時間（分）を日次テーブルに積み上げる。
-
-    通話スナップショットの1tickごとに呼ぶ想定：
-      add_daily_voice_minutes(..., total_min=1.0, small_group_min=1.0, ...)
-    みたいなノリ。
+    日次テーブルへの積み上げ 1 件分の UpdateItem パラメータ
+    （Key / UpdateExpression / ExpressionAttributeValues。table().update_item にそのまま渡す）を作る。
     """
     now_jst = jst_now()
-    today = now_jst.date()
+    today = day or now_jst.date()
 
     pk = _make_guild_date_key(guild_id, today)
     sk = str(user_id)
@@ -54,9 +119,11 @@ def add_daily_voice_minutes(
         ":m": Decimal(str(muted_min)),
         ":zero": Decimal("0"),
         ":updated": now_jst.isoformat(),
+        ":gu": _make_guild_user_key(guild_id, user_id),
+        ":date": today.isoformat(),
     }
 
-    table.update_item(
+    return dict(
         Key={
             "guild_date": pk,
             "user_id": sk,
@@ -69,11 +136,45 @@ def add_daily_voice_minutes(
               mid_group_min   = if_not_exists(mid_group_min, :zero) + :mg,
               big_group_min   = if_not_exists(big_group_min, :zero) + :bg,
               muted_min       = if_not_exists(muted_min, :zero) + :m,
-              updated_at      = :updated
+              updated_at      = :updated,
+              guild_user      = :gu,
+              stat_date       = :date
         """,
         ExpressionAttributeValues=expr_attr_values,
     )
 
+
+def add_daily_voice_minutes(guild_id: int, user_id: int, **minutes):
+    """
+    今日の分のVC滞在時間（分）を日次テーブルに積み上げる。
+
+    通話スナップショットの1tickごとに呼ぶ想定：
+      add_daily_voice_minutes(..., total_min=1.0, small_group_min=1.0, ...)
+    みたいなノリ。
+
+    day を渡すとその日の行に積む（バッファから日付またぎ分を書くとき用）。
+    省略時は JST の今日。
+    """
+    table().update_item(**build_daily_update(guild_id, user_id, **minutes))
+
+    day = minutes.get("day")
+    if day is not None and day <= last_closed_day():
+        # 閉じた日に遅れて積んだ → その日と、その日を含む週 / 月の集計 / キャッシュはもう古い
+        _reopen_rollups(guild_id, day)
+
+
+def _reopen_rollups(guild_id: int, day: datetime.date):
+    """
+    day を含む週 / 月の ROLLUP_SENTINEL と、day / 週 / 月の period_cache を消す。
+    期間集計はその期間を日次行から数え直し、rollup_closed_periods が直近の期間を作り直す。
+    """
+    week = day - datetime.timedelta(days=day.weekday())
+    for kind, start in (("W", week), ("M", day.replace(day=1))):
+        table().delete_item(Key={"guild_date": _period_key(guild_id, kind, start), "user_id": ROLLUP_SENTINEL})
+    if period_cache is not None:
+        for kind, start in (("D", day), ("W", week), ("M", day.replace(day=1))):
+            period_cache.invalidate(guild_id, _period_key(guild_id, kind, start).partition("#")[2])
+
 def get_user_total_minutes_in_range(
     guild_id: int,
     user_id: int,
@@ -83,27 +184,352 @@ def get_user_total_minutes_in_range(
     """
     指定期間 [date_from, date_to] における
     1ユーザーの total_min 合計（分）を返す。
+
+    閉じた日のうち period_cache にある日はそこから足し、
+    残りの日は USER_DATE_INDEX を stat_date の範囲で Query する（期間の長さによらず 1 回 + ページ分）。
+    インデックスがまだ無い / backfill_user_index() が終わっていないときは、
+    残りの日の行を (guild_date, user_id) で直接読む（BatchGetItem で 100 日ずつ）。
     """
-    total = 0.0
-    sk = str(user_id)
+    if date_from > date_to:
+        return 0.0
 
+    total = 0.0
+    remaining: set[str] = set()
+    closed = last_closed_day()
     day = date_from
     while day <= date_to:
-        pk = _make_guild_date_key(guild_id, day)
-        resp = table.get_item(
-            Key={
-                "guild_date": pk,
-                "user_id": sk,
-            }
-        )
-        item = resp.get("Item")
-        if item and "total_min" in item:
-            total += float(item["total_min"])
+        cached = period_cache.get(guild_id, day.isoformat()) if period_cache and day <= closed else None
+        if cached is None:
+            remaining.add(day.isoformat())
+        else:
+            total += cached.get(user_id, 0.0)
         day += datetime.timedelta(days=1)
+    if not remaining:
+        return total
+
+    if user_index_ready():
+        try:
+            return total + _sum_user_days_by_index(guild_id, user_id, remaining)
+        except ClientError as e:
+            # インデックスが消された / 作成中など → 日ごとの読み込みに戻す
+            if e.response.get("Error", {}).get("Code") not in ("ValidationException", "ResourceNotFoundException"):
+                raise
+            _set_user_index_ready(False)
+            print(f"[voice_daily_store] {USER_DATE_INDEX} が使えないので日ごとに読みます: {e}")
+    return total + _sum_user_days(guild_id, user_id, remaining)
+
+
+def _sum_user_days_by_index(guild_id: int, user_id: int, days: set[str]) -> float:
+    total = 0.0
+    kwargs = dict(
+        IndexName=USER_DATE_INDEX,
+        KeyConditionExpression=(
+            Key("guild_user").eq(_make_guild_user_key(guild_id, user_id))
+            & Key("stat_date").between(min(days), max(days))
+        ),
+        ProjectionExpression="total_min, stat_date",
+    )
+    while True:
+        resp = table().query(**kwargs)
+        for item in resp.get("Items", []):
+            if "total_min" in item and item.get("stat_date") in days:
+                total += float(item["total_min"])
+
+        last_key = resp.get("LastEvaluatedKey")
+        if not last_key:
+            return total
+        kwargs["ExclusiveStartKey"] = last_key
+
 
+def _sum_user_days(guild_id: int, user_id: int, days: set[str]) -> float:
+    """インデックスを使わずに、日ごとの行を BatchGetItem（100 件ずつ）で読んで足す"""
+    total = 0.0
+    keys = [
+        {"guild_date": f"{guild_id}#{day}", "user_id": str(user_id)}
+        for day in sorted(days)
+    ]
+    for i in range(0, len(keys), 100):
+        request = {TABLE_NAME: {"Keys": keys[i:i + 100], "ProjectionExpression": "total_min"}}
+        delay = 0.05
+        while request:
+            resp = aws_clients.dynamodb().batch_get_item(RequestItems=request)
+            for item in resp.get("Responses", {}).get(TABLE_NAME, []):
+                if "total_min" in item:
+                    total += float(item["total_min"])
+            request = resp.get("UnprocessedKeys") or None
+            if request:
+                time.sleep(delay)
+                delay = min(delay * 2, 2.0)
     return total
 
 
+def _set_user_index_ready(ready: bool):
+    global _user_index_ready, _user_index_checked_at
+    _user_index_ready = ready
+    _user_index_checked_at = time.monotonic()
+
+
+def user_index_ready() -> bool:
+    """
+    USER_DATE_INDEX で期間集計してよいか（backfill_user_index() の完了の印があるか）。
+    まだなら USER_INDEX_RECHECK_SECONDS ごとにしか確かめ直さない。
+    """
+    if _user_index_ready:
+        return True
+    if _user_index_checked_at is not None and time.monotonic() - _user_index_checked_at < USER_INDEX_RECHECK_SECONDS:
+        return False
+    pk, sk = USER_INDEX_MARKER
+    resp = table().get_item(Key={"guild_date": pk, "user_id": sk}, ProjectionExpression="user_id")
+    _set_user_index_ready("Item" in resp)
+    return _user_index_ready
+
+
+def backfill_user_index() -> int:
+    """
+    USER_DATE_INDEX の属性（guild_user / stat_date）が無い行に付け足す。
+    インデックス導入前に書かれた日の分を、ユーザー単位の期間集計に載せるための一回限りの処理
+    （scripts/migrate_voice_daily_user_index.py から呼ぶ）。
+    最後まで終わったら USER_INDEX_MARKER の行を書き、期間集計がインデックスを使い始める。
+    戻り値: 更新した行数
+    """
+    global _user_index_checked_at
+    updated = 0
+    kwargs = dict(
+        FilterExpression=Attr("guild_user").not_exists(),
+        ProjectionExpression="guild_date, user_id",
+    )
+    while True:
+        resp = table().scan(**kwargs)
+        for item in resp.get("Items", []):
+            guild_id, _, day = item["guild_date"].partition("#")
+            if not day[:1].isdigit():
+                # 週 / 月の集計行（"W..." / "M..."）や完了の印はインデックスに載せない
+                continue
+            table().update_item(
+                Key={"guild_date": item["guild_date"], "user_id": item["user_id"]},
+                UpdateExpression="SET guild_user = :gu, stat_date = :date",
+                ExpressionAttributeValues={
+                    ":gu": f"{guild_id}#{item['user_id']}",
+                    ":date": day,
+                },
+            )
+            updated += 1
+
+        last_key = resp.get("LastEvaluatedKey")
+        if not last_key:
+            break
+        kwargs["ExclusiveStartKey"] = last_key
+
+    pk, sk = USER_INDEX_MARKER
+    table().put_item(Item={
+        "guild_date": pk,
+        "user_id": sk,
+        "rows_updated": updated,
+        "updated_at": jst_now().isoformat(),
+    })
+    # 次の期間集計で印を読み直す
+    _user_index_checked_at = None
+    return updated
+
+
+def _query_partition(
+    pk: str,
+    fields: tuple[str, ...] = ("total_min",),
+) -> tuple[list[tuple[int, dict[str, float]]], bool]:
+    """
+    guild_date パーティション 1 つ（日 / 週 / 月）を最後のページまで読む。
+    戻り値: ([(user_id, {field: 分})], ROLLUP_SENTINEL の行があったか)
+    """
+    rows: list[tuple[int, dict[str, float]]] = []
+    has_sentinel = False
+    kwargs = dict(
+        KeyConditionExpression=Key("guild_date").eq(pk),
+        ProjectionExpression="user_id, " + ", ".join(fields),
+    )
+    while True:
+        resp = table().query(**kwargs)
+        for item in resp.get("Items", []):
+            if item.get("user_id") == ROLLUP_SENTINEL:
+                has_sentinel = True
+                continue
+            try:
+                uid = int(item["user_id"])
+            except (KeyError, ValueError, TypeError):
+                continue
+            rows.append((uid, {f: float(item.get(f, 0.0)) for f in fields}))
+
+        last_key = resp.get("LastEvaluatedKey")
+        if not last_key:
+            return rows, has_sentinel
+        kwargs["ExclusiveStartKey"] = last_key
+
+
+# =========================
+#  週 / 月の集計（rollup）
+# =========================
+def _month_end(day: datetime.date) -> datetime.date:
+    first_of_next = (day.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    return first_of_next - datetime.timedelta(days=1)
+
+
+def _period_days(kind: str, start: datetime.date) -> list[datetime.date]:
+    """kind = "W"（月曜始まりの週）/ "M"（月）/ "D"（日）の期間に含まれる日"""
+    if kind == "W":
+        end = start + datetime.timedelta(days=6)
+    elif kind == "M":
+        end = _month_end(start)
+    else:
+        end = start
+    return [start + datetime.timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def _period_key(guild_id: int, kind: str, start: datetime.date) -> str:
+    if kind == "W":
+        return f"{guild_id}#W{start.isoformat()}"   # "123#W2025-11-24"
+    if kind == "M":
+        return f"{guild_id}#M{start:%Y-%m}"          # "123#M2025-11"
+    return _make_guild_date_key(guild_id, start)
+
+
+def last_closed_day(now: Optional[datetime.datetime] = None) -> datetime.date:
+    """
+    集計してよい最後の日（JST）。
+    日付またぎの分はバッファから少し遅れて書かれるので、日が変わって
+    VOICE_ROLLUP_GRACE_HOURS 経つまではその日をまだ閉じていない扱いにする。
+    """
+    now = now or jst_now()
+    return (now - datetime.timedelta(hours=VOICE_ROLLUP_GRACE_HOURS)).date() - datetime.timedelta(days=1)
+
+
+def rollup_period(guild_id: int, kind: str, start: datetime.date) -> int:
+    """
+    期間（kind="W" / "M"）の日次行を足し合わせて、集計行として書く。
+
+    集計行はユーザーごとに put で上書きし、最後に ROLLUP_SENTINEL の行を書く。
+    途中で落ちても sentinel が無いので期間集計では使われず、やり直せば同じ結果になる。
+    戻り値: 書いたユーザー数
+    """
+    days = _period_days(kind, start)
+    futures = [
+        _query_pool.submit(_query_partition, _make_guild_date_key(guild_id, day), MIN_FIELDS)
+        for day in days
+    ]
+    totals: dict[int, dict[str, float]] = defaultdict(lambda: dict.fromkeys(MIN_FIELDS, 0.0))
+    for fut in as_completed(futures):
+        for uid, mins in fut.result()[0]:
+            row = totals[uid]
+            for f, v in mins.items():
+                row[f] += v
+
+    pk = _period_key(guild_id, kind, start)
+    updated_at = jst_now().isoformat()
+    items = [
+        {
+            "guild_date": pk,
+            "user_id": str(uid),
+            **{f: Decimal(str(v)) for f, v in mins.items()},
+            "updated_at": updated_at,
+        }
+        for uid, mins in totals.items()
+    ]
+    _put_items(items)
+    _put_items([{
+        "guild_date": pk,
+        "user_id": ROLLUP_SENTINEL,
+        "days": len(days),
+        "users": len(items),
+        "updated_at": updated_at,
+    }])
+    return len(items)
+
+
+def _put_items(items: list[dict]):
+    """BatchWriteItem（25 件ずつ）で put する。UnprocessedItems は待ってから投げ直す"""
+    for i in range(0, len(items), 25):
+        requests = [{"PutRequest": {"Item": item}} for item in items[i:i + 25]]
+        delay = 0.05
+        while requests:
+            resp = aws_clients.dynamodb().batch_write_item(RequestItems={TABLE_NAME: requests})
+            requests = resp.get("UnprocessedItems", {}).get(TABLE_NAME, [])
+            if requests:
+                time.sleep(delay)
+                delay = min(delay * 2, 2.0)
+
+
+def rollup_closed_periods(
+    guild_id: int,
+    *,
+    now: Optional[datetime.datetime] = None,
+    weeks: int = 2,
+    months: int = 2,
+) -> int:
+    """
+    閉じた直近 weeks 週 / months か月のうち、まだ集計行の無いものを作る（定期ジョブ用）。
+    それより前の期間は rollup_period を直接呼んで埋める。
+    戻り値: 新しく作った集計の数
+    """
+    closed = last_closed_day(now)
+
+    # 閉じている最新の週（日曜まで閉じている月曜始まりの週）と月
+    last_week = closed - datetime.timedelta(days=closed.weekday() + (0 if closed.weekday() == 6 else 7))
+    candidates = [("W", last_week - datetime.timedelta(weeks=i)) for i in range(weeks)]
+    month = closed.replace(day=1) if _month_end(closed) == closed else (
+        closed.replace(day=1) - datetime.timedelta(days=1)
+    ).replace(day=1)
+    for _ in range(months):
+        candidates.append(("M", month))
+        month = (month - datetime.timedelta(days=1)).replace(day=1)
+
+    created = 0
+    for kind, start in candidates:
+        resp = table().get_item(
+            Key={"guild_date": _period_key(guild_id, kind, start), "user_id": ROLLUP_SENTINEL},
+            ProjectionExpression="user_id",
+        )
+        if "Item" not in resp:
+            rollup_period(guild_id, kind, start)
+            created += 1
+    return created
+
+
+def _plan_range(
+    date_from: datetime.date,
+    date_to: datetime.date,
+    closed: datetime.date,
+) -> list[tuple[str, datetime.date]]:
+    """
+    [date_from, date_to] を、閉じた月 → 閉じた週 → 残りの日 の順に大きい単位から覆う。
+    戻り値: [(kind, 期間の開始日)]
+    """
+    units: list[tuple[str, datetime.date]] = []
+    rollup_to = min(date_to, closed)
+
+    def _weeks_and_days(seg_from: datetime.date, seg_to: datetime.date):
+        d = seg_from
+        while d <= seg_to:
+            week_end = d + datetime.timedelta(days=6)
+            if d.weekday() == 0 and week_end <= seg_to and week_end <= rollup_to:
+                units.append(("W", d))
+                d = week_end + datetime.timedelta(days=1)
+            else:
+                units.append(("D", d))
+                d += datetime.timedelta(days=1)
+
+    month = date_from if date_from.day == 1 else _month_end(date_from) + datetime.timedelta(days=1)
+    months_from = month
+    while _month_end(month) <= rollup_to:
+        units.append(("M", month))
+        month = _month_end(month) + datetime.timedelta(days=1)
+
+    if month == months_from:
+        # 丸ごと入る月が無い
+        _weeks_and_days(date_from, date_to)
+    else:
+        _weeks_and_days(date_from, months_from - datetime.timedelta(days=1))
+        _weeks_and_days(month, date_to)
+    return units
+
+
 def get_guild_total_minutes_in_range(
     guild_id: int,
     date_from: datetime.date,
@@ -112,28 +538,51 @@ def get_guild_total_minutes_in_range(
     """
     指定期間 [date_from, date_to] のギルド内ユーザー別 total_min 合計。
     戻り値: { user_id(int): total_min(float) }
+
+    閉じた月 / 週は集計行（rollup_period）を、残りは日次行を読む。
+    集計行がまだ無い期間はその期間の日次行を読み直す。
+    閉じた期間は period_cache にあればそこから足し、読んだら保存する（今日などは毎回読む）。
+    パーティションごとの Query は最大 DAILY_QUERY_CONCURRENCY 本まで並べて投げ、
+    終わったものから順に足し込む。
     """
     totals: dict[int, float] = defaultdict(float)
+    closed = last_closed_day()
+    futures = {}
+    # 読んでいる間に遅れた書き込みで消されたら、読んだ値は保存しない
+    generation = period_cache.generation if period_cache is not None else None
 
-    day = date_from
-    while day <= date_to:
-        pk = _make_guild_date_key(guild_id, day)
-
-        # その日のギルド分を全員ぶんQuery
-        resp = table.query(
-            KeyConditionExpression=Key("guild_date").eq(pk)
-        )
-        items = resp.get("Items", [])
+    def _read(kind: str, start: datetime.date):
+        is_closed = period_cache is not None and _period_days(kind, start)[-1] <= closed
+        key = _period_key(guild_id, kind, start).partition("#")[2]
+        cached = period_cache.get(guild_id, key) if is_closed else None
+        if cached is not None:
+            for uid, minutes in cached.items():
+                totals[uid] += minutes
+            return
+        fut = _query_pool.submit(_query_partition, _period_key(guild_id, kind, start))
+        futures[fut] = (kind, start, key if is_closed else None)
 
-        for item in items:
-            try:
-                uid = int(item["user_id"])
-            except (KeyError, ValueError, TypeError):
+    for kind, start in _plan_range(date_from, date_to, closed):
+        _read(kind, start)
+    try:
+        while futures:
+            done = next(as_completed(futures))
+            kind, start, cache_key = futures.pop(done)
+            rows, has_sentinel = done.result()
+            if kind != "D" and not has_sentinel:
+                # 集計行がまだ無い（or 作りかけ）→ その期間の日次行で数える
+                for day in _period_days(kind, start):
+                    _read("D", day)
                 continue
-
-            total_min = float(item.get("total_min", 0.0))
-            totals[uid] += total_min
-
-        day += datetime.timedelta(days=1)
+            for uid, mins in rows:
+                totals[uid] += mins["total_min"]
+            if cache_key is not None:
+                period_cache.put(
+                    guild_id, cache_key, {uid: mins["total_min"] for uid, mins in rows}, generation,
+                )
+    finally:
+        # 途中で失敗したら、まだ始まっていない Query は投げずに捨てる
+        for fut in futures:
+            fut.cancel()
 
     return dict(totals)
@@ -1,6 +1,7 @@
 import discord
 from discord.ext import commands
 from config import DISCORD_BOT_TOKEN
+from data import async_store
 
 
 class ZeroBot(commands.Bot):
@@ -51,6 +52,11 @@ class ZeroBot(commands.Bot):
     async def on_ready(self):
         print(f"✅ ログインしました: {self.user} ({self.user.id})")
 
+    async def close(self):
+        # Cog のアンロード（バッファ flush など）が終わってからスレッドプールを閉じる
+        await super().close()
+        async_store.shutdown()
+
 
 def main():
     if not DISCORD_BOT_TOKEN:
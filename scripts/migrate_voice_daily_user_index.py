@@ -0,0 +1,103 @@
+# scripts/migrate_voice_daily_user_index.py
+"""
+日次VC集計テーブル（zero_bot_voice_daily_stats）に、ユーザー単位の期間集計用の GSI
+（voice_daily_store.USER_DATE_INDEX）を作って、インデックス導入前の行を載せる。
+
+    python -m scripts.migrate_voice_daily_user_index             # 作成 → ACTIVE 待ち → backfill
+    python -m scripts.migrate_voice_daily_user_index --dry-run   # 今の状態を表示するだけ
+    python -m scripts.migrate_voice_daily_user_index --read-capacity 10 --write-capacity 10
+
+1. GSI が無ければ UpdateTable で作る（プロビジョンドのテーブルなら --read/--write-capacity を使う）
+2. GSI が ACTIVE になるまで待つ
+3. guild_user / stat_date の無い古い行に付け足す（voice_daily_store.backfill_user_index）
+4. 完了の印の行を書く
+
+何度流しても同じ結果になる（途中で止まったらそのまま流し直せばよい）。
+DYNAMODB_LOCAL=true なら data.local_dynamo の代用品に対して同じことをする。
+印ができるまでは /zbadmin voice_time_period などのユーザー単位の期間集計は
+インデックスを使わずに日ごとの行を読むので、Bot を先にデプロイしても結果は変わらない。
+"""
+
+import argparse
+import sys
+import time
+
+from data import aws_clients, voice_daily_store
+
+
+def _index_status(client) -> tuple:
+    """(GSI の状態 or None, テーブルの課金モード)"""
+    desc = client.describe_table(TableName=voice_daily_store.TABLE_NAME)["Table"]
+    billing = desc.get("BillingModeSummary", {}).get("BillingMode", "PROVISIONED")
+    for index in desc.get("GlobalSecondaryIndexes", []):
+        if index["IndexName"] == voice_daily_store.USER_DATE_INDEX:
+            status = index["IndexStatus"]
+            if index.get("Backfilling"):
+                status += " (backfilling)"
+            return status, billing
+    return None, billing
+
+
+def _create_index(client, billing: str, read_capacity: int, write_capacity: int):
+    create = {
+        "IndexName": voice_daily_store.USER_DATE_INDEX,
+        "KeySchema": [
+            {"AttributeName": "guild_user", "KeyType": "HASH"},
+            {"AttributeName": "stat_date", "KeyType": "RANGE"},
+        ],
+        "Projection": {"ProjectionType": "INCLUDE", "NonKeyAttributes": ["total_min"]},
+    }
+    if billing != "PAY_PER_REQUEST":
+        create["ProvisionedThroughput"] = {
+            "ReadCapacityUnits": read_capacity,
+            "WriteCapacityUnits": write_capacity,
+        }
+    client.update_table(
+        TableName=voice_daily_store.TABLE_NAME,
+        AttributeDefinitions=[
+            {"AttributeName": "guild_user", "AttributeType": "S"},
+            {"AttributeName": "stat_date", "AttributeType": "S"},
+        ],
+        GlobalSecondaryIndexUpdates=[{"Create": create}],
+    )
+
+
+def _wait_active(client, timeout: float, interval: float = 15.0):
+    ends_at = time.monotonic() + timeout
+    while True:
+        status, _ = _index_status(client)
+        print(f"[migrate] {voice_daily_store.USER_DATE_INDEX}: {status}")
+        if status == "ACTIVE":
+            return
+        if time.monotonic() >= ends_at:
+            raise TimeoutError(f"{voice_daily_store.USER_DATE_INDEX} が {timeout:.0f} 秒で ACTIVE にならない")
+        time.sleep(interval)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="日次VC集計テーブルにユーザー単位の GSI を作って backfill する")
+    parser.add_argument("--dry-run", action="store_true", help="状態を表示するだけで何も変えない")
+    parser.add_argument("--read-capacity", type=int, default=5, help="プロビジョンドのテーブルのときの GSI の RCU")
+    parser.add_argument("--write-capacity", type=int, default=5, help="プロビジョンドのテーブルのときの GSI の WCU")
+    parser.add_argument("--wait-timeout", type=float, default=3600, help="GSI が ACTIVE になるまで待つ秒数")
+    args = parser.parse_args(argv)
+
+    client = aws_clients.dynamodb().meta.client
+    status, billing = _index_status(client)
+    print(f"[migrate] table={voice_daily_store.TABLE_NAME} billing={billing} index={status}")
+    if args.dry_run:
+        print(f"[migrate] backfill done: {voice_daily_store.user_index_ready()}")
+        return 0
+
+    if status is None:
+        _create_index(client, billing, args.read_capacity, args.write_capacity)
+        print(f"[migrate] {voice_daily_store.USER_DATE_INDEX} を作成中")
+    _wait_active(client, args.wait_timeout)
+
+    updated = voice_daily_store.backfill_user_index()
+    print(f"[migrate] backfill: {updated} 行を更新。期間集計は {voice_daily_store.USER_DATE_INDEX} を使います")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
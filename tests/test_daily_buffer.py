@@ -0,0 +1,81 @@
+# tests/test_daily_buffer.py
+import asyncio
+import datetime
+import threading
+
+import pytest
+
+from data import async_store
+from data import store as store_mod
+from data.voice_buffer import DailyMinutesBuffer
+
+DAY = datetime.date(2025, 3, 3)
+
+
+class _SlowDailyStore:
+    """add_daily_voice_minutes が gate が開くまで止まる日次ストア"""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.started = threading.Event()
+        self.rows = {}
+
+    def add_daily_voice_minutes(self, guild_id, user_id, *, day, **minutes):
+        self.started.set()
+        self.gate.wait(5)
+        row = self.rows.setdefault((guild_id, day, user_id), {})
+        for col, v in minutes.items():
+            row[col] = row.get(col, 0.0) + v
+
+
+@pytest.fixture
+def daily(monkeypatch):
+    buffer = DailyMinutesBuffer()
+    slow = _SlowDailyStore()
+    monkeypatch.setattr(store_mod, "daily_buffer", buffer)
+    monkeypatch.setattr(store_mod, "daily_store", lambda: slow)
+    return buffer, slow
+
+
+def test_claimed_key_is_skipped_by_another_flush(daily):
+    buffer, slow = daily
+    buffer.add(1, 7, DAY, total_min=10.0)
+    key = (1, DAY, 7)
+
+    assert buffer.begin_flush() == [key]
+    assert buffer.claim(key) == {"total_min": 10.0}
+    buffer.add(1, 7, DAY, total_min=1.0)
+    # 書き込み中のキーは、次の flush が拾っても書かない / 新しい分は pending に残る
+    assert buffer.begin_flush() == [key]
+    assert buffer.claim(key) is None
+    buffer.mark_flushed(key, {"total_min": 10.0})
+    buffer.release(key)
+
+    assert buffer.claim(key) == {"total_min": 1.0}
+    buffer.mark_flushed(key, {"total_min": 1.0})
+    buffer.release(key)
+    assert buffer.carried() == 0 and len(buffer) == 0
+
+
+def test_unload_flush_waits_for_cancelled_flush(daily):
+    buffer, slow = daily
+    buffer.add(1, 7, DAY, total_min=10.0)
+
+    async def _run():
+        loop_flush = asyncio.ensure_future(async_store.flush_daily_buffer())
+        await asyncio.get_running_loop().run_in_executor(None, slow.started.wait, 5)
+        # ループの flush がキャンセルされても、スレッド側の書き込みは続いている
+        loop_flush.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await loop_flush
+        buffer.add(1, 7, DAY, total_min=1.0)
+
+        unload = asyncio.ensure_future(async_store.flush_daily_buffer(wait=True))
+        await asyncio.sleep(0.05)
+        slow.gate.set()
+        return await unload
+
+    summary = asyncio.run(_run())
+    assert summary.processed == 1
+    assert slow.rows == {(1, DAY, 7): {"total_min": 11.0}}
+    assert buffer.carried() == 0 and len(buffer) == 0
@@ -0,0 +1,104 @@
+# tests/test_dynamo_store.py
+import pytest
+
+from data.backends.dynamo_store import DynamoStore
+from data.local_dynamo import MAX_EXPRESSION_BYTES, LocalDynamoDB
+from data.voice_buffer import META_TIME_KEYS
+
+# 1 tick 分として一度に来うる最大: 時間キー全部 + 24 時間帯 + たくさんの相手
+WORST_TIMES = {k: 1.5 for k in META_TIME_KEYS}
+WORST_HOURS = {h: 0.5 for h in range(24)}
+
+
+def _pairs(n):
+    # Discord の ID と同じ桁数
+    return {str(10**18 + i): 1.0 for i in range(n)}
+
+
+@pytest.fixture
+def store():
+    return DynamoStore("zero_bot_xp", dynamodb=LocalDynamoDB())
+
+
+@pytest.mark.parametrize("n_pairs", [40, 41, 500])
+def test_worst_case_expression_fits(store, n_pairs):
+    params, rest = store.build_meta_update(
+        1, 2,
+        xp=3.0,
+        times=WORST_TIMES,
+        max_member_count=25,
+        hour_buckets=WORST_HOURS,
+        pair_time=_pairs(n_pairs),
+    )
+    assert len(params["UpdateExpression"].encode("utf-8")) <= MAX_EXPRESSION_BYTES
+    # XP と最大人数は必ず最初の UpdateItem に入る
+    assert ":dxp" in params["ExpressionAttributeValues"]
+    assert ":mmc" in params["ExpressionAttributeValues"]
+    assert rest["pair_time"]  # 入りきらない相手は次に回る
+
+
+@pytest.mark.parametrize("n_pairs", [40, 500])
+def test_worst_case_activity_is_written(store, n_pairs):
+    pairs = _pairs(n_pairs)
+    for _ in range(2):  # 1 回目は新規作成（meta の初期化を通る）
+        store.add_voice_activity(
+            1, 2,
+            xp=3.0,
+            times=WORST_TIMES,
+            max_member_count=25,
+            hour_buckets=WORST_HOURS,
+            pair_time=pairs,
+        )
+
+    assert store.get_voice_xp(1, 2) == 6.0
+    meta = store.get_voice_meta(1, 2)
+    assert all(meta[k] == 3.0 for k in META_TIME_KEYS)
+    assert meta["hour_buckets"] == [1.0] * 24
+    assert meta["pair_time"] == {oid: 2.0 for oid in pairs}
+    assert meta["max_member_count"] == 25
+
+
+def test_failed_follow_up_update_resends_only_the_rest(store, monkeypatch):
+    from botocore.exceptions import ClientError
+
+    from data import store as store_mod
+    from data.voice_buffer import VoiceWriteBuffer
+
+    buffer = VoiceWriteBuffer()
+    monkeypatch.setattr(store_mod, "store", store)
+    monkeypatch.setattr(store_mod, "voice_buffer", buffer)
+    partners = [10**18 + i for i in range(60)]  # 式が 2 つの UpdateItem に分かれる
+
+    def _tick():
+        buffer.add(
+            1, 2, xp=5.0, minutes=1.0, group_key="big_group_time", is_muted=False,
+            member_count=61, hour=12, partner_ids=partners,
+        )
+
+    _tick()
+    assert store_mod.flush_voice_buffer().processed == 1
+
+    # 2 回目の tick は、最初の UpdateItem が通ったあと続きの UpdateItem が 1 回だけ失敗する
+    _tick()
+    client = store.client
+    update_item = client.update_item
+    calls = []
+
+    def _flaky(**params):
+        calls.append(params)
+        if len(calls) == 2:
+            raise ClientError({"Error": {"Code": "ProvisionedThroughputExceededException"}}, "UpdateItem")
+        return update_item(**params)
+
+    monkeypatch.setattr(client, "update_item", _flaky)
+    assert store_mod.flush_voice_buffer().failed == 1
+    assert store_mod.flush_voice_buffer().processed == 1
+    assert len(buffer) == 0
+
+    assert store.get_voice_xp(1, 2) == 10.0
+    meta = store.get_voice_meta(1, 2)
+    assert meta["total_time"] == 2.0
+    assert meta["big_group_time"] == 2.0
+    assert meta["hour_buckets"][12] == 2.0
+    assert meta["pair_time"] == {str(oid): 2.0 for oid in partners}
+    assert meta["max_member_count"] == 61
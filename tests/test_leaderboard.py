@@ -0,0 +1,58 @@
+# tests/test_leaderboard.py
+import random
+
+from data import store as store_mod
+from data.backends.dynamo_store import DynamoStore
+from data.leaderboard import GuildLeaderboard, LeaderboardCache, XpIndex
+from data.local_dynamo import LocalDynamoDB
+from data.voice_buffer import VoiceWriteBuffer
+
+
+def test_load_matches_repeated_set():
+    rng = random.Random(0)
+    items = [(uid, float(rng.choice([0, -1, rng.randint(1, 50)]))) for uid in range(500)]
+    one_by_one = XpIndex()
+    for uid, xp in items:
+        one_by_one.set(uid, xp)
+    loaded = XpIndex()
+    loaded.load(items)
+
+    assert loaded.top() == one_by_one.top()
+    assert all(loaded.rank_of(uid) == one_by_one.rank_of(uid) for uid, _ in items)
+
+
+def test_leaderboard_streams_pages_with_pending_xp(monkeypatch):
+    store = DynamoStore("zero_bot_xp", dynamodb=LocalDynamoDB(page_size=7))
+    for uid in range(1, 31):
+        store.add_voice_xp(1, uid, float(uid))
+    store.add_text_xp(1, 5, 3.0)
+    buffer = VoiceWriteBuffer()
+    for uid, xp in ((3, 100.0), (99, 2.5)):  # 99 はまだ DB に書いていないユーザー
+        buffer.add(
+            1, uid, xp=xp, minutes=1.0, group_key="solo_time", is_muted=False,
+            member_count=1, hour=0, partner_ids=(),
+        )
+    monkeypatch.setattr(store_mod, "store", store)
+    monkeypatch.setattr(store_mod, "voice_buffer", buffer)
+
+    pages = []
+    query = store.client.query
+
+    def _query(**params):
+        pages.append(params.get("ExclusiveStartKey"))
+        return query(**params)
+
+    monkeypatch.setattr(store.client, "query", _query)
+    rows = store_mod.iter_guild_user_stats(1)
+    first = next(rows)
+    assert len(pages) == 1  # 最初の 1 件は 1 ページ目だけで返る
+    board = GuildLeaderboard([first, *rows])
+    assert len(pages) == 5
+
+    assert board.voice.top(2) == [(3, 103.0), (30, 30.0)]
+    assert board.voice.get(99) == 2.5
+    assert board.text.top() == [(5, 3.0)]
+
+    cache = LeaderboardCache(loader=store_mod.iter_guild_user_stats, reload_seconds=60)
+    assert cache.top(1, "voice_xp") == board.voice.top()
+    assert store_mod.get_guild_user_stats(1)[3] == {"voice_xp": 103.0, "text_xp": 0.0}
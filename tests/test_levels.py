@@ -0,0 +1,54 @@
+# tests/test_levels.py
+import math
+import random
+
+import pytest
+
+from data.store import LEVEL_BASE_XP, calc_level_from_xp, calc_levels, xp_for_level
+
+
+def reference_level(xp: float):
+    """閉じた式にする前の実装（XP_to_next(L) = 20 * L を足りる限り引いていく）"""
+    if xp <= 0:
+        return 1, 0.0, LEVEL_BASE_XP
+    level = 1
+    remaining = xp
+    need = LEVEL_BASE_XP * level
+    while remaining >= need:
+        remaining -= need
+        level += 1
+        need = LEVEL_BASE_XP * level
+    return level, remaining, need
+
+
+def _boundary_inputs():
+    xs = [0.0, -1.0, -0.0, 1e-9, 0.5, 19.999, 20.0, 20.000001, 1e6, 1e9, 1e11]
+    for level in list(range(1, 300)) + [1_000, 12_345, 100_000, 300_000]:
+        t = xp_for_level(level)
+        xs += [t, math.nextafter(t, -math.inf), math.nextafter(t, math.inf), t - 1e-6, t + 1e-6]
+    rng = random.Random(0)
+    xs += [rng.uniform(0, 1e7) for _ in range(2_000)]
+    return xs
+
+
+BOUNDARY_INPUTS = _boundary_inputs()
+
+
+def _same(got, want):
+    assert got[0] == want[0]
+    assert got[1] == pytest.approx(want[1], rel=1e-12, abs=1e-9)
+    assert got[2] == want[2]
+
+
+def test_matches_reference_loop():
+    for xp in BOUNDARY_INPUTS:
+        _same(calc_level_from_xp(xp), reference_level(xp))
+
+
+def test_calc_levels_matches_reference_loop():
+    assert calc_levels(BOUNDARY_INPUTS) == [reference_level(xp)[0] for xp in BOUNDARY_INPUTS]
+
+
+def test_exact_threshold_reaches_level():
+    for level in range(1, 500):
+        assert calc_level_from_xp(xp_for_level(level))[:2] == (level, 0.0)
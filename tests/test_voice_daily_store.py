@@ -0,0 +1,127 @@
+# tests/test_voice_daily_store.py
+import datetime
+
+import pytest
+
+from data import aws_clients, voice_daily_store as vds
+from data.local_dynamo import LocalDynamoDB
+
+DAY = datetime.date(2025, 3, 3)
+
+
+@pytest.fixture
+def use_db(monkeypatch):
+    """voice_daily_store を LocalDynamoDB に繋ぐ（キャッシュ / インデックス判定は毎回まっさら）"""
+    def _use(db: LocalDynamoDB) -> LocalDynamoDB:
+        monkeypatch.setattr(aws_clients, "dynamodb", lambda region=None: db)
+        monkeypatch.setattr(vds, "_table", None)
+        monkeypatch.setattr(vds, "period_cache", None)
+        monkeypatch.setattr(vds, "_user_index_ready", False)
+        monkeypatch.setattr(vds, "_user_index_checked_at", None)
+        return db
+    return _use
+
+
+def _put_old_rows(db: LocalDynamoDB, days: int):
+    """インデックス導入前の形の行（guild_user / stat_date が無い）"""
+    t = db.Table(vds.TABLE_NAME)
+    for i in range(days):
+        day = DAY + datetime.timedelta(days=i)
+        t.put_item(Item={"guild_date": f"1#{day.isoformat()}", "user_id": "7", "total_min": 10})
+
+
+def test_reads_old_rows_before_backfill(use_db):
+    db = use_db(LocalDynamoDB())
+    _put_old_rows(db, 150)
+    vds.add_daily_voice_minutes(1, 7, day=DAY, total_min=5.0)
+
+    total = vds.get_user_total_minutes_in_range(1, 7, DAY, DAY + datetime.timedelta(days=149))
+    assert total == 150 * 10 + 5
+    assert db.calls["Query"] == 0  # 完了の印が無いのでインデックスは使わない
+
+
+def test_uses_index_after_migration(use_db):
+    from scripts.migrate_voice_daily_user_index import main
+
+    db = use_db(LocalDynamoDB())
+    _put_old_rows(db, 30)
+    assert main([]) == 0
+
+    db.calls.clear()
+    total = vds.get_user_total_minutes_in_range(1, 7, DAY, DAY + datetime.timedelta(days=29))
+    assert total == 300
+    assert db.calls["Query"] == 1
+    assert db.calls["BatchGetItem"] == 0
+
+
+def test_migration_creates_missing_index(use_db):
+    from scripts.migrate_voice_daily_user_index import main
+
+    db = use_db(LocalDynamoDB(indexes={vds.TABLE_NAME: {}}))
+    _put_old_rows(db, 5)
+    assert main([]) == 0
+
+    db.calls.clear()
+    assert vds.get_user_total_minutes_in_range(1, 7, DAY, DAY + datetime.timedelta(days=4)) == 50
+    assert db.calls["Query"] == 1
+
+
+def test_falls_back_when_index_is_missing(use_db):
+    db = use_db(LocalDynamoDB(indexes={vds.TABLE_NAME: {}}))
+    _put_old_rows(db, 10)
+    vds.backfill_user_index()  # 印はあるが GSI が無い
+
+    total = vds.get_user_total_minutes_in_range(1, 7, DAY, DAY + datetime.timedelta(days=9))
+    assert total == 100
+    assert vds.user_index_ready() is False
+
+
+def test_late_write_reopens_rollups(use_db):
+    db = use_db(LocalDynamoDB())
+    vds.add_daily_voice_minutes(1, 7, day=DAY, total_min=10.0)
+    vds.rollup_period(1, "W", DAY)
+    vds.rollup_period(1, "M", DAY.replace(day=1))
+    week_to = DAY + datetime.timedelta(days=6)
+    assert vds.get_guild_total_minutes_in_range(1, DAY, week_to) == {7: 10.0}
+
+    # 集計のあとでバッファから閉じた日に書かれた分
+    vds.add_daily_voice_minutes(1, 7, day=DAY + datetime.timedelta(days=2), total_min=5.0)
+    assert vds.get_guild_total_minutes_in_range(1, DAY, week_to) == {7: 15.0}
+    assert vds.get_guild_total_minutes_in_range(1, datetime.date(2025, 3, 1), datetime.date(2025, 3, 31)) == {7: 15.0}
+
+    # 作り直せば集計行からまた読める
+    vds.rollup_period(1, "W", DAY)
+    db.calls.clear()
+    assert vds.get_guild_total_minutes_in_range(1, DAY, week_to) == {7: 15.0}
+    assert db.calls["Query"] == 1
+
+
+def test_late_write_invalidates_period_cache(use_db, monkeypatch, tmp_path):
+    from data.period_cache import PeriodCache
+
+    use_db(LocalDynamoDB())
+    cache = PeriodCache(str(tmp_path))
+    monkeypatch.setattr(vds, "period_cache", cache)
+    week_to = DAY + datetime.timedelta(days=6)
+    vds.add_daily_voice_minutes(1, 7, day=DAY, total_min=10.0)
+    vds.rollup_period(1, "W", DAY)
+    assert vds.get_guild_total_minutes_in_range(1, DAY, week_to) == {7: 10.0}
+    assert vds.get_guild_total_minutes_in_range(1, DAY, DAY) == {7: 10.0}
+    assert cache.get(1, f"W{DAY.isoformat()}") == {7: 10.0}
+    assert cache.get(1, DAY.isoformat()) == {7: 10.0}
+
+    vds.add_daily_voice_minutes(1, 7, day=DAY, total_min=5.0)
+    assert cache.get(1, f"W{DAY.isoformat()}") is None
+    assert not (tmp_path / "1" / f"{DAY.isoformat()}.json").exists()
+    assert vds.get_guild_total_minutes_in_range(1, DAY, week_to) == {7: 15.0}
+    assert vds.get_user_total_minutes_in_range(1, 7, DAY, DAY) == 15.0
+
+
+def test_period_cache_skips_put_after_invalidate(tmp_path):
+    from data.period_cache import PeriodCache
+
+    cache = PeriodCache(str(tmp_path))
+    generation = cache.generation
+    cache.invalidate(1, "2025-03-03")  # 読んでいる間に遅れた書き込みがあった
+    cache.put(1, "2025-03-03", {7: 10.0}, generation)
+    assert cache.get(1, "2025-03-03") is None
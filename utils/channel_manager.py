@@ -8,13 +8,11 @@ import re
 
 from utils.helpers import normalize_text_channel_name
 from config import debug_log
-from data.guild_config_store import GuildConfigStore
+from data import async_store as store
 from typing import Optional
 
 jst = pytz.timezone("Asia/Tokyo")
 
-config_store = GuildConfigStore()
-
 # 万が一 guild_config に何も設定されていないときに使うデフォルトカテゴリ名
 DEFAULT_CATEGORY_NAME = "インチャテキスト"
 
@@ -31,7 +29,7 @@ class ChannelManager:
     # ==========================
     #   設定読み込み系
     # ==========================
-    def _get_voice_text_category_from_config(self, guild: discord.Guild) -> Optional[discord.CategoryChannel]:
+    async def _get_voice_text_category_from_config(self, guild: discord.Guild) -> Optional[discord.CategoryChannel]:
         """
         guild_config.logging から、ボイス用テキストチャンネルを置くカテゴリを取得する。
         優先順位:
@@ -39,23 +37,19 @@ class ChannelManager:
           2) logging.voice_text_category_name
           3) なし → None を返す（呼び出し元で fallback）
         """
-        cfg = config_store.get_config(guild.id) or {}
-        logging_cfg = cfg.get("logging") or {}
+        # 不正な voice_text_category_id は GuildConfig への変換時にログ済み（None になる）
+        cfg = await store.get_guild_config(guild.id)
 
-        raw_cat_id = logging_cfg.get("voice_text_category_id")
-        cat_name = logging_cfg.get("voice_text_category_name")
+        cat_id = cfg.logging.voice_text_category_id
+        cat_name = cfg.logging.voice_text_category_name
 
         # 1) ID優先
-        if raw_cat_id is not None:
-            try:
-                cat_id = int(raw_cat_id)
-                ch = guild.get_channel(cat_id)
-                if isinstance(ch, discord.CategoryChannel):
-                    return ch
-                else:
-                    debug_log(f"[ChannelManager] voice_text_category_id={cat_id} は CategoryChannel ではありません")
-            except (TypeError, ValueError):
-                debug_log(f"[ChannelManager] voice_text_category_id が不正: {raw_cat_id}")
+        if cat_id is not None:
+            ch = guild.get_channel(cat_id)
+            if isinstance(ch, discord.CategoryChannel):
+                return ch
+            else:
+                debug_log(f"[ChannelManager] voice_text_category_id={cat_id} は CategoryChannel ではありません")
 
         # 2) 名前指定
         if cat_name:
@@ -99,7 +93,7 @@ class ChannelManager:
         - チャンネル名は `YYYYMMDD_正規化VC名`
         """
         # 1) カテゴリ候補を guild_config から取得
-        category = self._get_voice_text_category_from_config(guild)
+        category = await self._get_voice_text_category_from_config(guild)
 
         # 2) 設定にカテゴリがない場合 → VC が属するカテゴリを使う
         # if category is None and voice_channel.category is not None:
@@ -1,14 +1,11 @@
 import asyncio
 import discord
 from utils.messages import get_random_success_message
-from data.guild_config_store import GuildConfigStore
+from data import async_store as store
 
 countdown_lock = asyncio.Lock()
 countdown_active = {}
 
-# ★ 設定読み出し用
-config_store = GuildConfigStore()
-
 
 async def set_countdown_active(user_id, value):
     async with countdown_lock:
@@ -25,11 +22,11 @@ class StopButtonView(discord.ui.View):
     async def stop_button(self, interaction: discord.Interaction, button: discord.ui.Button):
 
         # ★ ギルド設定から STOP ボタン制御を取得
-        cfg = config_store.get_config(self.guild_id) or {}
-        oyanmo_cfg = cfg.get("oyanmo") or {}
+        cfg = await store.get_guild_config(self.guild_id)
+        oyanmo_cfg = cfg.oyanmo
 
-        stop_button_only_owner = oyanmo_cfg.get("enable_stop_button", True)
-        only_cmd_user = oyanmo_cfg.get("stop_button_only_command_user", True)
+        stop_button_only_owner = oyanmo_cfg.enable_stop_button
+        only_cmd_user = oyanmo_cfg.stop_button_only_command_user
 
         # STOP ボタン自体が disabled の鯖
         if not stop_button_only_owner:
@@ -50,13 +47,13 @@ async def countdown_procedure(interaction, target_member, target_channel, countd
     guild_id = guild.id
 
     # ★ ギルド設定読み込み
-    cfg = config_store.get_config(guild_id) or {}
-    oyanmo_cfg = cfg.get("oyanmo") or {}
+    cfg = await store.get_guild_config(guild_id)
+    oyanmo_cfg = cfg.oyanmo
 
-    # ★ float → int に変換（絶対必要）
-    countdown_seconds = int(oyanmo_cfg.get("default_countdown_seconds", 10))
+    # ★ float → int の変換は GuildConfig 側で済んでいる
+    countdown_seconds = oyanmo_cfg.default_countdown_seconds
 
-    enable_stop_button = oyanmo_cfg.get("enable_stop_button", True)
+    enable_stop_button = oyanmo_cfg.enable_stop_button
 
     # メイン埋め込み
     embed = discord.Embed(
@@ -95,7 +92,7 @@ async def countdown_procedure(interaction, target_member, target_channel, countd
     await target_member.move_to(target_channel)
 
     # ★ 成功メッセージ
-    embed.description = get_random_success_message(guild_id, target_member.display_name)
+    embed.description = await get_random_success_message(guild_id, target_member.display_name)
     embed.color = 0x32CD32
 
     await countdown_msg.edit(embed=embed, view=None)
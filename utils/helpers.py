@@ -6,8 +6,7 @@ import os
 import datetime
 
 from config import debug_log
-from data.guild_config_store import GuildConfigStore
-from data.store import calc_level_from_xp
+from data.store import xp_for_level
 
 # ============================================
 # プロフィールメッセージ（従来の JSON 保存版）
@@ -49,13 +48,6 @@ def save_profile_messages(data: dict):
         debug_log(f"[PROFILE] save_profile_messages 失敗: {e}")
 
 
-# ============================================
-# DynamoDB ギルド設定
-# ============================================
-
-config_store = GuildConfigStore()
-
-
 def normalize_voice_channel_name(name: str) -> str:
     """ボイスチャンネル名を比較用に正規化"""
     name = re.sub(r"\s+", " ", name).strip()
@@ -92,16 +84,13 @@ async def voice_users_autocomplete(
 
     guild_id = guild.id
 
-    # 🔹 DB からギルド設定を取得
-    cfg = config_store.get_config(guild_id) or {}
-    profile_cfg = cfg.get("profile") or {}
+    # data.async_store → data.voice_daily_store → utils.helpers の循環 import を避ける
+    from data import async_store as store
 
-    # DB に未設定なら空扱い
-    raw_excluded = profile_cfg.get("excluded_voice_channel_ids", [])
-    try:
-        excluded_voice_channels = [int(c) for c in raw_excluded]
-    except (TypeError, ValueError):
-        excluded_voice_channels = []
+    # 🔹 DB からギルド設定を取得（変換済み・キャッシュ経由）
+    # DB に未設定なら空の frozenset
+    cfg = await store.get_guild_config(guild_id)
+    excluded_voice_channels = cfg.profile.excluded_voice_channel_ids
 
     current_lower = (current or "").lower()
     voice_members: list[str] = []
@@ -133,34 +122,9 @@ def _xp_for_level(target_level: int) -> float:
     """
     指定レベルになるために必要な『通算XP』を逆算する。
 
-    calc_level_from_xp を使って二分探索で求めるので、
-    XPカーブの実装に依存しない。
+    XPカーブは data.store 側で閉じた式になっているので、それをそのまま使う。
     """
-    if target_level <= 1:
-        return 0.0
-
-    # ざっくり上限を探す（指数的に増やしていく）
-    lo = 0.0
-    hi = 100.0
-
-    while True:
-        lv, _, _ = calc_level_from_xp(hi)
-        if lv >= target_level:
-            break
-        hi *= 2
-        if hi > 10_000_000:  # 上限保険
-            break
-
-    # lo..hi の範囲で「そのレベルになる最小XP」を二分探索
-    for _ in range(40):  # 精度十分
-        mid = (lo + hi) / 2
-        lv, _, _ = calc_level_from_xp(mid)
-        if lv >= target_level:
-            hi = mid
-        else:
-            lo = mid
-
-    return hi
+    return xp_for_level(target_level)
 
 # ===== JST関連ユーティリティ =====
 JST = datetime.timezone(datetime.timedelta(hours=9))
@@ -1,5 +1,5 @@
 import random
-from data.guild_config_store import GuildConfigStore
+from data import async_store as store
 
 # ★ デフォルト文言（DBに何もなかったとき用）
 DEFAULT_COMPLETION_MESSAGES = [
@@ -9,20 +9,16 @@ DEFAULT_COMPLETION_MESSAGES = [
     "✅ え!? {username} どゆことぉ？寝たん？ねぇねぇ。",
 ]
 
-# ★ 他のところでも使い回せるようにグローバル1個だけ
-_guild_config_store = GuildConfigStore()
-
-def get_random_success_message(guild_id: int, username: str) -> str:
+async def get_random_success_message(guild_id: int, username: str) -> str:
     """
     ギルド設定テーブルから /おやんも のメッセージ候補を取得して、
     そこからランダムに1件返す。
     なければデフォルトリストから選ぶ。
     """
-    config = _guild_config_store.get_config(guild_id) or {}
-    oyanmo_cfg = config.get("oyanmo") or {}
+    config = await store.get_guild_config(guild_id)
 
     # DynamoDB 側に "completion_messages": ["...", "..."] を置いておける
-    messages = oyanmo_cfg.get("completion_messages") or DEFAULT_COMPLETION_MESSAGES
+    messages = config.oyanmo.completion_messages or DEFAULT_COMPLETION_MESSAGES
 
     msg = random.choice(messages)
     return msg.replace("{username}", username)
@@ -0,0 +1,55 @@
+# utils/metrics.py
+"""
+プロセス内の簡易メトリクス置き場。
+
+- counter: 積み上げ（作成されたユーザー数など）
+- gauge  : 最新値（開いている VC セッション数など）
+- timing : 所要時間などの観測値（回数 / 合計 / 最大 / 直近）
+
+/zbadmin metrics で一覧表示できる。
+"""
+
+import threading
+from typing import Dict
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._timings: Dict[str, Dict[str, float]] = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            t = self._timings.get(name)
+            if t is None:
+                t = self._timings[name] = {"count": 0, "total": 0.0, "max": value, "last": value}
+            t["count"] += 1
+            t["total"] += value
+            t["max"] = max(t["max"], value)
+            t["last"] = value
+
+    def counter(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "timings": {k: dict(v) for k, v in self._timings.items()},
+            }
+
+
+# プロセス全体で 1 個だけ
+metrics = Metrics()
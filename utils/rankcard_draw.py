@@ -5,14 +5,8 @@ from io import BytesIO
 from PIL import Image, ImageDraw, ImageFont, ImageColor
 from typing import Optional, Tuple
 from utils.rankcard_s3 import load_rank_bg_from_s3
-from data.store import get_rank_bg_key
-
-from data.store import (
-    get_voice_xp,
-    get_text_xp,
-    calc_level_from_xp,
-    get_guild_user_stats,
-)
+from data import async_store as store
+from data.store import calc_level_from_xp
 
 DEFAULT_BG = "default.png"
 
@@ -25,40 +19,15 @@ async def generate_rank_card(bot, interaction: discord.Interaction):
     user_id = user.id
 
     # ===== XP & レベル・ランク計算 =====
-    voice_xp = get_voice_xp(guild_id, user_id)
-    text_xp = get_text_xp(guild_id, user_id)
+    voice_xp = await store.get_voice_xp(guild_id, user_id)
+    text_xp = await store.get_text_xp(guild_id, user_id)
 
     v_lv, v_cur, v_need = calc_level_from_xp(voice_xp)
     t_lv, t_cur, t_need = calc_level_from_xp(text_xp)
 
-    stats = get_guild_user_stats(guild_id)
-
-    # ランキング（XP>0 のみ対象）
-    voice_entries = [
-        (uid, data.get("voice_xp", 0.0))
-        for uid, data in stats.items()
-        if data.get("voice_xp", 0.0) > 0
-    ]
-    voice_entries.sort(key=lambda x: x[1], reverse=True)
-    v_rank = None
-    if voice_xp > 0 and voice_entries:
-        for idx, (uid, _) in enumerate(voice_entries, start=1):
-            if uid == user_id:
-                v_rank = (idx, len(voice_entries))
-                break
-
-    text_entries = [
-        (uid, data.get("text_xp", 0.0))
-        for uid, data in stats.items()
-        if data.get("text_xp", 0.0) > 0
-    ]
-    text_entries.sort(key=lambda x: x[1], reverse=True)
-    t_rank = None
-    if text_xp > 0 and text_entries:
-        for idx, (uid, _) in enumerate(text_entries, start=1):
-            if uid == user_id:
-                t_rank = (idx, len(text_entries))
-                break
+    # ランキング（XP>0 のみ対象）。メモリ上のインデックスから順位だけ引く
+    v_rank = await store.get_xp_rank(guild_id, user_id, "voice_xp")
+    t_rank = await store.get_xp_rank(guild_id, user_id, "text_xp")
 
     # ===== レイアウト用の定数（ここをいじれば見た目が変わる）=====
     CARD_WIDTH = 700        # ★カード全体の横幅
@@ -106,14 +75,15 @@ async def generate_rank_card(bot, interaction: discord.Interaction):
     CYAN_COLOR = hex_to_rgba(CYAN_HEX)
 
     # ===== 画像生成開始 =====
-    bg_key = get_rank_bg_key(guild_id, user_id)
+    bg_key = await store.get_rank_bg_key(guild_id, user_id)
 
+    # S3 読み込みもブロッキングなのでストア用スレッドプールで実行
     try:
-        bg = load_rank_bg_from_s3(bg_key)
+        bg = await store.run_blocking(load_rank_bg_from_s3, bg_key)
     except Exception as e:
         # ログだけ吐いてデフォルト背景にフォールバック
         print(f"[rankcard] failed to load bg '{bg_key}', fallback to default: {e}")
-        bg = load_rank_bg_from_s3(DEFAULT_BG)
+        bg = await store.run_blocking(load_rank_bg_from_s3, DEFAULT_BG)
 
     bg = bg.resize((CARD_WIDTH, CARD_HEIGHT), Image.LANCZOS)
 
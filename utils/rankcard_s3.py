@@ -1,12 +1,8 @@
 # utils/rankcard_s3.py
 import io
-import boto3
 from PIL import Image
 from config import RANKCARD_S3_BUCKET, RANKCARD_S3_PREFIX
-
-
-# S3 クライアント生成（グローバルに持ってOK）
-s3 = boto3.client("s3")
+from data import aws_clients
 
 
 def load_rank_bg_from_s3(filename: str) -> Image.Image:
@@ -25,8 +21,8 @@ def load_rank_bg_from_s3(filename: str) -> Image.Image:
     # S3 の実際のキーを組み立てる
     key = f"{RANKCARD_S3_PREFIX}{filename}"
 
-    # S3 からオブジェクト取得
-    resp = s3.get_object(
+    # S3 からオブジェクト取得（client はプロセスで共有。最初の呼び出しで作られる）
+    resp = aws_clients.client("s3").get_object(
         Bucket=RANKCARD_S3_BUCKET,
         Key=key
     )
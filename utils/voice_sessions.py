@@ -0,0 +1,365 @@
+# utils/voice_sessions.py
+"""
+VC 滞在時間を「イベント駆動のセッション区間」で秒単位に計測する。
+
+on_voice_state_update（入室 / 退室 / 移動 / ミュート切替）が来るたびに、
+そのチャンネルで開いている区間をいったん閉じて、今の状態で開き直す。
+閉じた区間の長さ（秒）から XP / meta / 日次分数を計算してバッファに積む。
+
+区間は「人数・ミュート状態・一緒にいる相手」が変わらない時間の塊なので、
+人数帯やペア時間を 1 分単位で丸めずに正確に按分できる。
+"""
+
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Set, Tuple
+
+import discord
+
+from data import async_store as store
+from data.guild_config import LevelingConfig
+from data.store import record_voice_tick
+from config import VOICE_MAX_CREDIT_SECONDS, VOICE_TICK_STATE_PATH
+from utils.metrics import metrics
+
+JST = timezone(timedelta(hours=9))
+
+
+# ===== XP計算ロジック =====
+def calc_voice_xp_per_minute(member_count: int, is_muted: bool) -> float:
+    """
+    1分あたりのボイスXPを計算する。
+    式: XP = 0.3 × 人数ボーナス × ミュート倍率
+    """
+    base = 0.3
+
+    # 人数ボーナス
+    if member_count <= 1:
+        bonus = 0.8
+    elif member_count <= 3:
+        bonus = 1.2
+    elif member_count <= 6:
+        bonus = 1.5
+    else:
+        bonus = 2.0
+
+    # ミュート倍率
+    mute_factor = 0.5 if is_muted else 1.0
+
+    return base * bonus * mute_factor
+
+
+def group_key_for(member_count: int) -> str:
+    """人数 → meta の人数帯キー"""
+    if member_count == 1:
+        return "solo_time"
+    elif 2 <= member_count <= 3:
+        return "small_group_time"
+    elif 4 <= member_count <= 6:
+        return "mid_group_time"
+    return "big_group_time"
+
+
+def is_muted_state(state: Optional[discord.VoiceState]) -> bool:
+    if state is None:
+        return False
+    return bool(state.self_mute or state.self_deaf or state.mute or state.deaf)
+
+
+class VoiceSegment:
+    """人数・ミュート状態・相手が変わらない 1 区間"""
+
+    __slots__ = ("channel_id", "started_mono", "started_at", "member_count", "is_muted", "partner_ids")
+
+    def __init__(
+        self,
+        channel_id: int,
+        started_mono: float,
+        started_at: datetime,
+        member_count: int,
+        is_muted: bool,
+        partner_ids: Tuple[int, ...],
+    ):
+        self.channel_id = channel_id
+        self.started_mono = started_mono  # 長さの計測用（time.monotonic）
+        self.started_at = started_at      # 時間帯 / 日付の按分用（JST）
+        self.member_count = member_count
+        self.is_muted = is_muted
+        self.partner_ids = partner_ids
+
+
+class VoiceSessionTable:
+    """
+    (guild_id, user_id) → 開いている区間 のテーブル。
+
+    refresh_channel() でチャンネル単位に閉じて開き直すので、
+    イベント 1 件あたりの処理量はそのチャンネルの人数に比例する。
+    """
+
+    def __init__(
+        self,
+        *,
+        max_credit_seconds: float = VOICE_MAX_CREDIT_SECONDS,
+        state_path: Optional[str] = VOICE_TICK_STATE_PATH,
+    ):
+        self._segments: Dict[Tuple[int, int], VoiceSegment] = {}
+        # (guild_id, channel_id) → その区間を持っている user_id
+        self._by_channel: Dict[Tuple[int, int], Set[int]] = {}
+
+        # 1 区間として一度に精算する上限（ループ停止や切断中の分を盛らない）
+        self.max_credit_seconds = max_credit_seconds
+
+        # 最後に精算した時刻（JST）。再起動をまたいでも時計が戻らないようにする
+        self.state_path = state_path
+        self._wall_floor: Optional[datetime] = None
+        self._load_state()
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+    # -----------------------------
+    # 時刻 / 前回 tick の永続化
+    # -----------------------------
+    def _now(self) -> Tuple[float, datetime]:
+        """
+        (monotonic, JST の壁時計) を返す。
+        長さは monotonic で測り、壁時計は時間帯 / 日付の按分にだけ使う。
+        壁時計は前回精算時刻より前には戻さない（NTP 補正や再起動で
+        同じ時間帯・同じ日に二重に積まないため）。
+        """
+        now = datetime.now(JST)
+        if self._wall_floor is not None and now < self._wall_floor:
+            now = self._wall_floor
+        return time.monotonic(), now
+
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            self._wall_floor = datetime.fromtimestamp(float(raw["last_tick_ts"]), JST)
+        except Exception as e:
+            print(f"[VoiceSessions] tick state の読み込み失敗: {e}")
+            return
+
+        downtime = (datetime.now(JST) - self._wall_floor).total_seconds()
+        metrics.set_gauge("voice.tick.downtime_seconds", max(0.0, downtime))
+
+    def save_state(self, at: Optional[datetime] = None):
+        """最後に精算した時刻を保存する（一時ファイル → rename で書き換え）。"""
+        if at is not None:
+            self._wall_floor = at
+        if not self.state_path or self._wall_floor is None:
+            return
+
+        tmp_path = f"{self.state_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"last_tick_ts": self._wall_floor.timestamp()}, f)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            print(f"[VoiceSessions] tick state の保存失敗: {e}")
+
+    def _clamp(self, seconds: float) -> float:
+        if seconds > self.max_credit_seconds:
+            metrics.incr("voice.capped_seconds", seconds - self.max_credit_seconds)
+            return self.max_credit_seconds
+        return seconds
+
+    # -----------------------------
+    # 区間の開閉
+    # -----------------------------
+    def _open(self, gid: int, uid: int, seg: VoiceSegment):
+        self._close(gid, uid)
+        self._segments[(gid, uid)] = seg
+        self._by_channel.setdefault((gid, seg.channel_id), set()).add(uid)
+
+    def _close(self, gid: int, uid: int, now_mono: Optional[float] = None):
+        seg = self._segments.pop((gid, uid), None)
+        if seg is None:
+            return
+
+        members = self._by_channel.get((gid, seg.channel_id))
+        if members is not None:
+            members.discard(uid)
+            if not members:
+                del self._by_channel[(gid, seg.channel_id)]
+
+        if now_mono is None:
+            now_mono, _ = self._now()
+        seconds = self._clamp(now_mono - seg.started_mono)
+        if seconds > 0:
+            self._credit(gid, uid, seg, seconds)
+
+    def _credit(self, gid: int, uid: int, seg: VoiceSegment, seconds: float):
+        """区間の長さを時間帯（JST の 1 時間）ごとに分けてバッファに積む。"""
+        xp_per_minute = calc_voice_xp_per_minute(seg.member_count, seg.is_muted)
+        group_key = group_key_for(seg.member_count)
+
+        cursor = seg.started_at
+        remaining = seconds
+        while remaining > 0:
+            next_hour = cursor.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+            chunk = min(remaining, (next_hour - cursor).total_seconds())
+            minutes = chunk / 60.0
+
+            record_voice_tick(
+                gid,
+                uid,
+                xp=xp_per_minute * minutes,
+                minutes=minutes,
+                group_key=group_key,
+                is_muted=seg.is_muted,
+                member_count=seg.member_count,
+                hour=cursor.hour,
+                partner_ids=seg.partner_ids,
+                day=cursor.date(),
+            )
+
+            cursor = next_hour
+            remaining -= chunk
+
+    # -----------------------------
+    # 外から呼ぶ操作
+    # -----------------------------
+    def refresh_channel(
+        self,
+        guild_id: int,
+        channel_id: int,
+        members: list,
+        *,
+        tracked: bool = True,
+    ):
+        """
+        チャンネルで開いている区間を全部閉じて、今のメンバー状態で開き直す。
+
+        members: そのチャンネルに今いる discord.Member のリスト
+        tracked: False（除外チャンネル）なら閉じるだけで開き直さない
+        """
+        now_mono, now = self._now()
+
+        for uid in list(self._by_channel.get((guild_id, channel_id), ())):
+            self._close(guild_id, uid, now_mono)
+
+        if not tracked:
+            return
+
+        humans = [m for m in members if not m.bot and m.voice is not None]
+        member_count = len(humans)
+        for member in humans:
+            self._open(
+                guild_id,
+                member.id,
+                VoiceSegment(
+                    channel_id=channel_id,
+                    started_mono=now_mono,
+                    started_at=now,
+                    member_count=member_count,
+                    is_muted=is_muted_state(member.voice),
+                    partner_ids=tuple(m.id for m in humans if m.id != member.id),
+                ),
+            )
+
+    def close_member(self, guild_id: int, user_id: int):
+        self._close(guild_id, user_id)
+
+    def checkpoint(self) -> int:
+        """
+        開いている区間をすべて「ここまで」で精算して、同じ条件で開き直す。
+        長時間の通話でもバッファ（と読み取り）に経過分が反映されるようにする。
+
+        戻り値: 精算した区間の数
+        """
+        now_mono, now = self._now()
+
+        items = list(self._segments.items())
+        for (gid, uid), seg in items:
+            seconds = self._clamp(now_mono - seg.started_mono)
+            if seconds > 0:
+                self._credit(gid, uid, seg, seconds)
+            seg.started_mono = now_mono
+            seg.started_at = now
+
+        self._wall_floor = now
+        return len(items)
+
+    def close_all(self):
+        now_mono, now = self._now()
+        for gid, uid in list(self._segments):
+            self._close(gid, uid, now_mono)
+        self._wall_floor = now
+
+    def channel_keys(self) -> Set[Tuple[int, int]]:
+        return set(self._by_channel)
+
+
+# プロセス全体で 1 個だけ
+voice_sessions = VoiceSessionTable()
+
+
+# =========================
+#  ギルド設定（leveling 除外）
+# =========================
+def _is_tracked(channel, leveling: LevelingConfig) -> bool:
+    # ステージチャンネルなどは今まで通り対象外
+    if not isinstance(channel, discord.VoiceChannel):
+        return False
+    return not leveling.is_ignored_channel(channel)
+
+
+async def refresh_voice_session(
+    member: discord.Member,
+    before: discord.VoiceState,
+    after: discord.VoiceState,
+):
+    """on_voice_state_update から呼ぶ。変化があったチャンネルの区間を開き直す。"""
+    if member.bot:
+        return
+
+    guild = member.guild
+    cfg = await store.get_guild_config(guild.id)
+
+    channels = []
+    if before.channel is not None:
+        channels.append(before.channel)
+    if after.channel is not None and after.channel != before.channel:
+        channels.append(after.channel)
+
+    for channel in channels:
+        voice_sessions.refresh_channel(
+            guild.id,
+            channel.id,
+            channel.members,
+            tracked=_is_tracked(channel, cfg.leveling),
+        )
+
+    # イベントを取りこぼしていて別チャンネルの区間が残っていた場合の保険
+    if after.channel is None:
+        voice_sessions.close_member(guild.id, member.id)
+
+
+async def resync_voice_sessions(bot: discord.Client):
+    """
+    起動時 / 再接続時に、今の VC 状態とセッション表を突き合わせる。
+    （取りこぼしたイベントがあっても、ここで正しい状態に戻る）
+    """
+    seen: Set[Tuple[int, int]] = set()
+
+    for guild in bot.guilds:
+        cfg = await store.get_guild_config(guild.id)
+
+        for vc in guild.voice_channels:
+            seen.add((guild.id, vc.id))
+            voice_sessions.refresh_channel(
+                guild.id,
+                vc.id,
+                vc.members,
+                tracked=_is_tracked(vc, cfg.leveling),
+            )
+
+    # もう存在しないチャンネル / ギルドの区間は閉じる
+    for gid, cid in voice_sessions.channel_keys() - seen:
+        voice_sessions.refresh_channel(gid, cid, [], tracked=False)